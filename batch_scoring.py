@@ -0,0 +1,219 @@
+"""Vectorized (NumPy) scoring of incident batches.
+
+A chunk of projected incidents is encoded as categorical codes for module,
+environment and failure_type plus a sparse (CSR) multi-hot layer matrix, and
+base/final minutes, priority and sort order are computed as array operations.
+Results are identical to incident_processor.score_incidents, including the
+int/float type of every value, round(..., 3) priorities and the module-ascending
+tie-break of sort_key.
+"""
+import numpy as np
+
+from incident_processor import (
+    compile_policy,
+    get_module_priority,
+    get_multiplier,
+    read_records,
+    score_incidents,
+)
+
+CHUNK_SIZE = 100000
+
+
+class _Vocabulary:
+    """Assigns dense integer codes to values in first-seen order."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+
+def encode_incidents(incidents):
+    """Encode projected incidents into categorical codes and a CSR layer matrix."""
+    modules, environments, failure_types, layers = _Vocabulary(), _Vocabulary(), _Vocabulary(), _Vocabulary()
+    n = len(incidents)
+    module_codes = np.empty(n, dtype=np.int64)
+    env_codes = np.empty(n, dtype=np.int64)
+    fail_codes = np.empty(n, dtype=np.int64)
+    layer_indptr = np.zeros(n + 1, dtype=np.int64)
+    layer_indices = []
+    for i, incident in enumerate(incidents):
+        module_codes[i] = modules.code(incident.get('module'))
+        env_codes[i] = environments.code(incident.get('environment'))
+        fail_codes[i] = failure_types.code(incident.get('failure_type'))
+        impacted_layers = incident.get('impacted_layers', [])
+        if impacted_layers:
+            layer_indices.extend(layers.code(layer) for layer in impacted_layers)
+        layer_indptr[i + 1] = len(layer_indices)
+    return {
+        'module_codes': module_codes,
+        'env_codes': env_codes,
+        'fail_codes': fail_codes,
+        'layer_indptr': layer_indptr,
+        'layer_indices': np.asarray(layer_indices, dtype=np.int64),
+        'modules': modules.values,
+        'environments': environments.values,
+        'failure_types': failure_types.values,
+        'layers': layers.values,
+    }
+
+
+def _lookup(values, mapping, default):
+    """Map vocabulary values through a policy table as float64 plus an is-float mask."""
+    looked_up = [mapping.get(value, default) for value in values]
+    if not all(_is_number(v) for v in looked_up):
+        raise TypeError('non-numeric policy value')
+    return (np.asarray(looked_up, dtype=np.float64).reshape(len(values)),
+            np.asarray([isinstance(v, float) for v in looked_up], dtype=bool).reshape(len(values)))
+
+
+def score_encoded(encoded, policy):
+    """Compute score arrays for an encoded batch.
+
+    Returns a dict with float64 arrays ``base_minutes``, ``final_minutes`` and
+    ``priority_score``, boolean masks recording which values are Python floats or
+    capped, and ``priority_values``/``priority_index`` holding the exact Python
+    priority for every (module, environment, failure_type) combination.
+    """
+    policy = compile_policy(policy)
+    n = len(encoded['module_codes'])
+    indptr = encoded['layer_indptr']
+    indices = encoded['layer_indices']
+
+    # Base minutes: sparse multi-hot layer matrix times the per-layer minutes.
+    # bincount accumulates in row order, matching Python's left-to-right sum().
+    layer_values, layer_is_float = _lookup(encoded['layers'], policy.layer_minutes, 0)
+    row_ids = np.repeat(np.arange(n), np.diff(indptr))
+    base = np.bincount(row_ids, weights=layer_values[indices], minlength=n)
+    base_is_float = np.bincount(row_ids, weights=layer_is_float[indices].astype(np.float64), minlength=n) > 0
+
+    env_values, env_is_float = _lookup(encoded['environments'], policy.env_multipliers, 1.0)
+    fail_values, fail_is_float = _lookup(encoded['failure_types'], policy.failure_multipliers, 1.0)
+    env_mult = env_values[encoded['env_codes']]
+    fail_mult = fail_values[encoded['fail_codes']]
+
+    final = base * env_mult * fail_mult
+    final_is_float = base_is_float | env_is_float[encoded['env_codes']] | fail_is_float[encoded['fail_codes']]
+    upper_cap = policy.upper_cap
+    if upper_cap is not None:
+        capped = final > upper_cap
+        final = np.where(capped, upper_cap, final)
+    else:
+        capped = np.zeros(n, dtype=bool)
+
+    # Priority only depends on (module, environment, failure_type); round each
+    # distinct combination with Python's round() so ties break exactly as the
+    # scalar path does.
+    n_env = max(len(encoded['environments']), 1)
+    n_fail = max(len(encoded['failure_types']), 1)
+    combo = (encoded['module_codes'] * n_env + encoded['env_codes']) * n_fail + encoded['fail_codes']
+    unique_combos, priority_index = np.unique(combo, return_inverse=True)
+    priority_values = []
+    for key in unique_combos.tolist():
+        module_code, rest = divmod(key, n_env * n_fail)
+        env_code, fail_code = divmod(rest, n_fail)
+        module_priority = get_module_priority(encoded['modules'][module_code], policy.module_priorities)
+        env = get_multiplier(encoded['environments'][env_code], policy.env_multipliers)
+        fail = get_multiplier(encoded['failure_types'][fail_code], policy.failure_multipliers)
+        priority_values.append(round(module_priority * env * fail, 3))
+    priority = np.asarray(priority_values, dtype=np.float64)[priority_index.reshape(n)]
+
+    return {
+        'base_minutes': base,
+        'base_is_float': base_is_float,
+        'final_minutes': final,
+        'final_is_float': final_is_float,
+        'capped': capped,
+        'upper_cap': upper_cap,
+        'priority_score': priority,
+        'priority_values': priority_values,
+        'priority_index': priority_index.reshape(n),
+    }
+
+
+def sort_order(encoded, scores):
+    """Indices ordering the batch by priority_score desc, then module asc (None as '')."""
+    modules = [m if m is not None else '' for m in encoded['modules']]
+    ranked = sorted(set(modules))
+    rank_of = {m: r for r, m in enumerate(ranked)}
+    module_rank = np.asarray([rank_of[m] for m in modules], dtype=np.int64).reshape(len(modules))
+    # lexsort is stable, like list.sort, so equal keys keep their input order.
+    return np.lexsort((module_rank[encoded['module_codes']], -scores['priority_score']))
+
+
+def _records(incidents, scores, order):
+    base = scores['base_minutes'].tolist()
+    base_is_float = scores['base_is_float'].tolist()
+    final = scores['final_minutes'].tolist()
+    final_is_float = scores['final_is_float'].tolist()
+    capped = scores['capped'].tolist()
+    upper_cap = scores['upper_cap']
+    priority_values = scores['priority_values']
+    priority_index = scores['priority_index'].tolist()
+    for i in order:
+        incident = incidents[i]
+        if capped[i]:
+            final_minutes = upper_cap
+        elif final_is_float[i]:
+            final_minutes = final[i]
+        else:
+            final_minutes = int(final[i])
+        yield {
+            'test_id': incident.get('test_id', None),
+            'module': incident.get('module'),
+            'environment': incident.get('environment'),
+            'failure_type': incident.get('failure_type'),
+            'impacted_layers': incident.get('impacted_layers', []),
+            'base_minutes': base[i] if base_is_float[i] else int(base[i]),
+            'final_minutes': final_minutes,
+            'priority_score': priority_values[priority_index[i]]
+        }
+
+
+def score_batch(incidents, policy, sort=False):
+    """Score a list of projected incidents; sorted by sort_key order when sort is True."""
+    incidents = incidents if isinstance(incidents, list) else list(incidents)
+    if not incidents:
+        return []
+    try:
+        encoded = encode_incidents(incidents)
+        scores = score_encoded(encoded, policy)
+        order = sort_order(encoded, scores).tolist() if sort else range(len(incidents))
+    except TypeError:
+        # Unhashable or non-numeric values: defer to the scalar path, which
+        # raises or scores them exactly as before.
+        from incident_processor import sort_key
+        results = list(score_incidents(incidents, policy))
+        if sort:
+            results.sort(key=sort_key)
+        return results
+    return list(_records(incidents, scores, order))
+
+
+def score_chunks(incidents, policy, chunk_size=CHUNK_SIZE):
+    """Stream-score incidents chunk by chunk, yielding records in input order."""
+    policy = compile_policy(policy)
+    chunk = []
+    for incident in incidents:
+        chunk.append(incident)
+        if len(chunk) >= chunk_size:
+            yield from score_batch(chunk, policy)
+            chunk = []
+    if chunk:
+        yield from score_batch(chunk, policy)
+
+
+def build_plan_batch(inputs, policy, decoder='auto', dedup=None, tee=None):
+    """Vectorized equivalent of incident_processor.build_plan."""
+    return score_batch(list(read_records(inputs, decoder, dedup, tee)), policy, sort=True)
@@ -0,0 +1,219 @@
+"""Throughput benchmarks for the processor and the HTML report.
+
+Every (scale, stage) runs in a fresh Python process so its peak RSS is its
+own: the process does the untimed setup for the stage (reading and scoring
+the synthetic input as needed), then times the stage. Stages:
+
+parse      read and project the input           (read_inputs)
+score      score the projected records          (score_incidents)
+sort       sort the scored incidents            (list.sort by sort_key)
+validate   full validation of the plan          (plan_validation.validate_plan)
+write      write the plan JSON                  (write_plan_json)
+report     render the HTML report from the plan (write_html_report over iter_plan)
+
+Inputs come from synthetic_failures with a fixed seed. They are generated on
+first use and cached per scale in --data-dir (ignored by git), and
+--regenerate rebuilds them. Results are compared with benchmarks/baseline.json: a
+stage regresses when its rows/sec drops, or its peak RSS grows, by more than
+--tolerance. Baselines are machine-specific; refresh them with
+--update-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 10k 1m
+    python benchmarks/run_benchmarks.py --scales 10k --update-baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from incident_processor import LOG_DIR, POLICY_FILE
+from instrumentation import peak_rss_mb
+
+STAGES = ('parse', 'score', 'sort', 'validate', 'write', 'report')
+SCALES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DATA_DIR = os.path.join(LOG_DIR, 'benchmarks')
+SEED = 20250801
+TOLERANCE = 0.3
+
+
+def run_stage(stage, input_path, work_dir):
+    """Set up and time one stage in this process; returns its measurements."""
+    from incident_processor import load_compiled_policy, read_inputs, score_incidents, sort_key, write_plan_json
+
+    def quiet(idx, error, source):
+        pass
+
+    policy = load_compiled_policy(POLICY_FILE, None)
+    plan_path = os.path.join(work_dir, 'plan.json')
+    records = results = None
+    if stage in ('score', 'sort', 'validate', 'write'):
+        records = list(read_inputs(input_path, on_malformed=quiet))
+    if stage in ('sort', 'validate', 'write'):
+        results = list(score_incidents(records, policy))
+        records = None
+    if stage in ('validate', 'write'):
+        results.sort(key=sort_key)
+    if stage == 'report' and not os.path.exists(plan_path):
+        prepared = sorted(score_incidents(read_inputs(input_path, on_malformed=quiet), policy), key=sort_key)
+        write_plan_json(prepared, plan_path)
+        prepared = None
+
+    start = time.perf_counter()
+    if stage == 'parse':
+        rows = sum(1 for _ in read_inputs(input_path, on_malformed=quiet))
+    elif stage == 'score':
+        rows = sum(1 for _ in score_incidents(records, policy))
+    elif stage == 'sort':
+        results.sort(key=sort_key)
+        rows = len(results)
+    elif stage == 'validate':
+        from plan_validation import validate_plan
+        rows = validate_plan(results, policy, level='full').records_checked
+    elif stage == 'write':
+        rows = write_plan_json(results, plan_path)
+    elif stage == 'report':
+        from generate_html_report import iter_plan, write_html_report
+        counted = []
+
+        def counting(plan):
+            for incident in plan:
+                counted.append(None)
+                yield incident
+        with open(os.path.join(work_dir, 'report.html'), 'w', encoding='utf-8', buffering=1024 * 1024) as out:
+            write_html_report(counting(iter_plan(plan_path)), out)
+        rows = len(counted)
+    else:
+        raise ValueError(f"Unknown stage {stage!r}")
+    seconds = time.perf_counter() - start
+    return {'rows': rows, 'seconds': round(seconds, 4), 'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def scale_rows(name):
+    """Rows for a scale name such as 10k, 1m or 250000."""
+    name = str(name).lower()
+    if name in SCALES:
+        return SCALES[name]
+    for suffix, factor in (('k', 1_000), ('m', 1_000_000)):
+        if name.endswith(suffix):
+            return int(float(name[:-1]) * factor)
+    return int(name)
+
+
+def prepare_input(name, data_dir, regenerate=False):
+    """Path of the synthetic input for a scale, generating it on first use or when regenerate is set."""
+    from synthetic_failures import write_failures
+    path = os.path.join(data_dir, f'failures-{name}-{SEED}.jsonl')
+    if regenerate or not os.path.exists(path):
+        print(f"Generating {scale_rows(name)} synthetic failures in {path}...")
+        tmp_path = f'{path}.tmp'
+        write_failures(tmp_path, scale_rows(name), seed=SEED, duplicate_rate=0.01, malformed_rate=0.0001)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_suite(scales, stages=STAGES, data_dir=DATA_DIR, repeat=1, regenerate=False):
+    """Measurements as {scale: {stage: result}}, each stage in its own process.
+
+    With repeat > 1 every stage runs that many times and the fastest run is kept.
+    """
+    results = {}
+    for name in scales:
+        input_path = prepare_input(name, data_dir, regenerate)
+        work_dir = os.path.join(data_dir, f'work-{name}')
+        os.makedirs(work_dir, exist_ok=True)
+        plan_path = os.path.join(work_dir, 'plan.json')
+        if os.path.exists(plan_path):
+            os.remove(plan_path)
+        results[name] = {}
+        for stage in stages:
+            runs = []
+            for _ in range(max(1, repeat)):
+                out = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', stage,
+                                      '--input', input_path, '--work-dir', work_dir],
+                                     check=True, capture_output=True, text=True).stdout
+                runs.append(json.loads(out.strip().splitlines()[-1]))
+            r = results[name][stage] = min(runs, key=lambda run: run['seconds'])
+            print(f"{name:>5} {stage:<9} {r['rows']:>10} rows {r['seconds']:>9.3f}s "
+                  f"{r['rows_per_sec']:>12.0f} rows/s {r['peak_rss_mb']} MB peak RSS")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Regression messages for results against baseline (same layout); empty if none."""
+    regressions = []
+    for name, stages in results.items():
+        for stage, r in stages.items():
+            base = (baseline.get(name) or {}).get(stage)
+            if not base:
+                continue
+            if base.get('rows_per_sec') and r['rows_per_sec'] < base['rows_per_sec'] * (1 - tolerance):
+                regressions.append(f"{name} {stage}: {r['rows_per_sec']:.0f} rows/s is below baseline "
+                                   f"{base['rows_per_sec']:.0f} by more than {tolerance:.0%}")
+            if base.get('peak_rss_mb') and r.get('peak_rss_mb') and \
+                    r['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f"{name} {stage}: peak RSS {r['peak_rss_mb']} MB exceeds baseline "
+                                   f"{base['peak_rss_mb']} MB by more than {tolerance:.0%}")
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark processor and report throughput on synthetic data.')
+    parser.add_argument('--scales', nargs='+', default=['10k'], help='Row counts such as 10k, 1m, 10m')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the fastest is kept')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Cache for synthetic inputs and stage outputs')
+    parser.add_argument('--regenerate', action='store_true', help='Regenerate the cached synthetic inputs')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Allowed relative drop in rows/sec or growth in peak RSS')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--output', default=None, help='Also write the results JSON here')
+    parser.add_argument('--worker', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        print(json.dumps(run_stage(args.worker, args.input, args.work_dir)))
+        return 0
+    results = run_suite(args.scales, args.stages, args.data_dir, args.repeat, args.regenerate)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        for name, stages in results.items():
+            baseline.setdefault(name, {}).update(stages)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline {args.baseline} updated.")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,259 @@
+"""Memory-mappable columnar plan format.
+
+Layout (all integers little-endian, every column 8-byte aligned):
+
+    MAGIC (8 bytes) | header length (uint32) | header JSON | columns...
+
+The JSON header holds the row count, each column's byte offset, length and
+``array`` typecode, and the dictionaries for the encoded string columns.
+Columns:
+
+    base_minutes, final_minutes, priority_score   float64 per row
+    numeric_flags                                  uint8 per row, bit i set when
+                                                   the i-th numeric column was an int
+    module, environment, failure_type              int32 codes into the dictionaries
+    layer_offsets                                  int64, row count + 1 entries
+    layer_codes                                    int32 codes into the 'layers' dictionary
+    test_id_offsets                                int64, row count + 1 entries
+    test_id_bytes                                  UTF-8 test ids, back to back
+
+ColumnarPlan maps the file and hands out columns as memoryviews over the
+mapping, so reading a column or a slice of one copies nothing
+(``numpy.frombuffer(plan.column('final_minutes'))`` is zero-copy too). Values a
+column cannot represent exactly (a non-string test_id, non-list layers, ...)
+are kept verbatim in the header's ``exceptions`` so records round-trip.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'IPLCOL01'
+_HEADER_LEN = struct.Struct('<I')
+ALIGNMENT = 8
+NUMERIC_COLUMNS = ('base_minutes', 'final_minutes', 'priority_score')
+CATEGORY_COLUMNS = ('module', 'environment', 'failure_type')
+COLUMN_TYPES = {
+    'base_minutes': 'd',
+    'final_minutes': 'd',
+    'priority_score': 'd',
+    'numeric_flags': 'B',
+    'module': 'i',
+    'environment': 'i',
+    'failure_type': 'i',
+    'layer_offsets': 'q',
+    'layer_codes': 'i',
+    'test_id_offsets': 'q',
+    'test_id_bytes': 'B',
+}
+
+
+def is_columnar_plan(path):
+    """True if path starts with the columnar plan magic bytes."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _Dictionary:
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def write_columnar_plan(results, path):
+    """Write scored incidents to path in the columnar format. Returns the count."""
+    columns = {name: array(typecode) for name, typecode in COLUMN_TYPES.items()}
+    dictionaries = {name: _Dictionary() for name in CATEGORY_COLUMNS + ('layers',)}
+    exceptions = {}
+    columns['layer_offsets'].append(0)
+    columns['test_id_offsets'].append(0)
+    test_ids = bytearray()
+    count = 0
+
+    for row, incident in enumerate(results):
+        odd = {}
+        flags = 0
+        for bit, name in enumerate(NUMERIC_COLUMNS):
+            value = incident.get(name)
+            if _is_number(value) and float(value) == value:
+                columns[name].append(float(value))
+                if isinstance(value, int):
+                    flags |= 1 << bit
+            else:
+                columns[name].append(float('nan'))
+                odd[name] = value
+        columns['numeric_flags'].append(flags)
+
+        for name in CATEGORY_COLUMNS:
+            value = incident.get(name)
+            if value is not None and not isinstance(value, str):
+                odd[name] = value
+                value = None
+            columns[name].append(dictionaries[name].code(value))
+
+        layers = incident.get('impacted_layers')
+        if isinstance(layers, list) and all(isinstance(layer, str) for layer in layers):
+            columns['layer_codes'].extend(dictionaries['layers'].code(layer) for layer in layers)
+        else:
+            odd['impacted_layers'] = layers
+        columns['layer_offsets'].append(len(columns['layer_codes']))
+
+        test_id = incident.get('test_id')
+        if isinstance(test_id, str):
+            test_ids += test_id.encode('utf-8', 'surrogatepass')
+        else:
+            odd['test_id'] = test_id
+        columns['test_id_offsets'].append(len(test_ids))
+
+        if odd:
+            exceptions[str(row)] = odd
+        count += 1
+    columns['test_id_bytes'] = array('B', test_ids)
+
+    if sys.byteorder != 'little':
+        for column in columns.values():
+            column.byteswap()
+
+    layout = {}
+    offset = 0
+    for name, column in columns.items():
+        size = len(column) * column.itemsize
+        layout[name] = {'offset': offset, 'length': len(column), 'type': column.typecode}
+        offset += -(-size // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        'count': count,
+        'columns': layout,
+        'dictionaries': {name: d.values for name, d in dictionaries.items()},
+        'exceptions': exceptions,
+    }).encode('utf-8')
+    # Pad the header so the first column starts on an aligned offset.
+    prefix = len(MAGIC) + _HEADER_LEN.size
+    header += b' ' * (-(prefix + len(header)) % ALIGNMENT)
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for column in columns.values():
+            size = len(column) * column.itemsize
+            column.tofile(f)
+            f.write(b'\0' * (-size % ALIGNMENT))
+    return count
+
+
+class ColumnarPlan:
+    """Read-only, memory-mapped view of a columnar plan file."""
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("Columnar plans can only be mapped on little-endian hosts")
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC) + _HEADER_LEN.size or f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a columnar plan")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (header_len,) = _HEADER_LEN.unpack_from(self._mmap, len(MAGIC))
+        data_start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(self._mmap[data_start:data_start + header_len].decode('utf-8'))
+        self._data_start = data_start + header_len
+        self._layout = header['columns']
+        self.count = header['count']
+        self.dictionaries = header['dictionaries']
+        self.exceptions = {int(row): values for row, values in header['exceptions'].items()}
+        self._buffer = memoryview(self._mmap)
+        self._columns = {}
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Release the column views and unmap the file.
+
+        Raises BufferError if a caller still holds a view from column().
+        """
+        for view in self._columns.values():
+            view.release()
+        self._columns.clear()
+        self._buffer.release()
+        self._mmap.close()
+
+    def column(self, name):
+        """Return the whole column as a typed memoryview over the mapped file."""
+        view = self._columns.get(name)
+        if view is None:
+            spec = self._layout[name]
+            start = self._data_start + spec['offset']
+            end = start + spec['length'] * array(spec['type']).itemsize
+            with self._buffer[start:end] as raw:
+                view = self._columns[name] = raw.cast(spec['type'])
+        return view
+
+    def test_id(self, row):
+        odd = self.exceptions.get(row)
+        if odd and 'test_id' in odd:
+            return odd['test_id']
+        offsets = self.column('test_id_offsets')
+        return bytes(self.column('test_id_bytes')[offsets[row]:offsets[row + 1]]).decode('utf-8', 'surrogatepass')
+
+    def record(self, row):
+        """Decode one row back into the scored incident dict."""
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError('plan row out of range')
+        odd = self.exceptions.get(row, {})
+        incident = {'test_id': self.test_id(row)}
+        for name in CATEGORY_COLUMNS:
+            incident[name] = odd[name] if name in odd else self.dictionaries[name][self.column(name)[row]]
+        if 'impacted_layers' in odd:
+            incident['impacted_layers'] = odd['impacted_layers']
+        else:
+            offsets = self.column('layer_offsets')
+            layers = self.dictionaries['layers']
+            incident['impacted_layers'] = [layers[code] for code in self.column('layer_codes')[offsets[row]:offsets[row + 1]]]
+        flags = self.column('numeric_flags')[row]
+        for bit, name in enumerate(NUMERIC_COLUMNS):
+            if name in odd:
+                incident[name] = odd[name]
+            else:
+                value = self.column(name)[row]
+                incident[name] = int(value) if flags & (1 << bit) else value
+        return incident
+
+    def records(self, start=0, stop=None):
+        """Yield the incidents in rows [start, stop)."""
+        for row in range(*slice(start, stop).indices(self.count)):
+            yield self.record(row)
+
+    def __iter__(self):
+        return self.records()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(row) for row in range(*index.indices(self.count))]
+        return self.record(index)
+
+
+def iter_columnar_plan(path):
+    """Yield every incident of a columnar plan file, unmapping it when done."""
+    with ColumnarPlan(path) as plan:
+        yield from plan
@@ -1,30 +1,321 @@
 import os
 import json
+import math
+import tempfile
 from collections import Counter
+from html import escape
 
 
-def generate_html_report(plan_json_path, html_path):
-    # Ensure the output directory exists
-    html_result_dir = os.path.join("test_results", "html_result")
-    html_path = os.path.join(html_result_dir, "report.html")
-    output_dir = os.path.dirname(html_path)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir, exist_ok=True)
-    # Copy style.css to html_result directory
-    src_css = os.path.join('report_generation_utils', 'style.css')
-    dst_css = os.path.join(html_result_dir, 'style.css')
-    if os.path.exists(src_css):
-        import shutil
-        shutil.copyfile(src_css, dst_css)
-    # Read test plan data from JSON file
-    with open(plan_json_path, 'r', encoding='utf-8') as f:
-        results = json.load(f)
+# Rows are rendered in chunks and written straight to the output file, so the
+# page is never assembled as one string.
+ROW_CHUNK_SIZE = 1000
+WRITE_BUFFER_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# Streamed plans are spooled to a temporary file once they exceed this size
+SPOOL_MEMORY_LIMIT = 8 * 1024 * 1024
+
+
+def report_sort_key(r):
+    # Sort results by priority_score descending, then module ascending
+    return (-r.get('priority_score', 0), str(r.get('module', '')))
+
+
+# The incidents are embedded once as JSON (see RowEncoder) and only the current
+# page of rows is put in the DOM. Sorting and filtering work on the parsed
+# arrays, not on table cells.
+TABLE_SCRIPT = r"""
+        // Paginated incidents table backed by the embedded JSON data
+        document.addEventListener('DOMContentLoaded', function() {
+            var PAGE_SIZE = 100;
+            var FILTER_DELAY_MS = 200;
+            var table = document.getElementById('incidentsTable');
+            var tbody = table.querySelector('tbody');
+            var headers = table.querySelectorAll('th');
+            var payload = JSON.parse(document.getElementById('incidentsData').textContent);
+            var rows = payload.rows;
+            var dicts = [null, payload.dictionaries.module, payload.dictionaries.environment,
+                         payload.dictionaries.failure_type];
+            var n = rows.length;
+
+            // Typed sort keys, built once: dictionary ranks for categories,
+            // parsed numbers for the minute and score columns.
+            function dictRanks(values) {
+                var order = values.map(function(v, i) { return i; });
+                order.sort(function(a, b) { return values[a] < values[b] ? -1 : (values[a] > values[b] ? 1 : 0); });
+                var ranks = new Uint32Array(values.length);
+                order.forEach(function(code, rank) { ranks[code] = rank; });
+                return ranks;
+            }
+            var ranks = [null, dictRanks(dicts[1]), dictRanks(dicts[2]), dictRanks(dicts[3])];
+            var numbers = {};
+            [5, 6, 7].forEach(function(col) {
+                var values = new Float64Array(n);
+                for (var i = 0; i < n; i++) { values[i] = parseFloat(rows[i][col]) || 0; }
+                numbers[col] = values;
+            });
+            function cellText(row, col) {
+                return (col >= 1 && col <= 3) ? dicts[col][row[col]] : row[col];
+            }
+            function severity(i) {
+                var score = numbers[7][i];
+                return score > 7 ? 'high' : (score >= 4 ? 'medium' : 'low');
+            }
+
+            var order = [];
+            for (var i = 0; i < n; i++) { order.push(i); }
+            var visible = order;
+            var page = 0;
+            var sortOrder = {};
+            var haystack = null;
+
+            function render() {
+                var pages = Math.max(1, Math.ceil(visible.length / PAGE_SIZE));
+                page = Math.min(page, pages - 1);
+                var start = page * PAGE_SIZE;
+                var end = Math.min(start + PAGE_SIZE, visible.length);
+                var fragment = document.createDocumentFragment();
+                for (var k = start; k < end; k++) {
+                    var idx = visible[k];
+                    var tr = document.createElement('tr');
+                    tr.className = severity(idx);
+                    for (var col = 0; col < 8; col++) {
+                        var td = document.createElement('td');
+                        td.textContent = cellText(rows[idx], col);
+                        tr.appendChild(td);
+                    }
+                    fragment.appendChild(tr);
+                }
+                tbody.replaceChildren(fragment);
+                document.getElementById('pagerInfo').textContent = visible.length
+                    ? 'Rows ' + (start + 1) + '-' + end + ' of ' + visible.length + ' (page ' + (page + 1) + ' of ' + pages + ')'
+                    : 'No matching incidents';
+                document.getElementById('pagerPrev').disabled = page === 0;
+                document.getElementById('pagerNext').disabled = page >= pages - 1;
+            }
+
+            headers.forEach(function(th, idx) {
+                th.style.cursor = 'pointer';
+                th.addEventListener('click', function() {
+                    sortTable(idx);
+                });
+            });
+            function sortTable(colIdx) {
+                sortOrder[colIdx] = !sortOrder[colIdx];
+                var ascending = sortOrder[colIdx];
+                // Reset all arrows
+                for (let i = 0; i < headers.length; i++) {
+                    document.getElementById('sort-arrow-' + i).innerHTML = '';
+                }
+                // Set arrow for sorted column
+                let arrow = ascending ? '&#9650;' : '&#9660;'; // ▲ or ▼
+                document.getElementById('sort-arrow-' + colIdx).innerHTML = arrow;
+                var compare;
+                if (numbers[colIdx]) {
+                    var values = numbers[colIdx];
+                    compare = function(a, b) { return values[a] - values[b]; };
+                } else if (ranks[colIdx]) {
+                    var rank = ranks[colIdx];
+                    compare = function(a, b) { return rank[rows[a][colIdx]] - rank[rows[b][colIdx]]; };
+                } else {
+                    compare = function(a, b) {
+                        var v1 = rows[a][colIdx], v2 = rows[b][colIdx];
+                        return v1 < v2 ? -1 : (v1 > v2 ? 1 : 0);
+                    };
+                }
+                order.sort(ascending ? compare : function(a, b) { return compare(b, a); });
+                applyFilter();
+            }
+
+            // Filter logic: one lower-cased haystack per row, built on first use
+            var filterInput = document.getElementById('tableFilter');
+            function applyFilter() {
+                var val = filterInput.value.toLowerCase();
+                if (!val) {
+                    visible = order;
+                } else {
+                    if (!haystack) {
+                        haystack = new Array(n);
+                        for (var i = 0; i < n; i++) {
+                            var cells = [];
+                            for (var col = 0; col < 8; col++) { cells.push(cellText(rows[i], col)); }
+                            haystack[i] = cells.join('\u0001').toLowerCase();
+                        }
+                    }
+                    visible = order.filter(function(i) { return haystack[i].indexOf(val) !== -1; });
+                }
+                page = 0;
+                render();
+            }
+            var filterTimer = null;
+            filterInput.addEventListener('input', function() {
+                clearTimeout(filterTimer);
+                filterTimer = setTimeout(applyFilter, FILTER_DELAY_MS);
+            });
+            document.getElementById('pagerPrev').addEventListener('click', function() { page--; render(); });
+            document.getElementById('pagerNext').addEventListener('click', function() { page++; render(); });
+            render();
+        });"""
+
+
+class PlanAggregates:
+    """Dashboard aggregates, accumulated in a single pass over the plan."""
+
+    def __init__(self):
+        self.total_incidents = 0
+        self.module_counts = Counter()
+        self.failure_type_counts = Counter()
+        self.environment_counts = Counter()
+        self.module_minutes = Counter()
+        self.priority_histogram = Counter()
+        # Whether the incidents arrived in report_sort_key order
+        self.in_order = True
+        self._last_key = None
 
-    # Calculate dashboard summary
-    total_incidents = len(results)
-    module_counts = Counter([r.get('module', '') for r in results])
-    failure_type_counts = Counter([r.get('failure_type', '') for r in results])
-    environment_counts = Counter([r.get('environment', '') for r in results])
+    def add(self, r):
+        self.total_incidents += 1
+        module = r.get('module', '')
+        self.module_counts[module] += 1
+        self.failure_type_counts[r.get('failure_type', '')] += 1
+        self.environment_counts[r.get('environment', '')] += 1
+        final_minutes = r.get('final_minutes')
+        if isinstance(final_minutes, (int, float)):
+            self.module_minutes[module] += final_minutes
+        score = r.get('priority_score')
+        if isinstance(score, (int, float)):
+            self.priority_histogram[math.floor(score)] += 1
+        key = report_sort_key(r)
+        if self.in_order and self._last_key is not None and key < self._last_key:
+            self.in_order = False
+        self._last_key = key
+
+    def module_minutes_data(self):
+        modules = list(self.module_counts.keys())
+        return modules, [round(self.module_minutes[m], 1) for m in modules]
+
+    def priority_histogram_data(self):
+        bins = list(self.priority_histogram)
+        bins.sort()
+        return [f"{b}-{b + 1}" for b in bins], [self.priority_histogram[b] for b in bins]
+
+
+TRENDS_SECTION = '''
+        <h2>Trends (last {days} days of history)</h2>
+        <div class="dashboard">
+            <div class="dashboard-flex">
+                <div class="dashboard-section">
+                    <div style="margin-bottom: 10px; font-size: 1.2em; font-weight: bold;">Final Minutes per Module per Day</div>
+                    <canvas id="moduleMinutesTrendChart" width="600" height="320"></canvas>
+                </div>
+                <div class="dashboard-section">
+                    <div style="margin-bottom: 10px; font-size: 1.2em; font-weight: bold;">Incidents per Failure Type per Day</div>
+                    <canvas id="failureTypeTrendChart" width="600" height="320"></canvas>
+                </div>
+            </div>
+        </div>
+        <script>
+            function makeLineConfig(trend, colors) {{
+                return {{
+                    type: 'line',
+                    data: {{
+                        labels: trend.days,
+                        datasets: Object.keys(trend.series).map(function(name, i) {{
+                            return {{ label: name, data: trend.series[name], borderColor: colors[i % colors.length],
+                                      backgroundColor: colors[i % colors.length], fill: false, tension: 0.2 }};
+                        }})
+                    }},
+                    options: {{
+                        plugins: {{ legend: {{ display: true, position: 'bottom' }}, datalabels: {{ display: false }} }},
+                        scales: {{ y: {{ beginAtZero: true }} }}
+                    }}
+                }};
+            }}
+            new Chart(document.getElementById('moduleMinutesTrendChart'), makeLineConfig({module_minutes}, proBarColors));
+            new Chart(document.getElementById('failureTypeTrendChart'), makeLineConfig({failure_type_incidents}, proBarColors));
+        </script>'''
+
+
+def render_trends(trends):
+    """Trends section from incident_store.load_trends() rollups, or '' without history."""
+    if not trends:
+        return ''
+    return TRENDS_SECTION.format(days=len(trends['module_minutes']['days']),
+                                 module_minutes=_json_for_script(trends['module_minutes']),
+                                 failure_type_incidents=_json_for_script(trends['failure_type_incidents']))
+
+
+def render_clusters(clusters):
+    """Near-duplicate section from an incident_clustering cluster plan, or '' without one."""
+    if not clusters:
+        return ''
+    repeated = [c for c in clusters if c['member_count'] > 1]
+    total = sum(c['total_final_minutes'] for c in clusters)
+    dedup = sum(c['dedup_final_minutes'] for c in clusters)
+    parts = [f'''
+        <h2>Near-duplicate Clusters</h2>
+        <div class="dashboard">
+            <strong>Clusters:</strong> {len(clusters)} for {sum(c['member_count'] for c in clusters)} incidents
+            ({len(repeated)} with repeats)<br>
+            <strong>Final minutes:</strong> {total:.1f} listed, {dedup:.1f} after deduplication''']
+    for c in repeated:
+        rows = ''.join(
+            f"<tr><td>{escape(str(m['test_id']))}</td><td>{escape(str(m['environment']))}</td>"
+            f"<td>{escape(str(m['failure_type']))}</td><td>{_cell(m['final_minutes'])}</td>"
+            f"<td>{_cell(m['priority_score'])}</td></tr>"
+            for m in c['members'])
+        parts.append(f'''
+            <details class="cluster">
+                <summary>#{c['cluster_id']} {escape(str(c['module']))} &mdash; {c['member_count']} incidents,
+                    priority {_cell(c['priority_score'])}, {_cell(c['dedup_final_minutes'])} min
+                    (listed {_cell(c['total_final_minutes'])})</summary>
+                <table>
+                    <thead><tr><th>Test ID</th><th>Environment</th><th>Failure Type</th><th>Final Minutes</th><th>Priority Score</th></tr></thead>
+                    <tbody>{rows}</tbody>
+                </table>
+            </details>''')
+    parts.append('''
+        </div>''')
+    return ''.join(parts)
+
+
+def render_schedule(schedule):
+    """Capacity utilization section from a work_scheduler schedule, or '' without one."""
+    if not schedule:
+        return ''
+    engineers = schedule['engineers']
+    rows = ''.join(
+        f"<tr><td>{escape(e['name'])}</td><td>{escape(', '.join(e['modules'] or ['any']))}</td>"
+        f"<td>{len(e['queue'])}</td><td>{_cell(e['assigned_minutes'])}</td><td>{_cell(e['capacity_minutes'])}</td>"
+        f"<td>{e['utilization'] * 100:.1f}%</td><td>{_cell(e['priority_total'])}</td></tr>"
+        for e in engineers)
+    labels = _json_for_script([e['name'] for e in engineers])
+    utilization = _json_for_script([round(e['utilization'] * 100, 1) for e in engineers])
+    return f'''
+        <h2>Capacity Utilization</h2>
+        <div class="dashboard">
+            <strong>Assigned:</strong> {schedule['assigned_incidents']} incidents, {schedule['assigned_minutes']:.1f} of
+            {schedule['capacity_minutes']:.1f} minutes ({schedule['utilization'] * 100:.1f}%), priority {schedule['assigned_priority']:.1f}<br>
+            <strong>Spillover:</strong> {len(schedule['spillover'])} incidents, {schedule['spillover_minutes']:.1f} minutes,
+            priority {schedule['spillover_priority']:.1f}
+            <div class="dashboard-section">
+                <div style="margin-bottom: 10px; font-size: 1.2em; font-weight: bold;">Utilization per Engineer (%)</div>
+                <canvas id="utilizationChart" width="600" height="320"></canvas>
+            </div>
+            <table>
+                <thead><tr><th>Engineer</th><th>Modules</th><th>Incidents</th><th>Assigned Minutes</th><th>Capacity Minutes</th><th>Utilization</th><th>Priority Total</th></tr></thead>
+                <tbody>{rows}</tbody>
+            </table>
+        </div>
+        <script>
+            new Chart(document.getElementById('utilizationChart'), makeBarConfig({labels}, {utilization}, proBarColors));
+        </script>'''
+
+
+def render_header(aggregates, trends=None, clusters=None, schedule=None):
+    # Dashboard summary (accumulated by PlanAggregates)
+    total_incidents = aggregates.total_incidents
+    module_counts = aggregates.module_counts
+    failure_type_counts = aggregates.failure_type_counts
+    environment_counts = aggregates.environment_counts
 
 
     # Use all modules for the bar graph
@@ -53,9 +344,15 @@ def generate_html_report(plan_json_path, html_path):
     failure_type_counts_data_js = json.dumps(failure_type_counts_data)
     environment_labels_js = json.dumps(environment_labels)
     environment_counts_data_js = json.dumps(environment_counts_data)
+    minutes_labels, minutes_data = aggregates.module_minutes_data()
+    module_minutes_labels_js = json.dumps(minutes_labels)
+    module_minutes_data_js = json.dumps(minutes_data)
+    histogram_labels, histogram_data = aggregates.priority_histogram_data()
+    priority_histogram_labels_js = json.dumps(histogram_labels)
+    priority_histogram_data_js = json.dumps(histogram_data)
 
     # HTML header, external CSS, and Chart.js
-    html = f'''
+    return f'''
     <html>
     <head>
         <title>E-Commerce Incidents Report</title>
@@ -63,52 +360,7 @@ def generate_html_report(plan_json_path, html_path):
         <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
         <script src="https://cdn.jsdelivr.net/npm/chartjs-plugin-datalabels@2.2.0"></script>
         <script>
-        // Table sort and filter logic
-        document.addEventListener('DOMContentLoaded', function() {{
-            var table = document.getElementById('incidentsTable');
-            var headers = table.querySelectorAll('th');
-            var sortOrder = {{}};
-            headers.forEach(function(th, idx) {{
-                th.style.cursor = 'pointer';
-                th.addEventListener('click', function() {{
-                    sortTable(idx);
-                }});
-            }});
-            function sortTable(colIdx) {{
-                var tbody = table.querySelector('tbody');
-                var rows = Array.from(tbody.querySelectorAll('tr'));
-                var type = headers[colIdx].getAttribute('data-type') || 'string';
-                sortOrder[colIdx] = !sortOrder[colIdx];
-                // Reset all arrows
-                for (let i = 0; i < headers.length; i++) {{
-                    document.getElementById('sort-arrow-' + i).innerHTML = '';
-                }}
-                // Set arrow for sorted column
-                let arrow = sortOrder[colIdx] ? '&#9650;' : '&#9660;'; // ▲ or ▼
-                document.getElementById('sort-arrow-' + colIdx).innerHTML = arrow;
-                rows.sort(function(a, b) {{
-                    var v1 = a.children[colIdx].textContent.trim();
-                    var v2 = b.children[colIdx].textContent.trim();
-                    if (type === 'number') {{
-                        v1 = parseFloat(v1) || 0;
-                        v2 = parseFloat(v2) || 0;
-                    }}
-                    if (v1 < v2) return sortOrder[colIdx] ? -1 : 1;
-                    if (v1 > v2) return sortOrder[colIdx] ? 1 : -1;
-                    return 0;
-                }});
-                rows.forEach(function(row) {{ tbody.appendChild(row); }});
-            }}
-            // Filter logic
-            var filterInput = document.getElementById('tableFilter');
-            filterInput.addEventListener('input', function() {{
-                var val = filterInput.value.toLowerCase();
-                var tbody = table.querySelector('tbody');
-                Array.from(tbody.querySelectorAll('tr')).forEach(function(row) {{
-                    row.style.display = Array.from(row.children).some(function(td) {{ return td.textContent.toLowerCase().indexOf(val) !== -1; }}) ? '' : 'none';
-                }});
-            }});
-        }});
+{TABLE_SCRIPT}
         </script>
     </head>
     <body>
@@ -129,6 +381,16 @@ def generate_html_report(plan_json_path, html_path):
                     <canvas id="environmentsChart" width="250" height="250"></canvas>
                 </div>
             </div>
+            <div class="dashboard-flex">
+                <div class="dashboard-section">
+                    <div style="margin-bottom: 10px; font-size: 1.2em; font-weight: bold;">Final Minutes by Module</div>
+                    <canvas id="moduleMinutesChart" width="400" height="320"></canvas>
+                </div>
+                <div class="dashboard-section">
+                    <div style="margin-bottom: 10px; font-size: 1.2em; font-weight: bold;">Priority Score Distribution</div>
+                    <canvas id="priorityHistogramChart" width="400" height="320"></canvas>
+                </div>
+            </div>
         </div>
         <script>
             Chart.register(window.ChartDataLabels);
@@ -202,7 +464,9 @@ def generate_html_report(plan_json_path, html_path):
             new Chart(document.getElementById('modulesChart'), makeBarConfig({module_labels_js}, {module_counts_data_js}, proBarColors));
             new Chart(document.getElementById('failureTypesChart'), makePieConfig({failure_type_labels_js}, {failure_type_counts_data_js}, proPieColors));
             new Chart(document.getElementById('environmentsChart'), makePieConfig({environment_labels_js}, {environment_counts_data_js}, proPieColors));
-        </script>
+            new Chart(document.getElementById('moduleMinutesChart'), makeBarConfig({module_minutes_labels_js}, {module_minutes_data_js}, proBarColors));
+            new Chart(document.getElementById('priorityHistogramChart'), makeBarConfig({priority_histogram_labels_js}, {priority_histogram_data_js}, proBarColors));
+        </script>{render_trends(trends)}{render_clusters(clusters)}{render_schedule(schedule)}
         <h2>Incidents Table (sorted by priority)</h2>
         <div style="margin-bottom: 10px; display: flex; align-items: center; justify-content: space-between;">
             <div>
@@ -227,59 +491,284 @@ def generate_html_report(plan_json_path, html_path):
             </tr>
             </thead>
             <tbody>
-    '''
-
-    # Sort results by priority_score descending, then module ascending
-    sorted_results = sorted(
-        results,
-        key=lambda r: (-r.get('priority_score', 0), str(r.get('module', '')))
-    )
-    for result in sorted_results:
-        score = result.get('priority_score', 0)
-        if score > 7:
-            row_class = 'high'
-        elif 4 <= score <= 7:
-            row_class = 'medium'
-        else:
-            row_class = 'low'
-        base_minutes = result.get('base_minutes', '')
-        final_minutes = result.get('final_minutes', '')
-        priority_score = result.get('priority_score', '')
-        # Format decimals to one decimal point if they are numbers
-        if isinstance(base_minutes, float):
-            base_minutes = f"{base_minutes:.1f}"
-        if isinstance(final_minutes, float):
-            final_minutes = f"{final_minutes:.1f}"
-        if isinstance(priority_score, float):
-            priority_score = f"{priority_score:.3f}"
-        html += f'<tr class="{row_class}">' \
-                f'<td>{result.get("test_id", "")}</td>' \
-                f'<td>{result.get("module", "")}</td>' \
-                f'<td>{result.get("environment", "")}</td>' \
-                f'<td>{result.get("failure_type", "")}</td>' \
-                f'<td>{", ".join(result.get("impacted_layers", []))}</td>' \
-                f'<td>{base_minutes}</td>' \
-                f'<td>{final_minutes}</td>' \
-                f'<td>{priority_score}</td></tr>'
-
-    html += '''
             </tbody>
         </table>
+        <div class="pager">
+            <button id="pagerPrev" type="button">&laquo; Prev</button>
+            <span id="pagerInfo"></span>
+            <button id="pagerNext" type="button">Next &raquo;</button>
+        </div>
+        <script type="application/json" id="incidentsData">{{"rows":['''
+
+
+def _cell(value):
+    # Format decimals to one decimal point if they are numbers
+    return f"{value:.1f}" if isinstance(value, float) else f"{value}"
+
+
+def _json_for_script(value):
+    # '<' never appears outside JSON strings, so escaping it keeps "</script>" out.
+    return json.dumps(value).replace('<', '\\u003c')
+
+
+class RowEncoder:
+    """Encodes incidents as compact JSON rows with dictionary-encoded categories.
+
+    A row is [test_id, module, environment, failure_type, layers, base_minutes,
+    final_minutes, priority_score]. The three categorical columns hold indexes
+    into per-column dictionaries, and every other cell holds its display text.
+    """
+
+    CATEGORIES = ('module', 'environment', 'failure_type')
+
+    def __init__(self):
+        self.dictionaries = {name: {} for name in self.CATEGORIES}
+
+    def _code(self, name, value):
+        text = f"{value}"
+        codes = self.dictionaries[name]
+        code = codes.get(text)
+        if code is None:
+            code = codes[text] = len(codes)
+        return code
+
+    def encode(self, result):
+        priority_score = result.get('priority_score', '')
+        return [
+            f"{result.get('test_id', '')}",
+            self._code('module', result.get('module', '')),
+            self._code('environment', result.get('environment', '')),
+            self._code('failure_type', result.get('failure_type', '')),
+            ", ".join(result.get("impacted_layers", [])),
+            _cell(result.get('base_minutes', '')),
+            _cell(result.get('final_minutes', '')),
+            f"{priority_score:.3f}" if isinstance(priority_score, float) else f"{priority_score}",
+        ]
+
+    def dictionaries_json(self):
+        return _json_for_script({name: list(codes) for name, codes in self.dictionaries.items()})
+
+
+def render_row(result, encoder):
+    return _json_for_script(encoder.encode(result))
+
+
+FOOTER = '''],"dictionaries":{dictionaries}}}</script>
     </body>
     </html>
     '''
 
+
+def _write_document(out, aggregates, results, trends=None, clusters=None, schedule=None):
+    out.write(render_header(aggregates, trends, clusters, schedule))
+    encoder = RowEncoder()
+    chunk = []
+    first = True
+    for result in results:
+        chunk.append(render_row(result, encoder))
+        if len(chunk) >= ROW_CHUNK_SIZE:
+            out.write(('' if first else ',') + ','.join(chunk))
+            first = False
+            chunk = []
+    if chunk:
+        out.write(('' if first else ',') + ','.join(chunk))
+    out.write(FOOTER.format(dictionaries=encoder.dictionaries_json()))
+
+
+def write_html_report(results, out, presorted=None, trends=None, clusters=None, schedule=None):
+    """Write the report for results (a list or any iterable) to the text stream out.
+
+    The incidents are read once: chart aggregates and the sort-order check are
+    accumulated in that pass. Iterables are spooled to a temporary file as
+    JSON lines in the same pass and rendered from there, so memory stays flat
+    for sorted plans. presorted=True skips sorting; None sorts only if the
+    incidents arrived out of order. trends (from incident_store.load_trends)
+    adds the history section, clusters (an incident_clustering cluster
+    plan) the near-duplicate section and schedule (a work_scheduler
+    schedule) the capacity utilization section.
+    """
+    from instrumentation import current
+    metrics = current()
+    aggregates = PlanAggregates()
+    if isinstance(results, list):
+        for result in results:
+            aggregates.add(result)
+        metrics.count('incidents', aggregates.total_incidents)
+        if not presorted and not (presorted is None and aggregates.in_order):
+            with metrics.stage('sort'):
+                results = sorted(results, key=report_sort_key)
+        _write_document(out, aggregates, results, trends, clusters, schedule)
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT, mode='w+', encoding='utf-8') as spool:
+        for result in results:
+            aggregates.add(result)
+            spool.write(json.dumps(result))
+            spool.write('\n')
+        metrics.count('incidents', aggregates.total_incidents)
+        spool.seek(0)
+        records = (json.loads(line) for line in spool)
+        if not presorted and not (presorted is None and aggregates.in_order):
+            with metrics.stage('sort'):
+                records = sorted(records, key=report_sort_key)
+        _write_document(out, aggregates, records, trends, clusters, schedule)
+
+
+def _iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(chunk_size)
+        eof = not data
+        buf = buf[pos:] + data
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    fill()
+    skip_whitespace()
+    if buf[pos:pos + 1] != '[':
+        raise ValueError("Plan JSON must be an array of incidents")
+    pos += 1
+    skip_whitespace()
+    if buf[pos:pos + 1] == ']':
+        return
+    while True:
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+            # A value ending exactly at the buffer edge may be cut short.
+            complete = end < len(buf) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            fill()
+            continue
+        yield value
+        pos = end
+        skip_whitespace()
+        sep = buf[pos:pos + 1]
+        pos += 1
+        if sep == ']':
+            return
+        if sep != ',':
+            raise ValueError(f"Expected ',' or ']' in plan JSON, got {sep!r}")
+        skip_whitespace()
+
+
+def iter_plan(path):
+    """Yield incidents from a plan file: a JSON array, JSON lines or a columnar plan."""
+    from columnar_plan import is_columnar_plan, iter_columnar_plan
+    if is_columnar_plan(path):
+        yield from iter_columnar_plan(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(READ_CHUNK_SIZE).lstrip()
+        f.seek(0)
+        if head.startswith('['):
+            yield from _iter_json_array(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def generate_html_report(plan_json_path, html_path, presorted=None, history_path=None, clusters_path=None,
+                         schedule_path=None):
+    from instrumentation import Metrics
+    metrics = Metrics('generate_html_report')
     # Ensure the output directory exists
+    html_result_dir = os.path.join("test_results", "html_result")
+    html_path = os.path.join(html_result_dir, "report.html")
     output_dir = os.path.dirname(html_path)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
-    # Write HTML file
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # Copy style.css to html_result directory
+    src_css = os.path.join('report_generation_utils', 'style.css')
+    dst_css = os.path.join(html_result_dir, 'style.css')
+    if os.path.exists(src_css):
+        import shutil
+        shutil.copyfile(src_css, dst_css)
+    # Trend charts come from the history store's daily rollups when one exists
+    trends = clusters = schedule = None
+    with metrics.stage('read'):
+        if history_path:
+            from incident_store import load_trends
+            trends = load_trends(history_path)
+        if clusters_path:
+            from incident_clustering import load_clusters
+            clusters = load_clusters(clusters_path)
+        if schedule_path:
+            from work_scheduler import load_schedule
+            schedule = load_schedule(schedule_path)
+    metrics.count('input_bytes', os.path.getsize(plan_json_path))
+    # Stream the plan (JSON array or JSON lines) and write the HTML through a large buffer;
+    # time spent parsing the plan counts as read, the rest as render.
+    with open(html_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f, \
+            metrics.active(), metrics.stage('render'):
+        write_html_report(metrics.timed(iter_plan(plan_json_path), 'read'), f, presorted=presorted, trends=trends,
+                          clusters=clusters, schedule=schedule)
+    # Stage timings and counters go next to the report
+    metrics.write(os.path.join(html_result_dir, 'report_metrics.json'), records_counter='incidents')
 
 
-if __name__ == "__main__":
-    plan_json_path = os.path.join("test_results", "final_incidents_list.json")
+def parse_args(argv=None):
+    import argparse
+    from incident_processor import CLUSTER_FILE, COLUMNAR_PLAN_FILE, PLAN_FILE, SCHEDULE_FILE, STORE_FILE
+    parser = argparse.ArgumentParser(description='Render the incident plan as an HTML dashboard.')
+    parser.add_argument('--plan', default=None, metavar='PATH',
+                        help='Plan to render: a JSON array, JSON lines or a columnar plan (default '
+                             'test_results/final_incidents_list.json, or the .col plan when only that exists)')
+    parser.add_argument('--history', nargs='?', const=STORE_FILE, default=None, metavar='PATH',
+                        help='Chart 30-day trends from this incident_processor --store history '
+                             '(default path test_results/incident_history.sqlite)')
+    parser.add_argument('--clusters', nargs='?', const=CLUSTER_FILE, default=None, metavar='PATH',
+                        help='List repeated incidents from this incident_processor --cluster plan '
+                             '(default path test_results/clustered_incidents_list.json)')
+    parser.add_argument('--schedule', nargs='?', const=SCHEDULE_FILE, default=None, metavar='PATH',
+                        help='Chart capacity utilization from this incident_processor --schedule output '
+                             '(default path test_results/work_schedule.json)')
+    args = parser.parse_args(argv)
+    if args.plan is None:
+        # incident_processor --columnar writes both; a columnar plan on its own is read as well.
+        args.plan = COLUMNAR_PLAN_FILE if not os.path.exists(PLAN_FILE) and os.path.exists(COLUMNAR_PLAN_FILE) \
+            else PLAN_FILE
+    return args
+
+
+def current_side_output(path, plan_path):
+    """path, or None if that side output is older than the plan and so left over from an earlier run."""
+    if path and os.path.exists(path) and os.path.exists(plan_path) \
+            and os.path.getmtime(path) < os.path.getmtime(plan_path):
+        print(f"Warning: {path} is older than {plan_path}; leaving it out of the report.")
+        return None
+    return path
+
+
+def main(argv=None):
+    args = parse_args(argv)
     html_path = os.path.join("test_results", "report.html")
+    clusters_path = current_side_output(args.clusters, args.plan)
+    schedule_path = current_side_output(args.schedule, args.plan)
+
+    generate_html_report(args.plan, html_path, history_path=args.history, clusters_path=clusters_path,
+                         schedule_path=schedule_path)
+    return 0
 
-    generate_html_report(plan_json_path, html_path)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
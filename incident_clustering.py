@@ -0,0 +1,225 @@
+"""Near-duplicate clustering of incidents with SimHash fingerprints.
+
+Each raw failure is fingerprinted from its module, impacted layers,
+normalized error message and log templates (log lines with the timestamp
+prefix and every token containing a digit - ids, counters, correlation ids -
+replaced by a placeholder). The weighted features are folded into a 64-bit
+SimHash, so records describing the same bug end up a few bits apart.
+
+Candidate pairs come from LSH banding: the fingerprint is cut into
+FINGERPRINT_BITS / BANDS bit bands and only fingerprints sharing a band
+value are compared. Any two fingerprints within BANDS - 1 bits share at
+least one band, so no pair within the default threshold is missed, and the
+work stays near-linear instead of comparing every pair. Identical
+fingerprints are grouped before banding.
+
+A cluster becomes one plan entry: the highest-priority member's fields plus
+the member count, the raw sum of final_minutes and a deduplicated estimate
+(the largest member's final_minutes, i.e. the bug is investigated once).
+"""
+import functools
+import hashlib
+import json
+import re
+from collections import defaultdict
+
+from incident_processor import expand_inputs, project_record, score_incidents, sort_key, warn_malformed
+from input_readers import iter_lines
+
+FINGERPRINT_BITS = 64
+BANDS = 4
+MAX_DISTANCE = BANDS - 1
+# The error message dominates, then the module; layers and log templates
+# separate different failures with the same message. On sample_data these
+# weights keep same-message incidents within 3 bits and others at least 6 apart.
+FEATURE_WEIGHTS = {
+    'module': 16,
+    'layer': 2,
+    'error': 12,
+    'log': 1,
+}
+
+_LOG_PREFIX_RE = re.compile(r'^\s*\[[^\]]*\]\s*')
+_VARIABLE_RE = re.compile(r'\S*\d\S*')
+_SPACE_RE = re.compile(r'\s+')
+_WORD_RE = re.compile(r'[a-z]+')
+
+
+def normalize_message(text):
+    """Lower-case text with tokens containing digits replaced by '<*>'."""
+    return _SPACE_RE.sub(' ', _VARIABLE_RE.sub('<*>', str(text).lower())).strip()
+
+
+def log_template(line):
+    """A log line without its timestamp prefix and with variable tokens masked."""
+    return normalize_message(_LOG_PREFIX_RE.sub('', str(line)))
+
+
+def incident_features(rec):
+    """Weighted (feature, weight) pairs describing a raw failure record."""
+    features = [(f"module:{rec.get('module')}", FEATURE_WEIGHTS['module'])]
+    layers = rec.get('impacted_layers')
+    if isinstance(layers, list):
+        features.extend((f"layer:{layer}", FEATURE_WEIGHTS['layer']) for layer in layers)
+    words = _WORD_RE.findall(normalize_message(rec.get('error_message') or ''))
+    # Word bigrams keep some of the message's order.
+    features.extend((f"error:{a} {b}", FEATURE_WEIGHTS['error']) for a, b in zip(words, words[1:] or ['']))
+    logs = rec.get('logs')
+    if isinstance(logs, list):
+        features.extend((f"log:{template}", FEATURE_WEIGHTS['log']) for template in {log_template(l) for l in logs})
+    return features
+
+
+@functools.lru_cache(maxsize=65536)
+def _feature_signs(feature):
+    # Modules, layers and log templates repeat across incidents, so cache the
+    # +1/-1 vector of each feature's hash bits.
+    h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+    return tuple(1 if h >> bit & 1 else -1 for bit in range(FINGERPRINT_BITS))
+
+
+def simhash(features):
+    """64-bit SimHash of weighted features."""
+    totals = [0] * FINGERPRINT_BITS
+    for feature, weight in features:
+        for bit, sign in enumerate(_feature_signs(feature)):
+            totals[bit] += sign * weight
+    fingerprint = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def fingerprint(rec):
+    return simhash(incident_features(rec))
+
+
+def _bands(value):
+    width = FINGERPRINT_BITS // BANDS
+    mask = (1 << width) - 1
+    return [(band, value >> (band * width) & mask) for band in range(BANDS)]
+
+
+class _UnionFind:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def group_fingerprints(fingerprints, max_distance=MAX_DISTANCE):
+    """Group indexes of fingerprints within max_distance bits; returns lists of indexes.
+
+    max_distance above BANDS - 1 may miss pairs that share no band.
+    """
+    by_value = defaultdict(list)
+    for idx, value in enumerate(fingerprints):
+        by_value[value].append(idx)
+    values = list(by_value)
+    uf = _UnionFind(range(len(values)))
+    buckets = defaultdict(list)
+    for vid, value in enumerate(values):
+        for band in _bands(value):
+            buckets[band].append(vid)
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if bin(values[a] ^ values[b]).count('1') <= max_distance:
+                    uf.union(a, b)
+    groups = defaultdict(list)
+    for vid, value in enumerate(values):
+        groups[uf.find(vid)].extend(by_value[value])
+    return sorted(sorted(group) for group in groups.values())
+
+
+def read_raw_records(inputs):
+    """Yield full raw failure records, skipping malformed lines."""
+    paths = expand_inputs(inputs)
+    for path in paths:
+        for idx, line in enumerate(iter_lines(path), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError as e:
+                warn_malformed(idx, e, path if len(paths) > 1 else None)
+                continue
+            if isinstance(rec, dict):
+                yield rec
+
+
+class ClusterBuilder:
+    """Fingerprints raw failure records batch by batch, for clusters() to group at the end.
+
+    Only the projected record and the fingerprint of each are kept.
+    """
+
+    def __init__(self, policy, max_distance=MAX_DISTANCE):
+        self.policy = policy
+        self.max_distance = max_distance
+        self.projected = []
+        self.fingerprints = []
+
+    def add(self, records):
+        for rec in records:
+            self.projected.append(project_record(rec))
+            self.fingerprints.append(fingerprint(rec))
+
+    def clusters(self):
+        """Cluster plan entries in plan order."""
+        incidents = list(score_incidents(self.projected, self.policy))
+        fingerprints = self.fingerprints
+        clusters = []
+        for group in group_fingerprints(fingerprints, self.max_distance):
+            members = sorted((incidents[idx] for idx in group), key=sort_key)
+            entry = {'cluster_id': None}
+            entry.update(members[0])
+            entry['fingerprint'] = f'{fingerprints[group[0]]:016x}'
+            entry['member_count'] = len(members)
+            entry['total_final_minutes'] = round(sum(m['final_minutes'] for m in members), 3)
+            entry['dedup_final_minutes'] = max(m['final_minutes'] for m in members)
+            entry['members'] = members
+            clusters.append(entry)
+        clusters.sort(key=sort_key)
+        for cluster_id, entry in enumerate(clusters, 1):
+            entry['cluster_id'] = cluster_id
+        return clusters
+
+
+def cluster_incidents(records, policy, max_distance=MAX_DISTANCE):
+    """Cluster raw failure records and return cluster plan entries in plan order."""
+    builder = ClusterBuilder(policy, max_distance)
+    builder.add(records)
+    return builder.clusters()
+
+
+def build_clusters(inputs, policy, max_distance=MAX_DISTANCE):
+    return cluster_incidents(read_raw_records(inputs), policy, max_distance)
+
+
+def write_clusters(clusters, path):
+    with open(path, 'w') as f:
+        json.dump(clusters, f, indent=2)
+    return len(clusters)
+
+
+def load_clusters(path):
+    """Cluster plan written by write_clusters, or None if the file does not exist."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,207 @@
+"""Exact, bounded-memory deduplication of failure records across inputs.
+
+Records are identified by a 16-byte BLAKE2b digest of their key fields
+(test_id and correlation_id by default). Seen digests live in an on-disk
+SQLite table; an in-memory Bloom filter answers "definitely new" for most
+records without touching disk, and new digests are written in batches. Memory
+is the Bloom filter (about 1.2 bytes per expected record at a 1% false
+positive rate) plus one batch, however many records go through.
+
+keep='first' streams in one pass and keeps the first record of every key.
+keep='latest' keeps the record with the newest timestamp (the later record
+on ties): a first pass stores each key's winning (timestamp, sequence
+number), and a second pass re-reads the inputs and merges them with the
+winners in sequence order, so there are no random lookups.
+
+Records whose key fields are all missing are always kept.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from incident_processor import PROJECTED_FIELDS, expand_inputs, read_failures, warn_malformed
+
+DEFAULT_KEYS = ('test_id', 'correlation_id')
+KEEP_POLICIES = ('first', 'latest')
+EXPECTED_RECORDS = 10_000_000
+FALSE_POSITIVE_RATE = 0.01
+FLUSH_BATCH = 100_000
+
+
+class BloomFilter:
+    """Bloom filter over 16-byte digests, using double hashing of the digest halves."""
+
+    def __init__(self, expected_items=EXPECTED_RECORDS, false_positive_rate=FALSE_POSITIVE_RATE):
+        expected_items = max(expected_items, 1)
+        self.size = max(64, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, digest):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+def key_digest(rec, keys):
+    """Digest of rec's key fields, or None if all of them are missing."""
+    values = [rec.get(key) for key in keys]
+    if all(value is None for value in values):
+        return None
+    return hashlib.blake2b(json.dumps(values, default=str).encode('utf-8', 'surrogatepass'),
+                           digest_size=16).digest()
+
+
+def timestamp_order(timestamp):
+    """Sortable value of an ISO 8601 timestamp; unparseable ones sort first."""
+    if isinstance(timestamp, str):
+        try:
+            parsed = datetime.datetime.fromisoformat(timestamp)
+        except ValueError:
+            return float('-inf')
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp()
+    return float('-inf')
+
+
+class Deduplicator:
+    """Drops repeated records from a sequence of input files; see the module docstring."""
+
+    def __init__(self, keys=DEFAULT_KEYS, keep='first', spill_dir=None,
+                 expected_records=EXPECTED_RECORDS, false_positive_rate=FALSE_POSITIVE_RATE):
+        if keep not in KEEP_POLICIES:
+            raise ValueError(f"Unknown keep policy {keep!r}; expected one of {KEEP_POLICIES}")
+        unknown = [key for key in keys if key not in PROJECTED_FIELDS]
+        if unknown or not keys:
+            raise ValueError(f"Dedup keys must be projected fields {PROJECTED_FIELDS}, got {tuple(keys)}")
+        self.keys = tuple(keys)
+        self.keep = keep
+        self.spill_dir = spill_dir
+        self.expected_records = expected_records
+        self.false_positive_rate = false_positive_rate
+        # Per input path: records read and duplicates dropped.
+        self.stats = {}
+
+    def records(self, inputs, decoder='auto'):
+        """Yield the projected records of inputs with duplicates removed."""
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        workdir = tempfile.mkdtemp(prefix='dedup-', dir=self.spill_dir)
+        conn = sqlite3.connect(os.path.join(workdir, 'keys.sqlite'))
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        try:
+            if self.keep == 'first':
+                yield from self._keep_first(conn, inputs, decoder)
+            else:
+                yield from self._keep_latest(conn, inputs, decoder)
+        finally:
+            conn.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+        self._log_stats()
+
+    def _read(self, inputs, decoder, on_malformed=warn_malformed, count=True):
+        paths = expand_inputs(inputs)
+        for path in paths:
+            self.stats.setdefault(path, {'records': 0, 'duplicates': 0})
+            for rec in read_failures(path, on_malformed, source=path if len(paths) > 1 else None,
+                                     decoder=decoder, count=count):
+                yield path, rec
+
+    def _keep_first(self, conn, inputs, decoder):
+        conn.execute('CREATE TABLE seen (digest BLOB PRIMARY KEY) WITHOUT ROWID')
+        bloom = BloomFilter(self.expected_records, self.false_positive_rate)
+        pending = set()
+
+        def seen(digest):
+            if digest in pending:
+                return True
+            return conn.execute('SELECT 1 FROM seen WHERE digest = ?', (digest,)).fetchone() is not None
+
+        for path, rec in self._read(inputs, decoder):
+            stats = self.stats[path]
+            stats['records'] += 1
+            digest = key_digest(rec, self.keys)
+            if digest is not None:
+                if digest in bloom and seen(digest):
+                    stats['duplicates'] += 1
+                    continue
+                bloom.add(digest)
+                pending.add(digest)
+                if len(pending) >= FLUSH_BATCH:
+                    conn.executemany('INSERT INTO seen VALUES (?)', ((d,) for d in pending))
+                    pending.clear()
+            yield rec
+
+    def _keep_latest(self, conn, inputs, decoder):
+        conn.execute('CREATE TABLE winners (digest BLOB PRIMARY KEY, ts REAL NOT NULL, seq INTEGER NOT NULL) '
+                     'WITHOUT ROWID')
+        bloom = BloomFilter(self.expected_records, self.false_positive_rate)
+        pending = {}
+
+        def flush():
+            conn.executemany('INSERT OR REPLACE INTO winners VALUES (?, ?, ?)',
+                             ((digest, ts, seq) for digest, (ts, seq) in pending.items()))
+            pending.clear()
+
+        # Pass 1: the winning (timestamp, sequence number) of every key.
+        for seq, (path, rec) in enumerate(self._read(inputs, decoder)):
+            self.stats[path]['records'] += 1
+            digest = key_digest(rec, self.keys)
+            if digest is None:
+                continue
+            ts = timestamp_order(rec.get('timestamp'))
+            if digest in bloom:
+                current = pending.get(digest)
+                if current is None:
+                    current = conn.execute('SELECT ts, seq FROM winners WHERE digest = ?', (digest,)).fetchone()
+                if current is not None and ts < current[0]:
+                    continue
+            else:
+                bloom.add(digest)
+            pending[digest] = (ts, seq)
+            if len(pending) >= FLUSH_BATCH:
+                flush()
+        flush()
+        del bloom
+
+        # Pass 2: merge the re-read records with the winners in sequence order. Pass 1
+        # already reported malformed lines and counted the input in the run metrics.
+        conn.execute('CREATE INDEX winners_by_seq ON winners (seq)')
+        winners = (row[0] for row in conn.execute('SELECT seq FROM winners ORDER BY seq'))
+        next_winner = next(winners, None)
+        for seq, (path, rec) in enumerate(self._read(inputs, decoder, on_malformed=lambda *args: None,
+                                                           count=False)):
+            if seq == next_winner:
+                next_winner = next(winners, None)
+                yield rec
+            elif key_digest(rec, self.keys) is None:
+                yield rec
+            else:
+                self.stats[path]['duplicates'] += 1
+
+    def _log_stats(self):
+        for path, stats in self.stats.items():
+            logging.info(f"Dedup ({self.keep} by {', '.join(self.keys)}): {path}: "
+                         f"{stats['duplicates']} duplicates of {stats['records']} records.")
+
+    def summary(self):
+        """One line per input naming how many duplicates it contributed."""
+        total = sum(stats['duplicates'] for stats in self.stats.values())
+        lines = [f"Dedup removed {total} duplicate incidents ({self.keep} by {', '.join(self.keys)})."]
+        lines.extend(f"  {path}: {stats['duplicates']} of {stats['records']}" for path, stats in self.stats.items())
+        return '\n'.join(lines)
@@ -1,43 +1,95 @@
+import argparse
+import contextlib
+import functools
+import glob
+import hashlib
 import json
-import yaml
 import os
 import logging
+import textwrap
+from collections import Counter
+from types import MappingProxyType
 
-# Set up logging
-LOG_DIR = os.path.join(os.path.dirname(__file__), 'test_results')
-os.makedirs(LOG_DIR, exist_ok=True)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_DIR = os.path.join(BASE_DIR, 'test_results')
 LOG_FILE = os.path.join(LOG_DIR, 'incident_processor.log')
-logging.basicConfig(
-    filename=LOG_FILE,
-    filemode='w',
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s: %(message)s'
-)
-
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'sample_data')
-# Load Policy.yaml
-with open(os.path.join(DATA_DIR, 'Policy.yaml'), 'r') as f:
-    policy = yaml.safe_load(f)
-
-# Load Failures.jsonl and filter required fields
-failures = []
-with open(os.path.join(DATA_DIR, 'Test_Day2_Team2.jsonl'), 'r') as f:
-    for idx, line in enumerate(f, 1):
-        line = line.strip()
-        if not line:
-            continue
+DATA_DIR = os.path.join(BASE_DIR, 'sample_data')
+INPUT_FILE = os.path.join(DATA_DIR, 'Test_Day2_Team2.jsonl')
+POLICY_FILE = os.path.join(DATA_DIR, 'Policy.yaml')
+PLAN_FILE = os.path.join(LOG_DIR, 'final_incidents_list.json')
+COLUMNAR_PLAN_FILE = os.path.join(LOG_DIR, 'final_incidents_list.col')
+STORE_FILE = os.path.join(LOG_DIR, 'incident_history.sqlite')
+INDEX_FILE = os.path.join(LOG_DIR, 'incident_index.sqlite')
+CLUSTER_FILE = os.path.join(LOG_DIR, 'clustered_incidents_list.json')
+SCHEDULE_FILE = os.path.join(LOG_DIR, 'work_schedule.json')
+PROFILE_DIR = os.path.join(LOG_DIR, 'profile')
+# Compiled policies are cached per user, outside the repository.
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'incident_processor')
+POLICY_CACHE_DIR = os.path.join(CACHE_DIR, 'policy')
+SCORE_CACHE_SIZE = 65536
+# Malformed lines past this many in a run are only counted, and reported
+# together by summarize_malformed() at the end.
+MALFORMED_WARNING_LIMIT = 20
+# Lines decoded per batch by read_failures
+DECODE_BATCH_SIZE = 32
+
+# Importing this module has no side effects: logging, policy loading and
+# plan writing only happen when main() runs.
+def configure_logging(log_file=LOG_FILE):
+    """Send log records to log_file, truncating it for the new run."""
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        filename=log_file,
+        filemode='w',
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s: %(message)s'
+    )
+
+def load_policy(path=POLICY_FILE):
+    """Load the scoring policy YAML."""
+    import yaml
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+def load_compiled_policy(path=POLICY_FILE, cache_dir=POLICY_CACHE_DIR):
+    """Load Policy.yaml as a CompiledPolicy, reusing an on-disk compiled copy keyed by the file hash.
+
+    The cache holds the flat tables as JSON, never code, and an entry is only
+    used when the hash stored inside it matches the policy file's contents.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    cache_file = os.path.join(cache_dir, f'{source_hash}.json') if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
         try:
-            rec = json.loads(line)
-            failures.append({
-                'test_id': rec.get('test_id'),
-                'module': rec.get('module'),
-                'environment': rec.get('environment'),
-                'failure_type': rec.get('failure_type'),
-                'impacted_layers': rec.get('impacted_layers', [])
-            })
-        except json.JSONDecodeError as e:
-            logging.warning(f"Skipping malformed JSON on line {idx}: {e}")
-            print(f"Warning: Skipping malformed JSON on line {idx}: {e}")
+            with open(cache_file, 'r') as f:
+                cached = json.load(f)
+            if cached.get('source_hash') == source_hash:
+                return CompiledPolicy(cached['tables'], source_hash=source_hash)
+            logging.warning(f"Ignoring policy cache {cache_file}: it does not match {path}")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.warning(f"Ignoring unreadable policy cache {cache_file}: {e}")
+
+    import yaml
+    compiled = CompiledPolicy(yaml.safe_load(raw), source_hash=source_hash)
+    if cache_file:
+        try:
+            tables = compiled.to_dict()
+            data = json.dumps({'source_hash': source_hash, 'tables': tables})
+            # Tables JSON cannot represent exactly (such as non-string keys) are not cached.
+            if json.loads(data)['tables'] == tables:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+                with open(tmp_file, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_file, cache_file)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Could not write policy cache {cache_file}: {e}")
+    return compiled
 
 # Helper functions
 def get_layer_minutes(layers, layer_minutes):
@@ -51,144 +103,797 @@ def get_multiplier(key, mapping):
 def get_module_priority(module, priorities):
     return priorities.get(module, 1)
 
-results = []
-for incident in failures:
-    module = incident.get('module')
-    environment = incident.get('environment')
-    failure_type = incident.get('failure_type')
-    impacted_layers = incident.get('impacted_layers', [])
-    test_id = incident.get('test_id', None)
-
-    # Get policy keys
-    layer_minutes = policy.get('minutes_per_impacted_layer', {})
-    env_mults = policy.get('multipliers', {}).get('by_environment', {})
-    fail_mults = policy.get('multipliers', {}).get('by_failure_type', {})
-    module_priorities = policy.get('module_priority_score', {})
-    upper_cap = policy.get('caps', {}).get('per_incident_minutes_max', None)
-
-    # Base minutes
-    base_minutes = get_layer_minutes(impacted_layers, layer_minutes)
-
-    # Multipliers
-    env_mult = get_multiplier(environment, env_mults)
-    fail_mult = get_multiplier(failure_type, fail_mults)
-
-    # Final minutes
-    final_minutes = base_minutes * env_mult * fail_mult
-    if upper_cap is not None and final_minutes > upper_cap:
-        final_minutes = upper_cap
-
-    # Priority score
-    module_priority = get_module_priority(module, module_priorities)
-    priority_score = module_priority * env_mult * fail_mult
-    priority_score = round(priority_score, 3)
-
-    results.append({
-        'test_id': test_id,
-        'module': module,
-        'environment': environment,
-        'failure_type': failure_type,
-        'impacted_layers': impacted_layers,
-        'base_minutes': base_minutes,
-        'final_minutes': final_minutes,
-        'priority_score': priority_score
-    })
+class CompiledPolicy:
+    """Immutable, flattened view of Policy.yaml with a memoized per-combination score cache."""
+
+    __slots__ = ('layer_minutes', 'env_multipliers', 'failure_multipliers',
+                 'module_priorities', 'upper_cap', 'source_hash', '_cached_score')
+
+    def __init__(self, policy, source_hash=None, cache_size=SCORE_CACHE_SIZE):
+        policy = policy or {}
+        multipliers = policy.get('multipliers') or {}
+        init = functools.partial(object.__setattr__, self)
+        init('layer_minutes', MappingProxyType(dict(policy.get('minutes_per_impacted_layer') or {})))
+        init('env_multipliers', MappingProxyType(dict(multipliers.get('by_environment') or {})))
+        init('failure_multipliers', MappingProxyType(dict(multipliers.get('by_failure_type') or {})))
+        init('module_priorities', MappingProxyType(dict(policy.get('module_priority_score') or {})))
+        init('upper_cap', (policy.get('caps') or {}).get('per_incident_minutes_max', None))
+        init('source_hash', source_hash)
+        init('_cached_score', functools.lru_cache(maxsize=cache_size)(self._compute))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Pickle the flat tables only; the score cache is rebuilt empty on load.
+        return (type(self), (self.to_dict(), self.source_hash))
+
+    def to_dict(self):
+        """Return the tables in Policy.yaml layout."""
+        return {
+            'minutes_per_impacted_layer': dict(self.layer_minutes),
+            'multipliers': {
+                'by_environment': dict(self.env_multipliers),
+                'by_failure_type': dict(self.failure_multipliers),
+            },
+            'module_priority_score': dict(self.module_priorities),
+            'caps': {'per_incident_minutes_max': self.upper_cap},
+        }
+
+    def _compute(self, module, environment, failure_type, layers):
+        base_minutes = get_layer_minutes(layers, self.layer_minutes)
+        env_mult = get_multiplier(environment, self.env_multipliers)
+        fail_mult = get_multiplier(failure_type, self.failure_multipliers)
+
+        final_minutes = base_minutes * env_mult * fail_mult
+        if self.upper_cap is not None and final_minutes > self.upper_cap:
+            final_minutes = self.upper_cap
+
+        module_priority = get_module_priority(module, self.module_priorities)
+        priority_score = round(module_priority * env_mult * fail_mult, 3)
+        return base_minutes, final_minutes, priority_score
+
+    def score(self, module, environment, failure_type, layers):
+        """Return (base_minutes, final_minutes, priority_score) for one incident."""
+        # Layers are keyed as an ordered tuple rather than a frozenset so that
+        # repeated layers keep counting towards base_minutes.
+        try:
+            return self._cached_score(module, environment, failure_type, tuple(layers) if layers else ())
+        except TypeError:
+            # Unhashable values (e.g. nested lists in a layer) bypass the cache.
+            return self._compute(module, environment, failure_type, layers)
+
+    def cache_info(self):
+        return self._cached_score.cache_info()
+
+def compile_policy(policy):
+    """Return policy as a CompiledPolicy, compiling a raw dict if needed."""
+    if isinstance(policy, CompiledPolicy):
+        return policy
+    return CompiledPolicy(policy)
+
+# Streaming pipeline: read -> project -> score -> sink.
+# Every stage is a generator, so only one record is alive at a time.
+PROJECTED_FIELDS = ('test_id', 'module', 'environment', 'failure_type', 'impacted_layers', 'timestamp',
+                    'correlation_id')
+
+def project_record(rec):
+    """Keep only the fields scoring, the history store and dedup keys use."""
+    return {
+        'test_id': rec.get('test_id'),
+        'module': rec.get('module'),
+        'environment': rec.get('environment'),
+        'failure_type': rec.get('failure_type'),
+        'impacted_layers': rec.get('impacted_layers', []),
+        'timestamp': rec.get('timestamp'),
+        'correlation_id': rec.get('correlation_id')
+    }
+
+# Decoders turn one JSONL line into a projected record and raise
+# json.JSONDecodeError for malformed lines. The fast backends only decode the
+# projected fields; any line they reject is re-decoded with the stdlib so the
+# accepted lines, the results and the warning text match json.loads exactly.
+def decode_stdlib(line):
+    return project_record(json.loads(line))
+
+def _make_orjson_decoder():
+    import orjson
+
+    def decode_orjson(line):
+        try:
+            rec = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return decode_stdlib(line)
+        return project_record(rec)
+    return decode_orjson
+
+def _make_msgspec_decoder():
+    import typing
+    import msgspec
+
+    class FailureRecord(msgspec.Struct):
+        # Only these fields are materialized; logs and behaviour text are skipped.
+        test_id: typing.Any = None
+        module: typing.Any = None
+        environment: typing.Any = None
+        failure_type: typing.Any = None
+        impacted_layers: typing.Any = msgspec.field(default_factory=list)
+        timestamp: typing.Any = None
+        correlation_id: typing.Any = None
+
+    decoder = msgspec.json.Decoder(FailureRecord)
+
+    def decode_msgspec(line):
+        try:
+            rec = decoder.decode(line)
+        except (msgspec.DecodeError, UnicodeDecodeError):
+            return decode_stdlib(line)
+        return {
+            'test_id': rec.test_id,
+            'module': rec.module,
+            'environment': rec.environment,
+            'failure_type': rec.failure_type,
+            'impacted_layers': rec.impacted_layers,
+            'timestamp': rec.timestamp,
+            'correlation_id': rec.correlation_id
+        }
+    return decode_msgspec
+
+DECODER_BACKENDS = {
+    'msgspec': _make_msgspec_decoder,
+    'orjson': _make_orjson_decoder,
+    'json': lambda: decode_stdlib,
+}
+
+# read_failures yields whole records as RawFailure, for side outputs that need
+# the fields projection drops; see SideInputs.
+RAW_DECODER = 'raw'
+
+class RawFailure(dict):
+    """A whole failure record that remembers the input path and line it was read from."""
+    __slots__ = ('path', 'line')
+
+    def __init__(self, rec, path, line):
+        super().__init__(rec)
+        self.path = path
+        self.line = line
+
+@functools.lru_cache(maxsize=None)
+def _raw_loads():
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+
+    def loads(line):
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return json.loads(line)
+    return loads
+
+@functools.lru_cache(maxsize=None)
+def get_decoder(name='auto'):
+    """Return a line decoder; 'auto' picks the fastest installed backend."""
+    if name != 'auto':
+        return DECODER_BACKENDS[name]()
+    for backend in ('msgspec', 'orjson'):
+        try:
+            return DECODER_BACKENDS[backend]()
+        except ImportError:
+            continue
+    return decode_stdlib
+
+_malformed_lines = Counter()
+# Set by side_pass(): the main pass has already counted and reported the lines it re-reads.
+_side_pass = False
+# Per-path callables handed the bytes of each block the main pass reads; set by SideInputs.
+_block_taps = {}
+
+def warn_malformed(idx, error, source=None):
+    """Default handler for lines that are not valid JSON.
+
+    Only the first MALFORMED_WARNING_LIMIT lines since the last summarize_malformed() are reported one by one.
+    """
+    if _side_pass:
+        return
+    _malformed_lines[source] += 1
+    shown = _malformed_lines.total()
+    if shown > MALFORMED_WARNING_LIMIT:
+        return
+    where = f"line {idx}" if source is None else f"line {idx} of {source}"
+    logging.warning(f"Skipping malformed JSON on {where}: {error}")
+    print(f"Warning: Skipping malformed JSON on {where}: {error}")
+    if shown == MALFORMED_WARNING_LIMIT:
+        logging.warning("Further malformed lines are counted but not reported individually.")
+        print("Warning: Further malformed lines are counted but not reported individually.")
+
+def summarize_malformed():
+    """Report the malformed lines skipped since the last call, per input, and reset the count. Returns it."""
+    total = _malformed_lines.total()
+    if total > MALFORMED_WARNING_LIMIT:
+        per_input = ', '.join(f"{count} in {source}" for source, count in _malformed_lines.most_common() if source)
+        message = f"Skipped {total} malformed JSON lines" + (f" ({per_input})" if per_input else '') + '.'
+        logging.warning(message)
+        print(f"Warning: {message}")
+    _malformed_lines.clear()
+    return total
+
+@contextlib.contextmanager
+def side_pass():
+    """Re-read inputs without counting them again in the run's metrics or malformed-line warnings."""
+    global _side_pass
+    from instrumentation import untracked
+    previous, _side_pass = _side_pass, True
+    try:
+        with untracked():
+            yield
+    finally:
+        _side_pass = previous
+
+def parse_lines(lines, start=1, on_malformed=warn_malformed, source=None, decoder='auto'):
+    """Yield projected records from JSONL lines (str or bytes) numbered from start."""
+    decode = get_decoder(decoder)
+    for idx, line in enumerate(lines, start):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = decode(line)
+        except json.JSONDecodeError as e:
+            on_malformed(idx, e, source)
+            continue
+        yield rec
+
+def parse_raw_lines(lines, path, start=1, on_malformed=warn_malformed, source=None):
+    """Yield whole records from JSONL lines of path numbered from start, as RawFailure."""
+    loads = _raw_loads()
+    for idx, line in enumerate(lines, start):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = loads(line)
+        except json.JSONDecodeError as e:
+            on_malformed(idx, e, source)
+            continue
+        yield RawFailure(rec, path, idx)
+
+def read_failures(path, on_malformed=warn_malformed, source=None, decoder='auto', count=True):
+    """Yield projected failure records from a JSONL file, skipping malformed lines.
+
+    Compressed files (.gz, .bz2, .xz, .zst) are decompressed as they are read;
+    see input_readers. With decoder=RAW_DECODER the whole records are yielded
+    as RawFailure. A second read of the same input within a run passes
+    count=False, so its time is measured but its bytes, lines and records are
+    not counted again, nor handed to the path's block tap.
+    """
+    from input_readers import iter_line_blocks
+    from instrumentation import current
+    metrics = current()
+    if metrics and count:
+        metrics.count('input_bytes', os.path.getsize(path))
+    start = 1
+    # Read and decode are timed per block and per batch rather than per line. Batches
+    # stay small so decoded records are consumed before the garbage collector's
+    # first generation fills up; larger ones get promoted and slow every later collection.
+    tap = _block_taps.get(path) if count else None
+    for lines in metrics.timed(iter_line_blocks(path, on_block=tap), 'read'):
+        if count:
+            metrics.count('lines', len(lines))
+        for offset in range(0, len(lines), DECODE_BATCH_SIZE):
+            with metrics.stage('decode'):
+                batch = lines[offset:offset + DECODE_BATCH_SIZE]
+                if decoder == RAW_DECODER:
+                    records = list(parse_raw_lines(batch, path, start + offset, on_malformed, source))
+                else:
+                    records = list(parse_lines(batch, start + offset, on_malformed, source, decoder))
+            if count:
+                metrics.count('records', len(records))
+            yield from records
+        start += len(lines)
+
+def expand_inputs(inputs):
+    """Expand a path, glob pattern or list of them into an ordered list of files."""
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
+    paths = []
+    for pattern in inputs:
+        pattern = os.fspath(pattern)
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def read_inputs(inputs, on_malformed=warn_malformed, decoder='auto'):
+    """Yield projected records from every input file in order."""
+    paths = expand_inputs(inputs)
+    for path in paths:
+        # Name the file in warnings only when there is more than one.
+        yield from read_failures(path, on_malformed, source=path if len(paths) > 1 else None, decoder=decoder)
+
+def read_records(inputs, decoder='auto', dedup=None, tee=None):
+    """read_inputs, passed through an incident_dedup.Deduplicator and then tee when they are given."""
+    records = read_inputs(inputs, decoder=decoder) if dedup is None else dedup.records(inputs, decoder)
+    return records if tee is None else tee(records)
+
+def score_incidents(incidents, policy):
+    """Yield a scored incident for every projected failure record."""
+    score = compile_policy(policy).score
+
+    for incident in incidents:
+        module = incident.get('module')
+        environment = incident.get('environment')
+        failure_type = incident.get('failure_type')
+        impacted_layers = incident.get('impacted_layers', [])
+        test_id = incident.get('test_id', None)
+
+        base_minutes, final_minutes, priority_score = score(module, environment, failure_type, impacted_layers)
+
+        yield {
+            'test_id': test_id,
+            'module': module,
+            'environment': environment,
+            'failure_type': failure_type,
+            'impacted_layers': impacted_layers,
+            'base_minutes': base_minutes,
+            'final_minutes': final_minutes,
+            'priority_score': priority_score
+        }
+
+def write_plan_jsonl(results, path):
+    """Write scored incidents as JSON lines while they are produced. Returns the count."""
+    count = 0
+    with open(path, 'w') as f:
+        for incident in results:
+            f.write(json.dumps(incident))
+            f.write('\n')
+            count += 1
+    return count
+
+def write_plan_json(results, path):
+    """Write the plan as an indented JSON array, one incident at a time.
+
+    The bytes are identical to json.dump(list(results), f, indent=2).
+    """
+    count = 0
+    with open(path, 'w') as f:
+        for incident in results:
+            f.write(',\n' if count else '[\n')
+            f.write(textwrap.indent(json.dumps(incident, indent=2), '  '))
+            count += 1
+        f.write('\n]' if count else '[]')
+    return count
 
 # Sort by priority_score desc, then module asc
 def sort_key(x):
     return (-x['priority_score'], x['module'] if x['module'] is not None else '')
 
-results.sort(key=sort_key)
+def build_plan(inputs, policy, decoder='auto', dedup=None, tee=None):
+    """Materialize and sort the scored incidents; needed whenever a fully sorted plan is required."""
+    from instrumentation import current
+    results = list(score_incidents(read_records(inputs, decoder, dedup, tee), policy))
+    with current().stage('sort'):
+        results.sort(key=sort_key)
+    return results
+
+def stream_plan(inputs, policy, output_path, decoder='auto', dedup=None):
+    """Score incidents one at a time and append them to a JSONL file in input order."""
+    return write_plan_jsonl(score_incidents(read_records(inputs, decoder, dedup), policy), output_path)
 
-# Add assertions to validate generated data
 def validate_results(results, policy):
-    """Validate the processed incident data for correctness."""
+    """Validate the processed incident data for correctness.
+
+    Runs the full recomputation (see plan_validation) and raises
+    PlanValidationError, an AssertionError, describing the first violation.
+    """
+    from plan_validation import PlanValidationError, validate_plan
     logging.info("Starting data validation...")
-    
-    assert results, "Results list should not be empty"
-    assert isinstance(results, list), "Results should be a list"
-    
-    upper_cap = policy.get('caps', {}).get('per_incident_minutes_max')
-    layer_minutes = policy.get('minutes_per_impacted_layer', {})
-    env_mults = policy.get('multipliers', {}).get('by_environment', {})
-    fail_mults = policy.get('multipliers', {}).get('by_failure_type', {})
-    module_priorities = policy.get('module_priority_score', {})
-    
-    for idx, incident in enumerate(results):
-        # Test basic structure
-        assert isinstance(incident, dict), f"Incident {idx} should be a dictionary"
-        required_fields = ['test_id', 'module', 'environment', 'failure_type', 
-                          'impacted_layers', 'base_minutes', 'final_minutes', 'priority_score']
-        
-        for field in required_fields:
-            assert field in incident, f"Incident {idx} missing required field: {field}"
-        
-        # Validate data types
-        assert isinstance(incident['impacted_layers'], list), f"Incident {idx}: impacted_layers should be a list"
-        assert isinstance(incident['base_minutes'], (int, float)), f"Incident {idx}: base_minutes should be numeric"
-        assert isinstance(incident['final_minutes'], (int, float)), f"Incident {idx}: final_minutes should be numeric"
-        assert isinstance(incident['priority_score'], (int, float)), f"Incident {idx}: priority_score should be numeric"
-        
-        # Validate non-negative values
-        assert incident['base_minutes'] >= 0, f"Incident {idx}: base_minutes should be non-negative"
-        assert incident['final_minutes'] >= 0, f"Incident {idx}: final_minutes should be non-negative"
-        assert incident['priority_score'] >= 0, f"Incident {idx}: priority_score should be non-negative"
-        
-        # Validate upper cap is respected
-        if upper_cap is not None:
-            assert incident['final_minutes'] <= upper_cap, f"Incident {idx}: final_minutes {incident['final_minutes']} exceeds cap {upper_cap}"
-        
-        # Validate base_minutes calculation
-        expected_base = sum(layer_minutes.get(layer, 0) for layer in incident['impacted_layers'])
-        assert incident['base_minutes'] == expected_base, f"Incident {idx}: base_minutes calculation incorrect. Expected {expected_base}, got {incident['base_minutes']}"
-        
-        # Validate final_minutes calculation (considering multipliers and cap)
-        env_mult = env_mults.get(incident['environment'], 1.0)
-        fail_mult = fail_mults.get(incident['failure_type'], 1.0)
-        expected_final = incident['base_minutes'] * env_mult * fail_mult
-        if upper_cap is not None and expected_final > upper_cap:
-            expected_final = upper_cap
-        
-        assert abs(incident['final_minutes'] - expected_final) < 0.001, f"Incident {idx}: final_minutes calculation incorrect. Expected {expected_final}, got {incident['final_minutes']}"
-        
-        # Validate priority_score calculation
-        module_priority = module_priorities.get(incident['module'], 1)
-        expected_priority = round(module_priority * env_mult * fail_mult, 3)
-        assert abs(incident['priority_score'] - expected_priority) < 0.001, f"Incident {idx}: priority_score calculation incorrect. Expected {expected_priority}, got {incident['priority_score']}"
-    
-    # Validate sorting order (priority_score desc, then module asc)
-    for i in range(len(results) - 1):
-        current = results[i]
-        next_item = results[i + 1]
-        
-        if current['priority_score'] == next_item['priority_score']:
-            # If priority scores are equal, module should be in ascending order
-            current_module = current['module'] if current['module'] is not None else ''
-            next_module = next_item['module'] if next_item['module'] is not None else ''
-            assert current_module <= next_module, f"Sorting error at index {i}: modules not in ascending order when priority scores are equal"
+    report = validate_plan(results, policy, level='full')
+    if not report.ok:
+        raise PlanValidationError(report.first_message())
+    logging.info(f"Data validation completed successfully for {report.records_checked} incidents.")
+    print(f"✓ Data validation passed for {report.records_checked} incidents.")
+
+def finish_validation(report, report_path):
+    """Log the outcome of a validation run and write its JSON report. Returns report.ok."""
+    if report.level == 'off':
+        return True
+    report.write(report_path)
+    if report.ok:
+        logging.info(f"Data validation ({report.level}) completed successfully for {report.records_checked} incidents.")
+        print(f"✓ Data validation ({report.level}) passed for {report.records_checked} incidents.")
+    else:
+        logging.error(f"Data validation ({report.level}) failed with {report.violation_count} violation(s); "
+                      f"first: {report.first_message()}. Report: {report_path}")
+        print(f"❌ Data validation ({report.level}) failed with {report.violation_count} violation(s); "
+              f"first: {report.first_message()}. Report: {report_path}")
+    return report.ok
+
+class SideInputs:
+    """The side outputs that need the records the plan is scored from, fed by the main pass.
+
+    tee() hands each sink (by stage name) every record that survives dedup, in
+    small batches timed as that sink's stage, so the inputs are read and
+    decoded once. When a sink needs whole records the main pass reads with
+    decoder, RAW_DECODER, and tee() projects them on their way to scoring.
+    write_side_outputs() finishes the sinks after the plan is written; closing
+    drops whatever was not finished. With --incremental or --workers the plan
+    is not built from read_records(), so there are no sinks and those outputs
+    read the inputs again in a side pass.
+    """
+
+    def __init__(self, args, policy, metrics):
+        self.metrics = metrics
+        self.decoder = args.decoder
+        self.sinks = {}
+        self._stack = contextlib.ExitStack()
+        if args.incremental or args.workers > 1:
+            return
+        if args.store:
+            from incident_store import IncidentStore, run_source
+            store = self._stack.enter_context(IncidentStore(args.store))
+            self.sinks['store'] = store.start_run(policy, run_source(args.input))
+        if args.index:
+            from incident_search import IncidentIndex
+            index = self._stack.enter_context(IncidentIndex(args.index))
+            update = index.start_update(args.input, policy, complete=True)
+            self.sinks['index'] = update
+            self.decoder = RAW_DECODER
+            _block_taps.update(update.taps())
+            self._stack.callback(_block_taps.clear)
+        if args.cluster:
+            from incident_clustering import ClusterBuilder
+            self.sinks['cluster'] = ClusterBuilder(policy)
+            self.decoder = RAW_DECODER
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._stack.close()
+
+    def tee(self, records):
+        """Yield records, handing them to every sink on the way."""
+        project = self.decoder == RAW_DECODER
+        # Batches stay as small as decode batches, for the same garbage collector reason.
+        batch = []
+        for rec in records:
+            batch.append(rec)
+            if len(batch) == DECODE_BATCH_SIZE:
+                self._add(batch)
+                batch = []
+            yield project_record(rec) if project else rec
+        self._add(batch)
+
+    def _add(self, batch):
+        for name, sink in self.sinks.items():
+            with self.metrics.stage(name):
+                sink.add(batch)
+
+def record_history(args, policy, run=None):
+    """Append this run's incidents to the --store history database.
+
+    run is the incident_store.HistoryRun the main pass fed; without one the inputs are read again.
+    """
+    if run is not None:
+        seen, added = run.finish()
+    else:
+        from incident_store import record_run
+        with side_pass():
+            seen, added = record_run(args.input, policy, args.store, decoder=args.decoder)
+    print(f"History store {args.store}: {added} new of {seen} incidents.")
+
+def update_search_index(args, policy, update=None):
+    """Add this run's new failures to the --index search index.
+
+    update is the incident_search.IndexUpdate the main pass fed; without one the appended lines are read again.
+    """
+    if update is not None:
+        added = update.finish()
+    else:
+        from incident_search import index_inputs
+        with side_pass():
+            added = index_inputs(args.input, policy, args.index)
+    print(f"Search index {args.index}: {added} incidents added.")
+
+def write_cluster_plan(args, policy, builder=None):
+    """Write the --cluster near-duplicate cluster plan.
+
+    builder is the incident_clustering.ClusterBuilder the main pass fed; without one the inputs are read again.
+    """
+    from incident_clustering import build_clusters, write_clusters
+    if builder is not None:
+        clusters = builder.clusters()
+    else:
+        with side_pass():
+            clusters = build_clusters(args.input, policy)
+    write_clusters(clusters, args.cluster)
+    incidents = sum(c['member_count'] for c in clusters)
+    logging.info(f"Cluster plan written to {args.cluster}: {len(clusters)} clusters of {incidents} incidents.")
+    print(f"Cluster plan written to {args.cluster}: {len(clusters)} clusters of {incidents} incidents.")
+
+def write_work_schedule(args, results):
+    """Pack the scored incidents into --capacity or --engineers and write the --schedule."""
+    from work_scheduler import load_capacity, schedule, team_capacity, write_schedule
+    if args.capacity:
+        engineers = load_capacity(args.capacity)
+    else:
+        engineers = team_capacity(args.engineers, args.minutes_per_day, args.days)
+    result = schedule(results, engineers)
+    write_schedule(result, args.schedule)
+    message = (f"Work schedule written to {args.schedule}: {result['assigned_incidents']} incidents assigned to "
+               f"{len(engineers)} engineers ({result['utilization']:.1%} of capacity), "
+               f"{len(result['spillover'])} spilled over.")
+    logging.info(message)
+    print(message)
+
+def parse_args(argv=None):
+    from plan_validation import VALIDATION_LEVELS
+    parser = argparse.ArgumentParser(description='Score incidents against the policy and write the sorted plan.')
+    parser.add_argument('--input', nargs='+', default=[INPUT_FILE],
+                        help='Failures JSONL files or glob patterns to process, in order')
+    parser.add_argument('--policy', default=POLICY_FILE, help='Policy YAML file')
+    parser.add_argument('--output', default=PLAN_FILE, help='Plan file to write')
+    parser.add_argument('--format', choices=['json', 'jsonl'], default='json',
+                        help='json writes the sorted plan; jsonl streams incidents in input order')
+    parser.add_argument('--columnar', nargs='?', const=COLUMNAR_PLAN_FILE, default=None, metavar='PATH',
+                        help='Also write the sorted plan in the memory-mappable columnar format '
+                             '(default path test_results/final_incidents_list.col)')
+    parser.add_argument('--store', nargs='?', const=STORE_FILE, default=None, metavar='PATH',
+                        help='Also append the scored incidents to the SQLite history store '
+                             '(default path test_results/incident_history.sqlite)')
+    parser.add_argument('--index', nargs='?', const=INDEX_FILE, default=None, metavar='PATH',
+                        help='Also add new and appended failures to the search index '
+                             '(default path test_results/incident_index.sqlite; query with incident_search.py)')
+    parser.add_argument('--cluster', nargs='?', const=CLUSTER_FILE, default=None, metavar='PATH',
+                        help='Also group near-duplicate incidents into a cluster plan '
+                             '(default path test_results/clustered_incidents_list.json)')
+    parser.add_argument('--schedule', nargs='?', const=SCHEDULE_FILE, default=None, metavar='PATH',
+                        help='Also pack the incidents into engineer capacity and write per-engineer queues '
+                             '(default path test_results/work_schedule.json)')
+    parser.add_argument('--capacity', default=None, help='Capacity YAML for --schedule (see work_scheduler.py)')
+    parser.add_argument('--engineers', type=int, default=None,
+                        help='Number of interchangeable engineers for --schedule without --capacity')
+    parser.add_argument('--minutes-per-day', type=float, default=480, help='Minutes per engineer per day')
+    parser.add_argument('--days', type=float, default=1, help='Days of capacity to schedule')
+    parser.add_argument('--dedup', choices=['off', 'first', 'latest'], default='off',
+                        help='Drop repeated incidents across inputs, keeping the first or the newest by timestamp')
+    parser.add_argument('--dedup-keys', default='test_id,correlation_id',
+                        help='Comma-separated fields that identify a repeated incident')
+    parser.add_argument('--dedup-dir', default=None,
+                        help='Directory for the on-disk key set (default: system temp directory)')
+    parser.add_argument('--dedup-expected', type=int, default=10_000_000,
+                        help='Expected record count, used to size the in-memory Bloom filter')
+    parser.add_argument('--top', type=int, default=None, metavar='N',
+                        help='Only write the N highest-priority incidents, keeping at most N in memory')
+    parser.add_argument('--external-sort', action='store_true',
+                        help='Sort the full plan in spilled runs merged from disk, for inputs larger than memory')
+    parser.add_argument('--sort-run-size', type=int, default=1_000_000,
+                        help='Incidents per in-memory sorted run for --external-sort')
+    parser.add_argument('--sort-dir', default=None,
+                        help='Directory for --external-sort runs (default: system temp directory)')
+    parser.add_argument('--log-file', default=LOG_FILE, help='Log file (truncated on every run)')
+    parser.add_argument('--policy-cache-dir', default=POLICY_CACHE_DIR,
+                        help='Directory for compiled policy caches keyed by the policy file hash '
+                             '(default ~/.cache/incident_processor/policy, or under $XDG_CACHE_HOME)')
+    parser.add_argument('--no-policy-cache', action='store_true', help='Always re-parse the policy YAML')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+                        help='numpy scores incidents in vectorized batches (see batch_scoring.py)')
+    parser.add_argument('--decoder', choices=['auto'] + list(DECODER_BACKENDS), default='auto',
+                        help='JSON backend for reading failures; auto prefers msgspec, then orjson, then json')
+    parser.add_argument('--validate', choices=VALIDATION_LEVELS, default='full',
+                        help='off; inline invariant and order checks while writing; '
+                             'sample recomputes a seeded N%% against the policy; full recomputes every incident')
+    parser.add_argument('--validate-sample-rate', type=float, default=1.0,
+                        help='Percentage of incidents recomputed by --validate sample')
+    parser.add_argument('--validate-seed', type=int, default=0, help='Seed for --validate sample')
+    parser.add_argument('--validation-report', default=None,
+                        help='Validation report path (default validation_report.json next to the plan)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Score newline-aligned shards of the inputs in this many processes')
+    parser.add_argument('--shard-size', type=int, default=None,
+                        help='Target shard size in bytes for --workers (default 64 MiB)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only parse lines appended since the last run and merge them into the saved plan. '
+                             'An input whose inode, size and mtime are unchanged is trusted without being read; '
+                             'any other is rebuilt unless its consumed prefix still hashes the same')
+    parser.add_argument('--state-dir', default=None,
+                        help='Checkpoint directory for --incremental (default test_results/.incremental)')
+    parser.add_argument('--metrics', default=None,
+                        help='Per-stage timings and counters JSON (default run_metrics.json next to the plan)')
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, default=None, metavar='DIR',
+                        help='Profile the run with cProfile and tracemalloc and write the stats to DIR '
+                             '(default test_results/profile)')
+    args = parser.parse_args(argv)
+    if args.dedup != 'off' and (args.incremental or args.workers > 1):
+        parser.error('--dedup cannot be combined with --incremental or --workers')
+    if args.top is not None and args.top < 1:
+        parser.error('--top must be at least 1')
+    if (args.top or args.external_sort) and args.format == 'jsonl':
+        parser.error('--top and --external-sort order the plan and cannot be combined with --format jsonl')
+    if args.schedule and not (args.capacity or args.engineers):
+        parser.error('--schedule needs --capacity or --engineers')
+    if args.workers > 1 and args.format == 'jsonl':
+        parser.error('--workers merges sorted shards and cannot be combined with --format jsonl')
+    if args.incremental and args.format == 'jsonl':
+        parser.error('--incremental merges into the saved sorted plan and cannot be combined with --format jsonl')
+    if args.columnar and args.format == 'jsonl':
+        parser.error('--columnar writes the sorted plan and cannot be combined with --format jsonl')
+    return args
+
+def record_cache_stats(metrics, policy):
+    info = policy.cache_info()
+    logging.info(f"Score cache: {info}")
+    metrics.counters['score_cache_hits'] = info.hits
+    metrics.counters['score_cache_misses'] = info.misses
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_file)
+    from instrumentation import Metrics, profiled
+    metrics = Metrics('incident_processor')
+    _malformed_lines.clear()
+    try:
+        with metrics.active(), profiled(args.profile):
+            return run(args, metrics)
+    finally:
+        metrics.counters['malformed_lines'] = summarize_malformed()
+        metrics_path = args.metrics or os.path.join(os.path.dirname(args.output), 'run_metrics.json')
+        metrics.write(metrics_path, records_counter='incidents')
+        logging.info(f"Run metrics written to {metrics_path}.")
+        if args.profile:
+            print(f"Profile written to {args.profile}.")
+
+def run(args, metrics):
+    """Process the inputs as parse_args(argv) describes, reporting stage timings to metrics."""
+    with metrics.stage('policy'):
+        policy = load_compiled_policy(args.policy, None if args.no_policy_cache else args.policy_cache_dir)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    from plan_validation import PlanValidator
+    report_path = args.validation_report or os.path.join(output_dir, 'validation_report.json')
+    # Streamed JSONL keeps input order, so only the sorted plan gets order checks.
+    validator = PlanValidator(policy, args.validate, args.validate_sample_rate, args.validate_seed,
+                              check_order=args.format == 'json')
+
+    dedup = None
+    if args.dedup != 'off':
+        from incident_dedup import Deduplicator
+        dedup = Deduplicator(args.dedup_keys.split(','), args.dedup, args.dedup_dir, args.dedup_expected)
+
+    with SideInputs(args, policy, metrics) as side_inputs:
+        tee = side_inputs.tee if side_inputs else None
+        decoder = side_inputs.decoder
+        if args.format == 'jsonl':
+            if args.engine == 'numpy':
+                from batch_scoring import score_chunks
+                scored = score_chunks(read_records(args.input, decoder, dedup, tee), policy)
+            else:
+                scored = score_incidents(read_records(args.input, decoder, dedup, tee), policy)
+            # Incidents are scored as the writer pulls them, so time the pulls as the score stage.
+            with metrics.stage('write'):
+                count = write_plan_jsonl(validator.observe(metrics.timed(scored, 'score')), args.output)
+            metrics.counters['incidents'] = count
+            if dedup is not None:
+                print(dedup.summary())
+            record_cache_stats(metrics, policy)
+            logging.info(f"Plan streamed to {args.output} with {count} incidents.")
+            print(f"Plan streamed to {args.output} with {count} incidents.")
+            write_side_outputs(args, policy, metrics, None, side_inputs)
+            return 0 if finish_validation(validator.report, report_path) else 1
+
+        with metrics.stage('score'):
+            results, sorted_runs = compute_plan(args, policy, dedup, tee, decoder)
+        # Spilled runs are removed however the run ends, a failed validation included.
+        with sorted_runs if sorted_runs is not None else contextlib.nullcontext():
+            if args.top and len(results) > args.top:
+                results = results[:args.top]
+            metrics.counters['incidents'] = len(results)
+            if dedup is not None:
+                print(dedup.summary())
+            record_cache_stats(metrics, policy)
+
+            if args.validate in ('sample', 'full'):
+                # Recomputing levels run before writing so an invalid plan is never published.
+                logging.info("Starting data validation...")
+                with metrics.stage('validate'):
+                    report = validator.validate(results)
+                if not finish_validation(report, report_path):
+                    return 1
+                with metrics.stage('write'):
+                    write_plan_json(results, args.output)
+            else:
+                with metrics.stage('write'):
+                    write_plan_json(validator.observe(results), args.output)
+
+            logging.info(f"Plan written to {args.output} with {len(results)} incidents.")
+            print(f"Plan written to {args.output} with {len(results)} incidents.")
+            write_side_outputs(args, policy, metrics, results, side_inputs)
+            if args.validate == 'inline':
+                return 0 if finish_validation(validator.report, report_path) else 1
+            return 0
+
+def compute_plan(args, policy, dedup, tee=None, decoder=None):
+    """The sorted plan for the json format, and the plan_sorting.SortedRuns to close when it is one.
+
+    tee sees the records the plan is scored from, except with --incremental and --workers; decoder
+    overrides args.decoder for reading them.
+    """
+    sorted_runs = None
+    decoder = decoder or args.decoder
+    if args.incremental:
+        import incremental_processor
+        results = incremental_processor.update_plan(args.input, policy,
+                                                    args.state_dir or incremental_processor.STATE_DIR,
+                                                    decoder=args.decoder)
+    elif args.workers > 1:
+        from parallel_processor import build_plan_parallel
+        results = build_plan_parallel(args.input, policy, workers=args.workers,
+                                      shard_size=args.shard_size, engine=args.engine,
+                                      decoder=args.decoder)
+    elif args.top or args.external_sort:
+        import plan_sorting
+        if args.engine == 'numpy':
+            from batch_scoring import score_chunks
+            scored = score_chunks(read_records(args.input, decoder, dedup, tee), policy)
         else:
-            # Priority scores should be in descending order
-            assert current['priority_score'] >= next_item['priority_score'], f"Sorting error at index {i}: priority scores not in descending order"
-    
-    logging.info(f"Data validation completed successfully for {len(results)} incidents.")
-    print(f"✓ Data validation passed for {len(results)} incidents.")
-
-# Run validation
-try:
-    validate_results(results, policy)
-except AssertionError as e:
-    logging.error(f"Data validation failed: {e}")
-    print(f"❌ Data validation failed: {e}")
-    raise
-except Exception as e:
-    logging.error(f"Unexpected error during validation: {e}")
-    print(f"❌ Unexpected error during validation: {e}")
-    raise
-
-# Write to final_incidents_list.json in test_results
-PLAN_FILE = os.path.join(LOG_DIR, 'final_incidents_list.json')
-with open(PLAN_FILE, 'w') as f:
-    json.dump(results, f, indent=2)
+            scored = score_incidents(read_records(args.input, decoder, dedup, tee), policy)
+        if args.top:
+            results = plan_sorting.top_k(scored, args.top)
+        else:
+            results = sorted_runs = plan_sorting.external_sort(scored, args.sort_run_size, args.sort_dir)
+    elif args.engine == 'numpy':
+        from batch_scoring import build_plan_batch
+        results = build_plan_batch(args.input, policy, decoder=decoder, dedup=dedup, tee=tee)
+    else:
+        results = build_plan(args.input, policy, decoder=decoder, dedup=dedup, tee=tee)
+    return results, sorted_runs
+
+def write_side_outputs(args, policy, metrics, results, side_inputs):
+    """Write the optional outputs requested next to the plan, each timed as its own stage.
+
+    results is the sorted plan, or None when the plan was streamed to args.output as JSON lines.
+    side_inputs is the run's SideInputs.
+    """
+    if args.columnar:
+        from columnar_plan import write_columnar_plan
+        with metrics.stage('columnar'):
+            write_columnar_plan(results, args.columnar)
+        logging.info(f"Columnar plan written to {args.columnar}.")
+        print(f"Columnar plan written to {args.columnar}.")
+    if args.store:
+        with metrics.stage('store'):
+            record_history(args, policy, side_inputs.sinks.get('store'))
+    if args.index:
+        with metrics.stage('index'):
+            update_search_index(args, policy, side_inputs.sinks.get('index'))
+    if args.cluster:
+        with metrics.stage('cluster'):
+            write_cluster_plan(args, policy, side_inputs.sinks.get('cluster'))
+    if args.schedule:
+        if results is None:
+            from generate_html_report import iter_plan
+            results = iter_plan(args.output)
+        with metrics.stage('schedule'):
+            write_work_schedule(args, results)
 
-logging.info(f"Plan written to {PLAN_FILE} with {len(results)} incidents.")
-print(f"Plan written to {PLAN_FILE} with {len(results)} incidents.")
+if __name__ == '__main__':
+    # Run the importable module rather than this __main__ copy, so modules such
+    # as batch_scoring and the --workers processes that receive a pickled
+    # policy all refer to one incident_processor.CompiledPolicy (a class
+    # pickled from __main__ cannot be loaded by other entry points).
+    import incident_processor
+    raise SystemExit(incident_processor.main())
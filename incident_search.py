@@ -0,0 +1,532 @@
+"""Inverted index over raw incident text for fast triage searches.
+
+Indexing reads the full raw records, including the logs, error_message,
+correlation_id and behaviour text that the scoring pipeline skips. Each
+incident becomes a row in ``docs`` with its score, and the distinct tokens of
+its text become (token_id, doc_id) postings in a WITHOUT ROWID table, so a
+query is a few primary-key range scans. Tokens keep identifiers whole
+(``corr-3c760a54944f4999``, ``orchestrator.start``) and also index their parts,
+so ``CartService``, ``APIGW`` and correlation ids all match directly.
+
+Like incremental_processor, every indexed file is checkpointed by inode,
+consumed offset and prefix block hashes: re-indexing only reads appended
+lines, and a truncated or rotated file has its documents dropped and
+re-indexed. ``incident_processor --index`` does not read the inputs again:
+its main pass hands the index the records the plan is scored from, after
+--dedup (see IndexUpdate).
+
+Usage:
+    python incident_search.py index --input 'sample_data/*.jsonl'
+    python incident_search.py query CartService 'corr-3c76*' --limit 20
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+
+from incident_processor import (
+    INDEX_FILE,
+    POLICY_FILE,
+    compile_policy,
+    expand_inputs,
+    load_compiled_policy,
+    warn_malformed,
+)
+from incremental_processor import PrefixHasher, file_status, policy_fingerprint, prefix_hashes
+from input_readers import BLOCK_SIZE, is_compressed, iter_line_blocks
+
+TEXT_FIELDS = ('test_id', 'module', 'environment', 'failure_type', 'error_message', 'correlation_id',
+               'expected_behavior', 'actual_behavior', 'failure_categorization_reasoning')
+LIST_FIELDS = ('impacted_layers', 'logs')
+DEFAULT_LIMIT = 50
+BATCH_LINES = 10000
+
+# Identifier-like runs, allowing inner '-', '_', '.' and '/' (ids, dotted calls, paths).
+_TOKEN_RE = re.compile(r'[0-9A-Za-z]+(?:[-_./][0-9A-Za-z]+)*')
+_PART_RE = re.compile(r'[0-9A-Za-z]+')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    offset INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    prefix_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    test_id TEXT,
+    module TEXT,
+    environment TEXT,
+    failure_type TEXT,
+    impacted_layers TEXT,
+    correlation_id TEXT,
+    error_message TEXT,
+    final_minutes REAL,
+    priority_score REAL
+);
+CREATE INDEX IF NOT EXISTS docs_by_line ON docs (path, line);
+DROP INDEX IF EXISTS docs_by_path;
+CREATE TABLE IF NOT EXISTS tokens (token_id INTEGER PRIMARY KEY, token TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS postings (
+    token_id INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    PRIMARY KEY (token_id, doc_id)
+) WITHOUT ROWID;
+'''
+
+
+def _file_entry(row):
+    """A files row as an incremental_processor checkpoint entry."""
+    inode, size, mtime_ns, offset, lines, hashes = row
+    try:
+        hashes = json.loads(hashes)
+    except ValueError:
+        # Written before whole-prefix hashing; fails verification, so the file is re-indexed.
+        hashes = []
+    return {'inode': inode, 'size': size, 'mtime_ns': mtime_ns, 'offset': offset, 'lines': lines,
+            'prefix_hashes': hashes}
+
+
+def tokenize(text):
+    """Set of lower-cased search tokens in text: whole identifiers plus their parts."""
+    tokens = set()
+    for match in _TOKEN_RE.findall(text):
+        match = match.lower()
+        parts = _PART_RE.findall(match)
+        if len(parts) > 1:
+            tokens.add(match)
+        # Bare numbers (log timestamps, counters) would dominate the index.
+        tokens.update(part for part in parts if not part.isdigit())
+    return tokens
+
+
+def record_text(rec):
+    """All searchable text of a raw failure record."""
+    pieces = []
+    for field in TEXT_FIELDS:
+        value = rec.get(field)
+        if value is not None:
+            pieces.append(str(value))
+    for field in LIST_FIELDS:
+        value = rec.get(field)
+        if isinstance(value, list):
+            pieces.extend(str(item) for item in value)
+        elif value is not None:
+            pieces.append(str(value))
+    return '\n'.join(pieces)
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+class IncidentIndex:
+    """On-disk inverted index; use as a context manager or call close()."""
+
+    def __init__(self, path=INDEX_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        if 'mtime_ns' not in {row[1] for row in self.conn.execute('PRAGMA table_info(files)')}:
+            # Older indexes: their files are verified by hash until their rows are next written.
+            self.conn.execute('ALTER TABLE files ADD COLUMN mtime_ns INTEGER')
+        self._token_ids = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _token_id(self, token):
+        token_id = self._token_ids.get(token)
+        if token_id is None:
+            self.conn.execute('INSERT OR IGNORE INTO tokens (token) VALUES (?)', (token,))
+            token_id = self.conn.execute('SELECT token_id FROM tokens WHERE token = ?', (token,)).fetchone()[0]
+            self._token_ids[token] = token_id
+        return token_id
+
+    def _drop_docs(self, where, params=()):
+        # Postings are keyed by token first: delete a document set's postings in one scan.
+        self.conn.execute(f'DELETE FROM postings WHERE doc_id IN (SELECT doc_id FROM docs WHERE {where})', params)
+        self.conn.execute(f'DELETE FROM docs WHERE {where}', params)
+
+    def _drop_doc_ids(self, doc_ids):
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS dropped_docs (doc_id INTEGER PRIMARY KEY)')
+        self.conn.execute('DELETE FROM dropped_docs')
+        self.conn.executemany('INSERT INTO dropped_docs VALUES (?)', ((doc_id,) for doc_id in doc_ids))
+        self._drop_docs('doc_id IN (SELECT doc_id FROM dropped_docs)')
+
+    def _drop_file(self, path):
+        self._drop_docs('path = ?', (path,))
+        self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+
+    def _add_record(self, path, line, rec, score):
+        layers = rec.get('impacted_layers', [])
+        _, final_minutes, priority_score = score(rec.get('module'), rec.get('environment'),
+                                                 rec.get('failure_type'), layers)
+        cur = self.conn.execute(
+            'INSERT INTO docs (path, line, test_id, module, environment, failure_type, impacted_layers, '
+            'correlation_id, error_message, final_minutes, priority_score) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, line, _text(rec.get('test_id')), _text(rec.get('module')), _text(rec.get('environment')),
+             _text(rec.get('failure_type')), json.dumps(layers), _text(rec.get('correlation_id')),
+             _text(rec.get('error_message')), final_minutes, priority_score))
+        doc_id = cur.lastrowid
+        self.conn.executemany('INSERT INTO postings (token_id, doc_id) VALUES (?, ?)',
+                              ((self._token_id(token), doc_id) for token in tokenize(record_text(rec))))
+
+    def _rescore(self, score):
+        rows = self.conn.execute('SELECT doc_id, module, environment, failure_type, impacted_layers FROM docs')
+        updates = []
+        for doc_id, module, environment, failure_type, layers in rows.fetchall():
+            _, final_minutes, priority_score = score(module, environment, failure_type, json.loads(layers))
+            updates.append((final_minutes, priority_score, doc_id))
+        self.conn.executemany('UPDATE docs SET final_minutes = ?, priority_score = ? WHERE doc_id = ?', updates)
+
+    def start_update(self, inputs, policy, complete=False):
+        """Start bringing the index up to date with inputs; see IndexUpdate."""
+        return IndexUpdate(self, inputs, policy, complete)
+
+    def update(self, inputs, policy):
+        """Index new inputs and lines appended since the last update. Returns new document count."""
+        with self.conn:
+            update = self.start_update(inputs, policy)
+            update.read_new_lines()
+            return update.finish()
+
+    def _doc_ids(self, token, prefix=False):
+        if prefix:
+            cur = self.conn.execute(
+                'SELECT DISTINCT p.doc_id FROM tokens t JOIN postings p ON p.token_id = t.token_id '
+                'WHERE t.token >= ? AND t.token < ?', (token, token + '\U0010ffff'))
+        else:
+            cur = self.conn.execute(
+                'SELECT p.doc_id FROM tokens t JOIN postings p ON p.token_id = t.token_id WHERE t.token = ?',
+                (token,))
+        return {row[0] for row in cur}
+
+    def search(self, terms, limit=DEFAULT_LIMIT):
+        """Incidents containing every term (trailing '*' matches a prefix), highest priority first."""
+        if isinstance(terms, str):
+            terms = terms.split()
+        # Terms are tokenized like the indexed text, so "corr=corr-3c76..." or
+        # "CartService:" match; a prefix term is looked up as typed.
+        lookups = set()
+        for term in terms:
+            if term.endswith('*') and term.strip('*'):
+                lookups.add((term.rstrip('*').lower(), True))
+            else:
+                lookups.update((token, False) for token in tokenize(term))
+        if not lookups:
+            return []
+        matches = None
+        # Rarest-first would need counts; exact tokens are usually selective, so look them up first.
+        for token, prefix in sorted(lookups, key=lambda lookup: lookup[1]):
+            doc_ids = self._doc_ids(token, prefix)
+            matches = doc_ids if matches is None else matches & doc_ids
+            if not matches:
+                return []
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS search_hits (doc_id INTEGER PRIMARY KEY)')
+        self.conn.execute('DELETE FROM search_hits')
+        self.conn.executemany('INSERT INTO search_hits VALUES (?)', ((doc_id,) for doc_id in matches))
+        cur = self.conn.execute(
+            'SELECT d.test_id, d.module, d.environment, d.failure_type, d.correlation_id, d.error_message, '
+            'd.final_minutes, d.priority_score, d.path, d.line FROM docs d JOIN search_hits USING (doc_id) '
+            "ORDER BY d.priority_score DESC, COALESCE(d.module, '') ASC, d.doc_id ASC LIMIT ?",
+            (limit,))
+        columns = [c[0] for c in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+class _IndexedInput:
+    """One input of an IndexUpdate."""
+
+    def __init__(self, path, entry, status):
+        self.path = path
+        self.entry = entry
+        self.status = status
+        # Lines indexed before the update, and the last line to index (None: all of them).
+        self.done = entry['lines'] if entry else 0
+        self.limit = self.done
+        self.last_line = self.done
+        # For complete updates of plain files: counts and hashes the blocks the main pass reads,
+        # and the file's stat from before that read.
+        self.tap = None
+        self.stat = None
+        # The new files row: inode, size, mtime_ns, offset, lines, prefix hashes.
+        self.row = None
+        # For complete updates: the (line, doc_id) of documents indexed before, merged with
+        # the records of those lines as they arrive.
+        self.indexed = None
+        self.next_indexed = None
+        self.stale = []
+        self.missing = []
+
+
+class _ReadTap:
+    """Counts and hashes the complete lines of a plain input as the main pass reads its blocks."""
+
+    def __init__(self, entry):
+        self.size = 0
+        self.lines = 0
+        self.hasher = PrefixHasher(entry['prefix_hashes'] if entry else (), entry['offset'] if entry else 0)
+
+    def __call__(self, block):
+        # Blocks end at a newline except the last, whose tail may still be being written.
+        cut = len(block) if block.endswith(b'\n') else block.rfind(b'\n') + 1
+        # The main pass numbers lines with splitlines(): '\n', '\r' and '\r\n' each end one.
+        self.lines += block.count(b'\n', 0, cut) + block.count(b'\r', 0, cut) - block.count(b'\r\n', 0, cut)
+        self.size += len(block)
+        self.hasher.feed(memoryview(block)[:cut])
+
+
+def _complete_blocks(f, offset):
+    """Yield (lines, end offset) for blocks of the complete lines of f after offset.
+
+    A trailing line without a newline may still be being written and is left out.
+    """
+    f.seek(offset)
+    carry = b''
+    while True:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            return
+        data = carry + block
+        cut = data.rfind(b'\n') + 1
+        if cut:
+            offset += cut
+            yield data[:cut].splitlines(), offset
+            carry = data[cut:]
+        else:
+            carry = data
+
+
+class IndexUpdate:
+    """One update of an IncidentIndex, in a single transaction that finish() commits.
+
+    Starting it checks every input against its files row like
+    incremental_processor.file_status, drops the documents of changed inputs
+    and notes the lines each input already has indexed. read_new_lines() then
+    reads and indexes only the lines after them. Alternatively a run's main
+    pass feeds add() the RawFailure records its plan is scored from
+    (complete=True): new complete lines are indexed from those records, and
+    documents of earlier lines the pass no longer yields, because --dedup
+    dropped them, are removed, so the index holds the plan's incidents. The
+    main pass also hands taps() the bytes it reads of plain inputs, so their
+    complete lines are counted and hashed without reading them again.
+    """
+
+    def __init__(self, index, inputs, policy, complete=False):
+        self.index = index
+        self.conn = index.conn
+        self.complete = complete
+        policy = compile_policy(policy)
+        self.score = policy.score
+        self.added = 0
+        self.removed = 0
+        # Token ids cached during a rolled-back update would point at nothing.
+        index._token_ids.clear()
+        fingerprint = policy_fingerprint(policy)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'policy_fingerprint'").fetchone()
+        if row is not None and row[0] != fingerprint:
+            logging.info("Policy changed; re-scoring indexed incidents.")
+            index._rescore(self.score)
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('policy_fingerprint', ?)",
+                          (fingerprint,))
+        # Keyed by the paths as given, which is what RawFailure.path holds.
+        self.inputs = {path: self._prepare(path) for path in expand_inputs(inputs)}
+
+    def _prepare(self, path):
+        path = os.path.abspath(path)
+        row = self.conn.execute('SELECT inode, size, mtime_ns, offset, lines, prefix_hash FROM files '
+                                'WHERE path = ?', (path,)).fetchone()
+        entry = _file_entry(row) if row else None
+        status = file_status(path, entry)
+        if status == 'changed':
+            logging.info(f"{path} was truncated or rotated; re-indexing it.")
+            self.index._drop_file(path)
+            entry = None
+        item = _IndexedInput(path, entry, status)
+        if status != 'unchanged' and self.complete:
+            # The records themselves come from add().
+            if is_compressed(path):
+                item.limit = None
+                with open(path, 'rb') as f:
+                    self._set_row(item, f, os.fstat(f.fileno()).st_size, None)
+            else:
+                # Stat before the main pass reads it, so a later write never looks unchanged.
+                item.stat = os.stat(path)
+                item.tap = _ReadTap(entry)
+        return item
+
+    def taps(self):
+        """The block taps of the inputs, by path as given, for the main pass's reads."""
+        return {path: item.tap for path, item in self.inputs.items() if item.tap is not None}
+
+    def _set_row(self, item, f, offset, lines, st=None):
+        st = st or os.fstat(f.fileno())
+        entry = item.entry
+        item.row = [st.st_ino, st.st_size, st.st_mtime_ns, offset, lines,
+                    prefix_hashes(f, offset, entry['prefix_hashes'] if entry else (), entry['offset'] if entry else 0)]
+
+    def _add(self, item, line, rec):
+        self.index._add_record(item.path, line, rec, self.score)
+        self.added += 1
+
+    def _add_lines(self, item, lines, first_line):
+        for idx, line in enumerate(lines, first_line):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError as e:
+                warn_malformed(idx, e, item.path)
+                continue
+            if isinstance(rec, dict):
+                self._add(item, idx, rec)
+
+    def read_new_lines(self):
+        """Read and index the lines after those already indexed."""
+        for item in self.inputs.values():
+            if item.status == 'unchanged':
+                continue
+            line_no = item.done
+            with open(item.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if is_compressed(item.path):
+                    # Compressed files are indexed whole; any change re-indexes them.
+                    for block in iter_line_blocks(item.path):
+                        self._add_lines(item, block, line_no + 1)
+                        line_no += len(block)
+                    offset = st.st_size
+                else:
+                    offset = item.entry['offset'] if item.entry else 0
+                    for block, offset in _complete_blocks(f, offset):
+                        self._add_lines(item, block, line_no + 1)
+                        line_no += len(block)
+                self._set_row(item, f, offset, line_no, st)
+
+    def add(self, records):
+        """Index the new complete lines among RawFailure records of the inputs, given in line order."""
+        for rec in records:
+            item = self.inputs.get(rec.path)
+            if item is None:
+                continue
+            item.last_line = rec.line
+            # A tap has counted the lines of the blocks read so far, this record's included.
+            limit = item.tap.lines if item.tap is not None else item.limit
+            if rec.line <= item.done:
+                self._match_indexed(item, rec.line, rec)
+            elif limit is None or rec.line <= limit:
+                self._add(item, rec.line, rec)
+
+    def _indexed(self, item):
+        line = 0
+        while True:
+            rows = self.conn.execute('SELECT line, doc_id FROM docs WHERE path = ? AND line > ? AND line <= ? '
+                                     'ORDER BY line LIMIT ?', (item.path, line, item.done, BATCH_LINES)).fetchall()
+            yield from rows
+            if len(rows) < BATCH_LINES:
+                return
+            line = rows[-1][0]
+
+    def _match_indexed(self, item, line, rec=None):
+        # Documents of earlier lines without a record are stale; a record without a document is missing.
+        if item.indexed is None:
+            item.indexed = self._indexed(item)
+            item.next_indexed = next(item.indexed, None)
+        while item.next_indexed is not None and (line is None or item.next_indexed[0] < line):
+            item.stale.append(item.next_indexed[1])
+            item.next_indexed = next(item.indexed, None)
+        if line is None:
+            return
+        if item.next_indexed is not None and item.next_indexed[0] == line:
+            item.next_indexed = next(item.indexed, None)
+        else:
+            item.missing.append((line, rec))
+
+    def finish(self):
+        """Record the inputs' new state and commit. Returns the number of documents added."""
+        for item in self.inputs.values():
+            if self.complete and item.done:
+                self._match_indexed(item, None)
+                for line, rec in item.missing:
+                    self._add(item, line, rec)
+                if item.stale:
+                    self.index._drop_doc_ids(item.stale)
+                    self.removed += len(item.stale)
+            if item.tap is not None:
+                tap = item.tap
+                item.row = [item.stat.st_ino, tap.size, item.stat.st_mtime_ns, tap.hasher.offset, tap.lines,
+                            tap.hasher.result()]
+            if item.row is not None:
+                inode, size, mtime_ns, offset, lines, hashes = item.row
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO files (path, inode, size, mtime_ns, offset, lines, prefix_hash) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (item.path, inode, size, mtime_ns, offset, item.last_line if lines is None else lines,
+                     json.dumps(hashes)))
+        self.conn.commit()
+        logging.info(f"Search index {self.index.path}: {self.added} incidents added, {self.removed} removed.")
+        return self.added
+
+
+def index_inputs(inputs, policy, path=INDEX_FILE):
+    """Bring the index at path up to date with inputs. Returns new document count."""
+    with IncidentIndex(path) as index:
+        return index.update(inputs, policy)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build and query the incident search index.')
+    parser.add_argument('--index', default=INDEX_FILE, help='Index database path')
+    commands = parser.add_subparsers(dest='command', required=True)
+    index_cmd = commands.add_parser('index', help='Index new and appended failures')
+    index_cmd.add_argument('--input', nargs='+', required=True, help='Failures JSONL files or glob patterns')
+    index_cmd.add_argument('--policy', default=POLICY_FILE, help='Policy YAML file used for priority scores')
+    query_cmd = commands.add_parser('query', help='Find incidents containing every term')
+    query_cmd.add_argument('terms', nargs='+', help="Search terms; a trailing '*' matches a prefix")
+    query_cmd.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='Maximum incidents to show')
+    query_cmd.add_argument('--json', action='store_true', help='Print matches as JSON lines')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'index':
+        added = index_inputs(args.input, load_compiled_policy(args.policy), args.index)
+        print(f"Indexed {added} new incidents into {args.index}.")
+        return 0
+    with IncidentIndex(args.index) as index:
+        hits = index.search(args.terms, args.limit)
+    for hit in hits:
+        if args.json:
+            print(json.dumps(hit))
+        else:
+            print(f"{hit['priority_score']:>7} {hit['test_id']} [{hit['module']} / {hit['environment']} / "
+                  f"{hit['failure_type']}] {hit['correlation_id']}: {hit['error_message']}")
+    if not args.json:
+        print(f"{len(hits)} matching incidents.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,507 @@
+"""Resident service that keeps the policy and scored plan in memory and serves them over local HTTP.
+
+The inputs and the policy file are polled every --interval seconds. A file
+whose size, mtime and inode are unchanged is skipped with one stat() call.
+Otherwise incremental_processor classifies it: appended lines are parsed and
+merged into that file's sorted incidents, and a rewritten file is re-read on
+its own. A policy change re-scores the projected records kept in memory, so
+no JSONL is re-read. The plan is the stable merge of the per-file lists in
+input order, identical to build_plan over the same inputs.
+
+Endpoints (GET or HEAD):
+
+/                 the HTML dashboard (generate_html_report) for the current plan
+/style.css        the dashboard stylesheet
+/plan             JSON {generation, total, count, incidents}: the top ?top=N
+                  (default 100, 'all' for every incident), optionally
+                  filtered by ?module=, ?environment= and ?failure_type=
+                  (repeat a parameter or separate values with commas)
+/aggregates       JSON incident counts and final minutes per module,
+                  environment and failure type, plus the priority histogram
+/healthz          JSON generation, incident count and last refresh; never cached
+
+Rendered responses are cached per plan generation and carry a strong ETag,
+so a poll whose If-None-Match still matches gets an empty 304. A refresh that
+changes the plan starts a new generation, which invalidates the cache, and
+re-renders the dashboard and the default /plan and /aggregates in the
+background before the first poll asks for them.
+
+Usage:
+    python incident_service.py --input 'sample_data/*.jsonl' --port 8765
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import heapq
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from incident_processor import (
+    BASE_DIR,
+    DECODER_BACKENDS,
+    INPUT_FILE,
+    LOG_DIR,
+    POLICY_CACHE_DIR,
+    POLICY_FILE,
+    configure_logging,
+    expand_inputs,
+    load_compiled_policy,
+    score_incidents,
+    sort_key,
+    summarize_malformed,
+)
+
+SERVICE_LOG_FILE = os.path.join(LOG_DIR, 'incident_service.log')
+STYLE_FILE = os.path.join(BASE_DIR, 'report_generation_utils', 'style.css')
+HOST = '127.0.0.1'
+PORT = 8765
+INTERVAL = 2.0
+DEFAULT_TOP = 100
+RESPONSE_CACHE_SIZE = 256
+FILTER_FIELDS = ('module', 'environment', 'failure_type')
+# Patterns a directory given as --input expands to
+DIRECTORY_PATTERNS = ('*.jsonl', '*.jsonl.*')
+# Requests rendered ahead of the first poll after every refresh
+WARM_TARGETS = ('/', '/plan', '/aggregates')
+
+
+def _signature(path):
+    """Cheap change detector: (inode, size, mtime_ns), or None for a missing file."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class PlanSnapshot:
+    """One generation of the plan; never modified once published."""
+
+    def __init__(self, generation, results):
+        from generate_html_report import PlanAggregates
+        self.generation = generation
+        self.results = results
+        self.updated_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.aggregates = PlanAggregates()
+        for incident in results:
+            self.aggregates.add(incident)
+
+
+class _InputFile:
+    """Checkpoint entry, projected records and sorted scored incidents of one input."""
+
+    def __init__(self):
+        self.signature = None
+        self.entry = None
+        self.records = []
+        self.scored = []
+
+
+class PlanState:
+    """The policy, inputs and scored plan held in memory between refreshes.
+
+    refresh() does the blocking work and is meant to run in a worker thread;
+    readers only ever see complete PlanSnapshots through .snapshot.
+    """
+
+    def __init__(self, inputs, policy_path=POLICY_FILE, decoder='auto', policy_cache_dir=POLICY_CACHE_DIR):
+        self.inputs = [inputs] if isinstance(inputs, (str, os.PathLike)) else list(inputs)
+        self.policy_path = policy_path
+        self.decoder = decoder
+        self.policy_cache_dir = policy_cache_dir
+        self.policy = None
+        self.fingerprint = None
+        self.snapshot = None
+        self.last_refresh = None
+        self._policy_signature = None
+        self._files = {}
+
+    def paths(self):
+        patterns = []
+        for pattern in self.inputs:
+            pattern = os.fspath(pattern)
+            if os.path.isdir(pattern):
+                patterns.extend(os.path.join(pattern, p) for p in DIRECTORY_PATTERNS)
+            else:
+                patterns.append(pattern)
+        return expand_inputs(patterns)
+
+    def _reload_policy(self):
+        """Load the policy if its file changed; returns True if its tables did."""
+        from incremental_processor import policy_fingerprint
+        signature = _signature(self.policy_path)
+        if signature == self._policy_signature and self.policy is not None:
+            return False
+        policy = load_compiled_policy(self.policy_path, self.policy_cache_dir)
+        fingerprint = policy_fingerprint(policy)
+        self._policy_signature = signature
+        if fingerprint == self.fingerprint:
+            return False
+        if self.policy is not None:
+            logging.info(f"Policy {self.policy_path} changed; re-scoring {self._record_count()} cached records.")
+        self.policy, self.fingerprint = policy, fingerprint
+        return True
+
+    def _record_count(self):
+        return sum(len(f.records) for f in self._files.values())
+
+    def _update_file(self, path, state, rescore):
+        """Bring one input up to date; returns True if its incidents changed."""
+        from incremental_processor import file_status, read_appended
+        signature = _signature(path)
+        if signature == state.signature and not rescore:
+            return False
+        status = 'new' if state.entry is None else file_status(path, state.entry)
+        state.signature = signature
+        if status == 'unchanged':
+            if rescore:
+                state.scored = sorted(score_incidents(state.records, self.policy), key=sort_key)
+            return rescore
+        if status == 'changed':
+            logging.info(f"{path} was rewritten; re-reading it.")
+            state.entry, state.records, state.scored = None, [], []
+        records, state.entry = read_appended(path, state.entry, self.decoder)
+        state.records.extend(records)
+        if rescore or not state.scored:
+            state.scored = sorted(score_incidents(state.records, self.policy), key=sort_key)
+        else:
+            added = sorted(score_incidents(records, self.policy), key=sort_key)
+            state.scored = list(heapq.merge(state.scored, added, key=sort_key))
+        return bool(records) or rescore or status == 'changed'
+
+    def refresh(self):
+        """Apply new or changed inputs and policy; returns True if a new plan generation was published."""
+        start = time.perf_counter()
+        rescore = self._reload_policy()
+        # A deleted input just drops out of the plan.
+        paths = [path for path in self.paths() if os.path.exists(path)]
+        changed = rescore or self.snapshot is None or list(self._files) != paths
+        files = {}
+        for path in paths:
+            state = self._files.get(path) or _InputFile()
+            if self._update_file(path, state, rescore):
+                changed = True
+            files[path] = state
+        self._files = files
+        malformed = summarize_malformed()
+        if malformed:
+            logging.warning(f"Refresh skipped {malformed} malformed JSON lines.")
+        if changed:
+            # heapq.merge is stable across its inputs, so ties keep input-file order as in build_plan.
+            results = list(heapq.merge(*(f.scored for f in files.values()), key=sort_key))
+            generation = 0 if self.snapshot is None else self.snapshot.generation + 1
+            self.snapshot = PlanSnapshot(generation, results)
+            logging.info(f"Plan generation {generation}: {len(results)} incidents from {len(paths)} inputs "
+                         f"in {time.perf_counter() - start:.3f}s.")
+        self.last_refresh = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        return changed
+
+
+class Response:
+    def __init__(self, status, body=b'', content_type='application/json', etag=None, cacheable=True):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.cacheable = cacheable
+
+
+def json_response(value, status=200, cacheable=True):
+    body = json.dumps(value).encode('utf-8')
+    return Response(status, body, 'application/json', cacheable=cacheable)
+
+
+def error_response(status, message):
+    return json_response({'error': message}, status, cacheable=False)
+
+
+class ResponseCache:
+    """Rendered responses of the newest plan generation, least recently used evicted first."""
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, generation, key):
+        with self._lock:
+            if generation != self.generation:
+                return None
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, generation, key, response):
+        with self._lock:
+            if self.generation is not None and generation < self.generation:
+                return
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+            self._entries[key] = response
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def _values(query, name):
+    values = []
+    for value in query.get(name, []):
+        values.extend(v for v in value.split(',') if v)
+    return values
+
+
+def render_plan(snapshot, query):
+    top = (query.get('top') or [str(DEFAULT_TOP)])[-1]
+    if top == 'all':
+        top = None
+    else:
+        try:
+            top = int(top)
+        except ValueError:
+            top = 0
+        if top < 1:
+            return error_response(400, "top must be a positive integer or 'all'")
+    filters = [(field, set(values)) for field in FILTER_FIELDS if (values := _values(query, field))]
+    incidents = []
+    for incident in snapshot.results:
+        if all(str(incident.get(field)) in values for field, values in filters):
+            incidents.append(incident)
+            if top is not None and len(incidents) >= top:
+                break
+    return json_response({'generation': snapshot.generation, 'total': len(snapshot.results),
+                          'count': len(incidents), 'incidents': incidents})
+
+
+def render_aggregates(snapshot, query):
+    a = snapshot.aggregates
+    return json_response({
+        'generation': snapshot.generation,
+        'total_incidents': a.total_incidents,
+        'total_final_minutes': sum(a.module_minutes.values()),
+        'by_module': {str(m): {'incidents': n, 'final_minutes': a.module_minutes.get(m, 0)}
+                      for m, n in a.module_counts.most_common()},
+        'by_environment': {str(k): n for k, n in a.environment_counts.most_common()},
+        'by_failure_type': {str(k): n for k, n in a.failure_type_counts.most_common()},
+        'priority_histogram': {str(k): n for k, n in sorted(a.priority_histogram.items())},
+    })
+
+
+def render_dashboard(snapshot, query):
+    from generate_html_report import write_html_report
+    out = io.StringIO()
+    write_html_report(snapshot.results, out, presorted=True)
+    return Response(200, out.getvalue().encode('utf-8'), 'text/html; charset=utf-8')
+
+
+ROUTES = {
+    '/': render_dashboard,
+    '/report.html': render_dashboard,
+    '/plan': render_plan,
+    '/aggregates': render_aggregates,
+}
+
+
+def _etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    # If-None-Match uses weak comparison.
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+class IncidentService:
+    """Routes requests against a PlanState and keeps the state current while serving."""
+
+    def __init__(self, state, interval=INTERVAL):
+        self.state = state
+        self.interval = interval
+        self.cache = ResponseCache()
+        self._style = None
+        self._watcher = None
+
+    def render(self, target):
+        """The (possibly cached) Response for a GET of target, without conditional handling."""
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/') or '/'
+        if path == '/healthz':
+            snapshot = self.state.snapshot
+            return json_response({
+                'status': 'ok' if snapshot is not None else 'loading',
+                'generation': snapshot.generation if snapshot else None,
+                'incidents': len(snapshot.results) if snapshot else 0,
+                'plan_updated_at': snapshot.updated_at if snapshot else None,
+                'last_refresh': self.state.last_refresh,
+            }, cacheable=False)
+        if path == '/style.css':
+            if self._style is None:
+                with open(STYLE_FILE, 'rb') as f:
+                    body = f.read()
+                self._style = Response(200, body, 'text/css; charset=utf-8', _etag(body))
+            return self._style
+        route = ROUTES.get(path)
+        if route is None:
+            return error_response(404, f"No such endpoint: {path}")
+        snapshot = self.state.snapshot
+        if snapshot is None:
+            return error_response(503, "The plan has not been loaded yet")
+        query = parse_qs(parts.query)
+        key = (path, tuple(sorted((k, tuple(v)) for k, v in query.items())))
+        response = self.cache.get(snapshot.generation, key)
+        if response is None:
+            response = route(snapshot, query)
+            if response.cacheable:
+                response.etag = _etag(response.body)
+                self.cache.put(snapshot.generation, key, response)
+        return response
+
+    def respond(self, method, target, headers):
+        """Status line pieces, headers and body for one request; headers keys are lower case."""
+        if method not in ('GET', 'HEAD'):
+            response = error_response(405, f"{method} is not supported")
+            extra = [('Allow', 'GET, HEAD')]
+        else:
+            response = self.render(target)
+            extra = []
+        head = [('Content-Type', response.content_type)]
+        snapshot = self.state.snapshot
+        if snapshot is not None:
+            head.append(('X-Plan-Generation', str(snapshot.generation)))
+        if response.etag is not None:
+            head += [('ETag', response.etag), ('Cache-Control', 'no-cache')]
+            if _etag_matches(headers.get('if-none-match'), response.etag):
+                return 304, head, b''
+        else:
+            head.append(('Cache-Control', 'no-store'))
+        return response.status, head + extra, response.body
+
+    def warm(self):
+        for target in WARM_TARGETS:
+            self.render(target)
+
+    def refresh(self):
+        """Refresh the state and pre-render the common responses of a new generation."""
+        try:
+            if self.state.refresh():
+                self.warm()
+        except Exception:
+            # A half-written policy or input must not take the service down; keep serving the last plan.
+            logging.exception("Refresh failed; still serving the previous plan.")
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.refresh)
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._send(writer, 'HEAD', 400, [], b'', False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length:
+                    await reader.readexactly(length)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    status, head, body = self.respond(method, target, headers)
+                except Exception:
+                    logging.exception(f"Failed to answer {method} {target}")
+                    status, head, body = 500, [('Content-Type', 'application/json')], b'{"error": "internal error"}'
+                await self._send(writer, method, status, head, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, method, status, head, body, keep_alive):
+        from http import HTTPStatus
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}']
+        lines += [f'{name}: {value}' for name, value in head]
+        if status != 304:
+            lines.append(f'Content-Length: {len(body)}')
+        lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if method != 'HEAD' and body:
+            writer.write(body)
+        await writer.drain()
+
+    async def start(self, host=HOST, port=PORT):
+        """Load the plan, start listening and watching; returns the asyncio server."""
+        await asyncio.to_thread(self.refresh)
+        server = await asyncio.start_server(self.handle, host, port)
+        self._watcher = asyncio.create_task(self.watch())
+        return server
+
+    def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await self.start(host, port)
+        address = server.sockets[0].getsockname()
+        logging.info(f"Serving the plan on http://{address[0]}:{address[1]}/")
+        print(f"Serving the plan on http://{address[0]}:{address[1]}/ (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Keep the scored plan in memory and serve it over local HTTP.')
+    parser.add_argument('--input', nargs='+', default=[INPUT_FILE],
+                        help='Failures JSONL files, glob patterns or directories to watch, in order')
+    parser.add_argument('--policy', default=POLICY_FILE, help='Policy YAML file to watch')
+    parser.add_argument('--host', default=HOST, help='Address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--interval', type=float, default=INTERVAL, help='Seconds between checks for changes')
+    parser.add_argument('--decoder', choices=['auto'] + list(DECODER_BACKENDS), default='auto',
+                        help='JSON backend for reading failures')
+    parser.add_argument('--policy-cache-dir', default=POLICY_CACHE_DIR,
+                        help='Directory for compiled policy caches keyed by the policy file hash '
+                             '(default ~/.cache/incident_processor/policy, or under $XDG_CACHE_HOME)')
+    parser.add_argument('--log-file', default=SERVICE_LOG_FILE, help='Log file (truncated on start)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_file)
+    state = PlanState(args.input, args.policy, args.decoder, args.policy_cache_dir)
+    service = IncidentService(state, args.interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,258 @@
+"""Append-only SQLite history of scored incidents with daily rollups.
+
+Every run appends its scored incidents to ``incidents``; an incident already
+stored (same test_id and timestamp, a missing one counting as empty) is
+skipped, so re-processing the same dump does not double count. The same transaction folds the newly stored rows into
+``daily_rollups``, keyed by (day, module, environment, failure_type), so trend
+queries read a few rows per day instead of rescanning incidents or raw JSONL.
+"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+
+from incident_processor import STORE_FILE, compile_policy, read_inputs
+
+TREND_DAYS = 30
+ROLLUP_GROUPS = ('module', 'environment', 'failure_type')
+ROLLUP_METRICS = {
+    'incidents': 'SUM(incident_count)',
+    'base_minutes': 'SUM(total_base_minutes)',
+    'final_minutes': 'SUM(total_final_minutes)',
+    'priority_score': 'SUM(total_priority_score) / SUM(incident_count)',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    source TEXT,
+    incidents_seen INTEGER NOT NULL DEFAULT 0,
+    incidents_added INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    timestamp TEXT,
+    day TEXT,
+    test_id TEXT,
+    module TEXT,
+    environment TEXT,
+    failure_type TEXT,
+    impacted_layers TEXT,
+    base_minutes REAL,
+    final_minutes REAL,
+    priority_score REAL
+);
+CREATE INDEX IF NOT EXISTS incidents_by_time
+    ON incidents (timestamp, module, environment, failure_type);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day TEXT NOT NULL,
+    module TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    failure_type TEXT NOT NULL,
+    incident_count INTEGER NOT NULL,
+    total_base_minutes REAL NOT NULL,
+    total_final_minutes REAL NOT NULL,
+    total_priority_score REAL NOT NULL,
+    max_priority_score REAL NOT NULL,
+    PRIMARY KEY (day, module, environment, failure_type)
+) WITHOUT ROWID;
+'''
+
+# UNIQUE (test_id, timestamp) would let any number of rows with a NULL in
+# either through, so missing values are keyed as ''.
+KEY_INDEX = '''
+CREATE UNIQUE INDEX incidents_by_key ON incidents (COALESCE(test_id, ''), COALESCE(timestamp, ''))
+'''
+
+# Fold incidents stored after a given incident_id into the rollups.
+_ROLLUP_UPSERT = '''
+INSERT INTO daily_rollups
+SELECT day, COALESCE(module, ''), COALESCE(environment, ''), COALESCE(failure_type, ''),
+       COUNT(*), SUM(base_minutes), SUM(final_minutes), SUM(priority_score), MAX(priority_score)
+FROM incidents
+WHERE incident_id > ? AND day IS NOT NULL
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (day, module, environment, failure_type) DO UPDATE SET
+    incident_count = incident_count + excluded.incident_count,
+    total_base_minutes = total_base_minutes + excluded.total_base_minutes,
+    total_final_minutes = total_final_minutes + excluded.total_final_minutes,
+    total_priority_score = total_priority_score + excluded.total_priority_score,
+    max_priority_score = MAX(max_priority_score, excluded.max_priority_score)
+'''
+
+
+def incident_day(timestamp):
+    """UTC calendar day (YYYY-MM-DD) of an ISO 8601 timestamp, or None."""
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc)
+    return parsed.date().isoformat()
+
+
+def _text(value):
+    # SQLite columns are TEXT; keep strings as-is and JSON-encode anything else.
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class IncidentStore:
+    """SQLite incident history; use as a context manager or call close()."""
+
+    def __init__(self, path=STORE_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self._create_key_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _create_key_index(self):
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'incidents_by_key'").fetchone():
+            return
+        with self.conn:
+            # Stores written before the index may hold repeats with NULL keys: keep the
+            # first of each and rebuild the rollups from what is left.
+            removed = self.conn.execute(
+                "DELETE FROM incidents WHERE incident_id NOT IN (SELECT MIN(incident_id) FROM incidents "
+                "GROUP BY COALESCE(test_id, ''), COALESCE(timestamp, ''))").rowcount
+            if removed:
+                logging.info(f"History store {self.path}: removed {removed} repeated incidents.")
+                self.conn.execute('DELETE FROM daily_rollups')
+                self.conn.execute(_ROLLUP_UPSERT, (0,))
+            self.conn.execute(KEY_INDEX)
+
+    def start_run(self, policy, source=None):
+        """Start recording a run; see HistoryRun."""
+        return HistoryRun(self, policy, source)
+
+    def record_incidents(self, incidents, policy, source=None):
+        """Score projected incidents and append the ones not stored yet.
+
+        Returns (incidents seen, incidents added).
+        """
+        with self.conn:
+            run = self.start_run(policy, source)
+            run.add(incidents)
+            return run.finish()
+
+    def latest_day(self):
+        return self.conn.execute('SELECT MAX(day) FROM daily_rollups').fetchone()[0]
+
+    def trend(self, metric='final_minutes', by='module', days=TREND_DAYS, end=None):
+        """Daily metric per group over the `days` days ending at `end` (default: latest stored day).
+
+        Reads only daily_rollups. Returns {'days': [...], 'series': {group: [value per day]}},
+        with 0 for days on which a group had no incidents.
+        """
+        if by not in ROLLUP_GROUPS:
+            raise ValueError(f"Unknown trend grouping {by!r}; expected one of {ROLLUP_GROUPS}")
+        if metric not in ROLLUP_METRICS:
+            raise ValueError(f"Unknown trend metric {metric!r}; expected one of {tuple(ROLLUP_METRICS)}")
+        end = end or self.latest_day()
+        if end is None:
+            return {'days': [], 'series': {}}
+        end_date = datetime.date.fromisoformat(end)
+        all_days = [(end_date - datetime.timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        rows = self.conn.execute(
+            f'SELECT day, {by}, {ROLLUP_METRICS[metric]} FROM daily_rollups '
+            f'WHERE day BETWEEN ? AND ? GROUP BY day, {by} ORDER BY {by}, day',
+            (all_days[0], end)).fetchall()
+        position = {day: i for i, day in enumerate(all_days)}
+        series = {}
+        for day, group, value in rows:
+            series.setdefault(group, [0] * len(all_days))[position[day]] = round(value, 3)
+        return {'days': all_days, 'series': series}
+
+
+def run_source(inputs):
+    """The runs.source text for inputs given as a path, pattern or list of them."""
+    paths = [inputs] if isinstance(inputs, (str, os.PathLike)) else list(inputs)
+    return ', '.join(os.fspath(p) for p in paths)
+
+
+def record_run(inputs, policy, path=STORE_FILE, decoder='auto'):
+    """Read, score and append inputs to the history store. Returns (seen, added)."""
+    with IncidentStore(path) as store:
+        return store.record_incidents(read_inputs(inputs, decoder=decoder), policy, source=run_source(inputs))
+
+
+class HistoryRun:
+    """A run being appended to an IncidentStore, one batch of projected incidents at a time.
+
+    Everything is written in one transaction: finish() folds the new incidents
+    into the rollups and commits, and closing the store before that discards
+    the run.
+    """
+
+    def __init__(self, store, policy, source=None):
+        self.store = store
+        self.conn = store.conn
+        self.score = compile_policy(policy).score
+        self.seen = 0
+        cur = self.conn.execute('INSERT INTO runs (recorded_at, source) VALUES (?, ?)',
+                                (datetime.datetime.now(datetime.timezone.utc).isoformat(), source))
+        self.run_id = cur.lastrowid
+        self.last_id = self.conn.execute('SELECT COALESCE(MAX(incident_id), 0) FROM incidents').fetchone()[0]
+        self.changes = self.conn.total_changes
+
+    def _rows(self, incidents):
+        for incident in incidents:
+            layers = incident.get('impacted_layers', [])
+            base_minutes, final_minutes, priority_score = self.score(
+                incident.get('module'), incident.get('environment'), incident.get('failure_type'), layers)
+            timestamp = incident.get('timestamp')
+            self.seen += 1
+            yield (self.run_id, _text(timestamp), incident_day(timestamp), _text(incident.get('test_id')),
+                   _text(incident.get('module')), _text(incident.get('environment')),
+                   _text(incident.get('failure_type')), json.dumps(layers),
+                   _number(base_minutes), _number(final_minutes), _number(priority_score))
+
+    def add(self, incidents):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO incidents (run_id, timestamp, day, test_id, module, environment, '
+            'failure_type, impacted_layers, base_minutes, final_minutes, priority_score) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', self._rows(incidents))
+
+    def finish(self):
+        """Update the rollups and commit. Returns (incidents seen, incidents added)."""
+        added = self.conn.total_changes - self.changes
+        self.conn.execute(_ROLLUP_UPSERT, (self.last_id,))
+        self.conn.execute('UPDATE runs SET incidents_seen = ?, incidents_added = ? WHERE run_id = ?',
+                          (self.seen, added, self.run_id))
+        self.conn.commit()
+        logging.info(f"History store {self.store.path}: {added} of {self.seen} incidents added (run {self.run_id}).")
+        return self.seen, added
+
+
+def load_trends(path=STORE_FILE, days=TREND_DAYS):
+    """Trend series for the dashboard, or None if there is no history store."""
+    if not os.path.exists(path):
+        return None
+    with IncidentStore(path) as store:
+        return {
+            'module_minutes': store.trend('final_minutes', 'module', days),
+            'failure_type_incidents': store.trend('incidents', 'failure_type', days),
+        }
@@ -0,0 +1,321 @@
+"""Incremental re-processing of append-only failure dumps.
+
+A checkpoint records, per input file, its inode, size, mtime, consumed byte
+offset, consumed line count and a sha256 of every 4 MiB block of the consumed
+prefix. An input whose inode, size and mtime are unchanged is trusted without
+reading it; otherwise its whole consumed prefix is re-hashed and compared, so
+an edit anywhere in it, even one that keeps the size, forces a rebuild. Only
+the bytes past the last full block are hashed again for the new checkpoint.
+On the next run only the newly appended complete lines are parsed, scored,
+sorted and merged into the previous sorted plan. Cached records and plan rows
+carry their input path and their position among that input's records, so ties
+are broken by input order and then line order exactly as in a full run,
+whichever input grew. Projected records are cached so a policy change
+re-scores everything without re-reading the raw JSONL. Truncated, rotated or
+removed inputs fall back to a full rebuild. Compressed inputs cannot be
+resumed at a byte offset, so any change to one is treated as a rewrite.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+
+from incident_processor import (
+    LOG_DIR,
+    compile_policy,
+    expand_inputs,
+    parse_lines,
+    score_incidents,
+    sort_key,
+    warn_malformed,
+)
+from input_readers import is_compressed, iter_lines
+
+STATE_DIR = os.path.join(LOG_DIR, '.incremental')
+# Version 2 stores the cached records and plan rows as [path, ordinal, record];
+# version 3 hashes the whole consumed prefix in blocks.
+CHECKPOINT_VERSION = 3
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def policy_fingerprint(policy):
+    """Content hash of the compiled policy tables."""
+    tables = json.dumps(compile_policy(policy).to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(tables.encode('utf-8')).hexdigest()
+
+
+def _block_hashes(f, start, offset):
+    f.seek(start)
+    pos = start
+    while pos < offset:
+        block = f.read(min(HASH_BLOCK_SIZE, offset - pos))
+        if not block:
+            # The file is shorter than offset.
+            yield None
+            return
+        pos += len(block)
+        yield hashlib.sha256(block).hexdigest()
+
+
+def prefix_hashes(f, offset, known=(), known_offset=0):
+    """sha256 of each HASH_BLOCK_SIZE block of f[:offset], the last one possibly short.
+
+    known are the hashes of the verified prefix f[:known_offset]; its full
+    blocks are reused, so only the bytes after them are read.
+    """
+    reuse = min(known_offset, offset) // HASH_BLOCK_SIZE
+    hashes = list(known[:reuse])
+    hashes.extend(_block_hashes(f, reuse * HASH_BLOCK_SIZE, offset))
+    return hashes
+
+
+def prefix_matches(f, offset, hashes):
+    """Whether f[:offset] still hashes to hashes, stopping at the first block that differs."""
+    count = 0
+    for expected, actual in zip(hashes, _block_hashes(f, 0, offset)):
+        if expected != actual:
+            return False
+        count += 1
+    return count == len(hashes) == -(-offset // HASH_BLOCK_SIZE)
+
+
+class PrefixHasher:
+    """prefix_hashes() of bytes fed in file order from offset 0, for a file being read anyway.
+
+    known and known_offset are as for prefix_hashes(): the full blocks of the
+    verified prefix are reused and the bytes fed over them are skipped.
+    """
+
+    def __init__(self, known=(), known_offset=0):
+        reuse = known_offset // HASH_BLOCK_SIZE
+        self.hashes = list(known[:reuse])
+        self.start = reuse * HASH_BLOCK_SIZE
+        self.offset = 0
+        self._block = hashlib.sha256()
+        self._filled = 0
+
+    def feed(self, data):
+        data = memoryview(data)
+        if self.offset < self.start:
+            skip = min(len(data), self.start - self.offset)
+            self.offset += skip
+            data = data[skip:]
+        while data:
+            take = min(len(data), HASH_BLOCK_SIZE - self._filled)
+            self._block.update(data[:take])
+            self._filled += take
+            self.offset += take
+            data = data[take:]
+            if self._filled == HASH_BLOCK_SIZE:
+                self.hashes.append(self._block.hexdigest())
+                self._block = hashlib.sha256()
+                self._filled = 0
+
+    def result(self):
+        """The hashes of every byte fed so far."""
+        return self.hashes + ([self._block.hexdigest()] if self._filled else [])
+
+
+class IncrementalState:
+    """Checkpoint, projected-record cache and sorted plan kept in state_dir."""
+
+    def __init__(self, state_dir=STATE_DIR):
+        self.state_dir = state_dir
+        self.checkpoint_path = os.path.join(state_dir, 'checkpoint.json')
+        self.projected_path = os.path.join(state_dir, 'projected.jsonl')
+
+    def plan_path(self, generation):
+        # Each run writes a new plan generation and only then points the
+        # checkpoint at it, so an interrupted run never corrupts the last plan.
+        return os.path.join(self.state_dir, f'plan.{generation}.jsonl')
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('version') != CHECKPOINT_VERSION:
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        _atomic_write(self.checkpoint_path, lambda f: json.dump(checkpoint, f, indent=2))
+
+    def reset(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        for name in os.listdir(self.state_dir):
+            if name == 'checkpoint.json' or name == 'projected.jsonl' or name.startswith('plan.'):
+                os.remove(os.path.join(self.state_dir, name))
+
+    def iter_jsonl(self, path, limit_bytes=None):
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data_end = os.fstat(f.fileno()).st_size if limit_bytes is None else limit_bytes
+            while f.tell() < data_end:
+                yield json.loads(f.readline())
+
+    def append_projected(self, records, valid_bytes):
+        """Append [path, ordinal, record] rows after the first valid_bytes of the cache; returns the new size.
+
+        Anything past valid_bytes was written by a run that never checkpointed
+        and is discarded.
+        """
+        with open(self.projected_path, 'a') as f:
+            f.truncate(valid_bytes)
+            for rec in records:
+                f.write(json.dumps(rec))
+                f.write('\n')
+            return f.tell()
+
+    def write_plan(self, rows, generation):
+        def write(f):
+            for row in rows:
+                f.write(json.dumps(row))
+                f.write('\n')
+        _atomic_write(self.plan_path(generation), write)
+
+    def remove_plan(self, generation):
+        path = self.plan_path(generation)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _atomic_write(path, write):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def file_status(path, entry):
+    """Classify an input against its checkpoint entry: new, unchanged, appended or changed.
+
+    An input with the recorded inode, size and mtime is unchanged without
+    being read; any other is verified against the hashes of its whole
+    consumed prefix.
+    """
+    st = os.stat(path)
+    if entry is None:
+        return 'new'
+    if st.st_ino != entry['inode'] or st.st_size < entry['offset']:
+        return 'changed'
+    if st.st_size == entry['size'] == entry['offset'] and st.st_mtime_ns == entry.get('mtime_ns'):
+        return 'unchanged'
+    with open(path, 'rb') as f:
+        if not prefix_matches(f, entry['offset'], entry['prefix_hashes']):
+            return 'changed'
+    if st.st_size == entry['offset']:
+        return 'unchanged'
+    return 'changed' if is_compressed(path) else 'appended'
+
+
+def read_appended(path, entry, decoder='auto'):
+    """Parse complete lines after the checkpoint offset; returns (records, new entry).
+
+    entry's prefix must already have been verified with file_status.
+    """
+    offset = entry['offset'] if entry else 0
+    lines_done = entry['lines'] if entry else 0
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if is_compressed(path):
+            # Compressed files are only read whole (file_status never reports
+            # them as appended).
+            lines = list(iter_lines(path))
+            end = st.st_size - offset
+        else:
+            f.seek(offset)
+            data = f.read(st.st_size - offset)
+            # A trailing line without a newline may still be being written;
+            # leave it for the next run.
+            end = data.rfind(b'\n') + 1
+            data = data[:end]
+            lines = data.splitlines()
+        records = list(parse_lines(lines, start=lines_done + 1,
+                                   on_malformed=lambda idx, e, source: warn_malformed(idx, e, path),
+                                   decoder=decoder))
+        new_offset = offset + end
+        new_entry = {
+            'inode': st.st_ino,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'offset': new_offset,
+            'lines': lines_done + len(lines),
+            'prefix_hashes': prefix_hashes(f, new_offset, entry['prefix_hashes'] if entry else (), offset),
+        }
+    return records, new_entry
+
+
+def update_plan(inputs, policy, state_dir=STATE_DIR, decoder='auto'):
+    """Bring the plan in state_dir up to date with inputs and return it as a sorted list."""
+    policy = compile_policy(policy)
+    state = IncrementalState(state_dir)
+    paths = expand_inputs(inputs)
+    fingerprint = policy_fingerprint(policy)
+
+    checkpoint = state.load_checkpoint()
+    files = checkpoint['files'] if checkpoint else {}
+    rank = {path: i for i, path in enumerate(paths)}
+
+    def row_key(row):
+        # Equal sort keys keep input order, then line order, as in build_plan.
+        path, ordinal, incident = row
+        return sort_key(incident), rank[path], ordinal
+
+    def score_rows(rows):
+        rows = list(rows)
+        scored = score_incidents((record for _, _, record in rows), policy)
+        return [[path, ordinal, incident] for (path, ordinal, _), incident in zip(rows, scored)]
+
+    statuses = {path: file_status(path, files.get(path)) for path in paths}
+    rebuild = (checkpoint is None
+               or set(files) - set(paths)
+               or 'changed' in statuses.values())
+    if rebuild:
+        logging.info("Incremental state missing or inputs truncated/rotated; rebuilding the plan.")
+        state.reset()
+        files = {}
+        statuses = dict.fromkeys(paths, 'new')
+        existing = []
+    elif checkpoint['policy_fingerprint'] != fingerprint:
+        logging.info("Policy changed; re-scoring cached projected records.")
+        projected = state.iter_jsonl(state.projected_path, checkpoint['projected_bytes'])
+        existing = sorted(score_rows(projected), key=row_key)
+    else:
+        existing = state.iter_jsonl(state.plan_path(checkpoint['generation']))
+        if [path for path in paths if path in files] != list(files):
+            # The inputs were given in another order, which changes how ties rank.
+            existing = sorted(existing, key=row_key)
+
+    new_rows = []
+    for path in paths:
+        if statuses[path] == 'unchanged':
+            continue
+        entry = files.get(path)
+        done = entry['records'] if entry else 0
+        records, files[path] = read_appended(path, entry, decoder)
+        files[path]['records'] = done + len(records)
+        new_rows.extend([path, done + i, record] for i, record in enumerate(records))
+    # Keep the checkpoint's files in input order for the check above.
+    files = {path: files[path] for path in paths}
+
+    projected_bytes = state.append_projected(new_rows, checkpoint['projected_bytes'] if not rebuild else 0)
+    new_results = sorted(score_rows(new_rows), key=row_key)
+    rows = list(heapq.merge(existing, new_results, key=row_key))
+    results = [incident for _, _, incident in rows]
+    generation = 0 if rebuild else checkpoint['generation'] + 1
+    state.write_plan(rows, generation)
+    state.save_checkpoint({
+        'version': CHECKPOINT_VERSION,
+        'generation': generation,
+        'policy_fingerprint': fingerprint,
+        'files': files,
+        'projected_bytes': projected_bytes,
+    })
+    if not rebuild:
+        state.remove_plan(checkpoint['generation'])
+    logging.info(f"Incremental update: {len(new_rows)} new incidents, {len(results)} in plan.")
+    return results
@@ -0,0 +1,126 @@
+"""Line readers for plain and compressed JSONL inputs, chosen by file extension.
+
+Plain files are memory-mapped and cut into large blocks at a newline; each
+block is split with bytes.splitlines(), which honours \\n, \\r\\n and \\r like
+text-mode iteration, so line numbers match reading the file with open(). The
+lines are bytes; every decoder backend accepts them.
+
+Compressed inputs (.gz, .bz2, .xz/.lzma and, when the zstandard package or
+Python 3.14's compression.zstd is available, .zst) are decompressed as a
+stream in blocks of the same size and never written to disk. Other formats
+can be added with register_reader.
+"""
+import bz2
+import gzip
+import itertools
+import lzma
+import mmap
+import os
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _open_zstd(path):
+    try:
+        from compression import zstd
+    except ImportError:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            raise ImportError(f"Reading {path} needs the zstandard package (pip install zstandard)") from None
+    return zstd.open(path, 'rb')
+
+
+# Extension -> function opening the path as a binary stream of decompressed bytes.
+READERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+    '.zst': _open_zstd,
+}
+
+
+def register_reader(extension, opener):
+    """Read files ending in extension with opener(path), which returns a binary stream."""
+    READERS[extension.lower()] = opener
+
+
+def reader_for(path):
+    """The opener for a compressed path, or None for plain files."""
+    _, extension = os.path.splitext(os.fspath(path))
+    return READERS.get(extension.lower())
+
+
+def is_compressed(path):
+    return reader_for(path) is not None
+
+
+def _stream_blocks(f, block_size):
+    carry = b''
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        data = carry + block
+        # Cut after the last \n, which never splits a \r\n pair.
+        cut = data.rfind(b'\n') + 1
+        if cut:
+            yield data[:cut].splitlines()
+            carry = data[cut:]
+        else:
+            carry = data
+    if carry:
+        yield carry.splitlines()
+
+
+def _mmap_blocks(f, block_size, on_block=None):
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        release = hasattr(mmap, 'MADV_DONTNEED')
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        pos = released = 0
+        while pos < size:
+            end = min(pos + block_size, size)
+            if end < size:
+                newline = mm.rfind(b'\n', pos, end)
+                if newline < 0:
+                    # A line longer than the block: extend to its end.
+                    newline = mm.find(b'\n', end)
+                end = size if newline < 0 else newline + 1
+            block = mm[pos:end]
+            pos = end
+            if release:
+                # Mapped pages count towards RSS; drop the ones already copied
+                # out so memory stays at about one block however large the file.
+                boundary = pos - pos % mmap.PAGESIZE
+                if boundary > released:
+                    mm.madvise(mmap.MADV_DONTNEED, released, boundary - released)
+                    released = boundary
+            if on_block is not None:
+                on_block(block)
+            yield block.splitlines()
+
+
+def iter_line_blocks(path, block_size=BLOCK_SIZE, on_block=None):
+    """Yield the lines of path as one list per block read, decompressing by extension.
+
+    on_block, if given, is called with the bytes of each block of a plain
+    file, in file order, before its lines are yielded; compressed files do
+    not call it.
+    """
+    opener = reader_for(path)
+    if opener is not None:
+        with opener(path) as f:
+            yield from _stream_blocks(f, block_size)
+    else:
+        with open(path, 'rb') as f:
+            yield from _mmap_blocks(f, block_size, on_block)
+
+
+def iter_lines(path, block_size=BLOCK_SIZE):
+    """Yield the lines of path (bytes, without line endings), decompressing by extension."""
+    return itertools.chain.from_iterable(iter_line_blocks(path, block_size))
@@ -0,0 +1,201 @@
+"""Per-stage timers, counters and opt-in profiling for a pipeline run.
+
+Stages nest: time spent in an inner stage (or in pulling items from a timed
+iterator) is not counted again in the stage around it, so the stage seconds
+of a run add up to its instrumented time even though the pipeline's
+generators interleave. Iterators are timed per item they produce, so wrap
+iterators of blocks or batches rather than of single lines where the
+per-item overhead matters.
+
+Library code reports to the active Metrics through current(); without an
+active run it gets a no-op recorder and pays nothing but the call.
+"""
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_TOP = 40
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unavailable."""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024), 1)
+
+
+class Metrics:
+    """Exclusive per-stage wall time and named counters for one run."""
+
+    def __init__(self, command=None):
+        self.command = command
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._start = time.perf_counter()
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+        # One [stage, start, seconds spent in nested stages] frame per open stage.
+        self._frames = []
+
+    def __bool__(self):
+        return True
+
+    def _enter(self, name):
+        self._frames.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        name, start, nested = self._frames.pop()
+        elapsed = time.perf_counter() - start
+        self.seconds[name] += elapsed - nested
+        self.calls[name] += 1
+        if self._frames:
+            self._frames[-1][2] += elapsed
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed(self, iterable, name):
+        """Yield from iterable, counting the time spent producing each item as stage name."""
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            yield item
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    @contextlib.contextmanager
+    def active(self):
+        """Make this the Metrics that current() returns."""
+        global _active
+        previous, _active = _active, self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    def as_dict(self, records_counter='records'):
+        wall = time.perf_counter() - self._start
+        records = self.counters.get(records_counter, 0)
+        return {
+            'command': self.command,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(wall, 4),
+            'stages': {name: {'seconds': round(seconds, 4), 'calls': self.calls[name],
+                              'share': round(seconds / wall, 4) if wall else 0.0}
+                       for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])},
+            'counters': dict(sorted(self.counters.items())),
+            'records_per_sec': round(records / wall, 1) if wall else None,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def write(self, path, records_counter='records'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(records_counter), f, indent=2)
+
+
+class _NoMetrics:
+    """Stand-in recorder used when no run is being instrumented."""
+
+    def __bool__(self):
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield
+
+    def timed(self, iterable, name):
+        return iterable
+
+    def count(self, name, n=1):
+        pass
+
+
+_NO_METRICS = _NoMetrics()
+_active = None
+
+
+def current():
+    """The active Metrics, or a no-op recorder."""
+    return _active if _active is not None else _NO_METRICS
+
+
+@contextlib.contextmanager
+def untracked():
+    """Run the block with no active Metrics, e.g. a side pass that re-reads a run's inputs.
+
+    The stage around the block still counts its wall time.
+    """
+    global _active
+    previous, _active = _active, None
+    try:
+        yield
+    finally:
+        _active = previous
+
+
+@contextlib.contextmanager
+def profiled(directory):
+    """Profile the block with cProfile and tracemalloc and dump both into directory.
+
+    Writes profile.pstats (load with pstats or snakeviz), profile.txt (top
+    functions by cumulative time), tracemalloc.snapshot and tracemalloc.txt
+    (top allocation sites still alive at the end, plus the peak). A falsy
+    directory disables profiling.
+    """
+    if not directory:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        profiler.dump_stats(os.path.join(directory, 'profile.pstats'))
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        with open(os.path.join(directory, 'profile.txt'), 'w') as f:
+            f.write(text.getvalue())
+        snapshot.dump(os.path.join(directory, 'tracemalloc.snapshot'))
+        with open(os.path.join(directory, 'tracemalloc.txt'), 'w') as f:
+            f.write(f"Peak traced memory: {peak / (1024 * 1024):.1f} MB\n")
+            for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+                f.write(f"{stat}\n")
@@ -0,0 +1,110 @@
+"""Multi-process scoring of many JSONL inputs split into newline-aligned byte ranges.
+
+Each shard is scored and sorted in a worker process; the sorted shards are then
+combined with a stable k-way merge. Shards are merged in (file, offset) order and
+both list.sort and heapq.merge are stable, so the plan is identical to a
+single-process build_plan over the same inputs.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from incident_processor import (
+    compile_policy,
+    expand_inputs,
+    parse_lines,
+    score_incidents,
+    sort_key,
+    warn_malformed,
+)
+from input_readers import is_compressed, iter_lines
+
+SHARD_SIZE = 64 * 1024 * 1024
+
+_worker_policy = None
+_worker_engine = 'python'
+_worker_decoder = 'auto'
+
+
+def plan_shards(paths, shard_size=SHARD_SIZE):
+    """Split every file into (path, start, end) byte ranges that end on a newline.
+
+    A compressed file cannot be entered mid-stream and is always one shard.
+    """
+    shards = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if is_compressed(path):
+            shards.append((path, 0, size))
+            continue
+        start = 0
+        with open(path, 'rb') as f:
+            while start < size:
+                end = start + shard_size
+                if end < size:
+                    f.seek(end)
+                    f.readline()
+                    end = f.tell()
+                else:
+                    end = size
+                shards.append((path, start, end))
+                start = end
+    return shards
+
+
+def _init_worker(policy, engine, decoder):
+    global _worker_policy, _worker_engine, _worker_decoder
+    _worker_policy = policy
+    _worker_engine = engine
+    _worker_decoder = decoder
+
+
+def score_shard(shard, policy=None, engine=None):
+    """Score and sort one byte range.
+
+    Returns (sorted incidents, number of lines in the range, malformed lines as
+    (line number within the range, message)).
+    """
+    policy = compile_policy(policy if policy is not None else _worker_policy)
+    engine = engine or _worker_engine
+    path, start, end = shard
+    if is_compressed(path):
+        lines = list(iter_lines(path))
+    else:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        # bytes.splitlines() honours \n, \r\n and \r like text-mode file iteration.
+        lines = data.splitlines()
+    malformed = []
+    incidents = parse_lines(lines, on_malformed=lambda idx, e, source: malformed.append((idx, str(e))),
+                            decoder=_worker_decoder)
+    if engine == 'numpy':
+        from batch_scoring import score_batch
+        results = score_batch(list(incidents), policy, sort=True)
+    else:
+        results = sorted(score_incidents(incidents, policy), key=sort_key)
+    return results, len(lines), malformed
+
+
+def build_plan_parallel(inputs, policy, workers=None, shard_size=None, engine='python', decoder='auto'):
+    """Score every input in a process pool and k-way merge the sorted shards."""
+    policy = compile_policy(policy)
+    paths = expand_inputs(inputs)
+    shards = plan_shards(paths, shard_size or SHARD_SIZE)
+    if not shards:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(policy, engine, decoder)) as executor:
+        shard_results = list(executor.map(score_shard, shards))
+
+    # Report malformed lines with file-absolute line numbers, in input order.
+    lines_before = {}
+    for (path, _, _), (_, line_count, malformed) in zip(shards, shard_results):
+        offset = lines_before.get(path, 0)
+        for idx, error in malformed:
+            warn_malformed(offset + idx, error, path if len(paths) > 1 else None)
+        lines_before[path] = offset + line_count
+
+    return list(heapq.merge(*(results for results, _, _ in shard_results), key=sort_key))
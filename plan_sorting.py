@@ -0,0 +1,144 @@
+"""Bounded-memory ordering of scored incidents.
+
+Both helpers produce exactly the order of ``sorted(incidents, key=sort_key)``
+(priority_score descending, then module ascending with None as '', then
+input order):
+
+top_k          keeps the best N incidents in a heap while streaming:
+               O(n log N) time and O(N) memory.
+external_sort  sorts runs of run_size incidents in memory, spills each run
+               to a temporary file and k-way merges the runs. heapq.merge
+               breaks ties by run order and runs are cut in input order, so
+               the merge stays stable; more than fan_in runs are first merged
+               in consecutive groups.
+"""
+import heapq
+import itertools
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+
+from incident_processor import sort_key
+
+RUN_SIZE = 1_000_000
+MERGE_FAN_IN = 64
+# Incidents are pickled in blocks to keep per-record overhead low.
+BLOCK_SIZE = 4096
+FILE_BUFFER_SIZE = 1024 * 1024
+
+
+def top_k(incidents, n):
+    """The first n incidents of the sorted plan, using O(n) memory."""
+    # nsmallest is documented as equivalent to sorted(iterable, key=key)[:n].
+    return heapq.nsmallest(n, incidents, key=sort_key)
+
+
+def _write_run(path, incidents):
+    with open(path, 'wb', buffering=FILE_BUFFER_SIZE) as f:
+        iterator = iter(incidents)
+        while True:
+            block = list(itertools.islice(iterator, BLOCK_SIZE))
+            if not block:
+                break
+            pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path):
+    with open(path, 'rb', buffering=FILE_BUFFER_SIZE) as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+class SortedRuns:
+    """A sorted plan held as spilled runs; iterate it as often as needed, then close()."""
+
+    def __init__(self, run_size=RUN_SIZE, tmp_dir=None, fan_in=MERGE_FAN_IN):
+        self.run_size = run_size
+        self.fan_in = max(2, fan_in)
+        self.tmp_dir = tmp_dir
+        self._workdir = None
+        self._runs = []
+        self._memory_run = []
+        self._count = 0
+        self._run_files = itertools.count()
+
+    def _new_run_path(self):
+        if self._workdir is None:
+            if self.tmp_dir:
+                os.makedirs(self.tmp_dir, exist_ok=True)
+            self._workdir = tempfile.mkdtemp(prefix='plan-sort-', dir=self.tmp_dir)
+            # Remove the spilled runs even if close() is never reached.
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._workdir, True)
+        return os.path.join(self._workdir, f'run-{next(self._run_files):06d}.pickle')
+
+    def add(self, incidents):
+        """Consume incidents (in input order), spilling a sorted run every run_size incidents."""
+        iterator = iter(incidents)
+        while True:
+            chunk = list(itertools.islice(iterator, self.run_size))
+            if not chunk:
+                break
+            self._count += len(chunk)
+            chunk.sort(key=sort_key)
+            if not self._runs and not self._memory_run and len(chunk) < self.run_size:
+                # Everything fits in a single run; no need to touch disk.
+                self._memory_run = chunk
+                break
+            if self._memory_run:
+                self._spill(self._memory_run)
+                self._memory_run = []
+            self._spill(chunk)
+        self._reduce_runs()
+        return self
+
+    def _spill(self, sorted_chunk):
+        path = self._new_run_path()
+        _write_run(path, sorted_chunk)
+        self._runs.append(path)
+
+    def _reduce_runs(self):
+        # Merge consecutive groups until one merge pass can open every run.
+        while len(self._runs) > self.fan_in:
+            merged = []
+            for start in range(0, len(self._runs), self.fan_in):
+                group = self._runs[start:start + self.fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                path = self._new_run_path()
+                _write_run(path, heapq.merge(*(_read_run(run) for run in group), key=sort_key))
+                for run in group:
+                    os.remove(run)
+                merged.append(path)
+            self._runs = merged
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        if not self._runs:
+            return iter(self._memory_run)
+        return heapq.merge(*(_read_run(run) for run in self._runs), key=sort_key)
+
+    def close(self):
+        self._runs = []
+        self._memory_run = []
+        if self._workdir is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def external_sort(incidents, run_size=RUN_SIZE, tmp_dir=None, fan_in=MERGE_FAN_IN):
+    """Sort incidents with bounded memory; returns a re-iterable SortedRuns."""
+    return SortedRuns(run_size, tmp_dir, fan_in).add(incidents)
@@ -0,0 +1,207 @@
+"""Tiered validation of scored incident plans.
+
+Levels:
+    off     no checks
+    inline  cheap per-record invariants (fields, types, non-negative values,
+            cap) plus adjacent sort-order checks, done while records stream
+            past on their way to the plan file
+    sample  inline, plus a deterministic pseudo-random N% of records
+            recomputed against the policy
+    full    inline, plus every record recomputed against the policy
+
+Violations are collected into a ValidationReport instead of stopping at the
+first one, and nothing relies on ``assert`` so checks also run under ``python -O``.
+"""
+import json
+import random
+
+from incident_processor import (
+    compile_policy,
+    get_layer_minutes,
+    get_module_priority,
+    get_multiplier,
+)
+
+VALIDATION_LEVELS = ('off', 'inline', 'sample', 'full')
+REQUIRED_FIELDS = ('test_id', 'module', 'environment', 'failure_type',
+                   'impacted_layers', 'base_minutes', 'final_minutes', 'priority_score')
+MAX_REPORTED_VIOLATIONS = 1000
+
+
+class PlanValidationError(AssertionError):
+    """Raised by validate_results when a plan has violations."""
+
+
+class ValidationReport:
+    """Structured result of a validation run."""
+
+    def __init__(self, level, sample_rate=None, seed=None, max_violations=MAX_REPORTED_VIOLATIONS):
+        self.level = level
+        self.sample_rate = sample_rate
+        self.seed = seed
+        self.max_violations = max_violations
+        self.records_checked = 0
+        self.records_recomputed = 0
+        self.violation_count = 0
+        self.violations = []
+
+    @property
+    def ok(self):
+        return self.violation_count == 0
+
+    def add(self, index, check, message, incident=None):
+        self.violation_count += 1
+        # Keep the first max_violations details; the count stays exact.
+        if len(self.violations) < self.max_violations:
+            test_id = incident.get('test_id') if isinstance(incident, dict) else None
+            self.violations.append({'index': index, 'test_id': test_id, 'check': check, 'message': message})
+
+    def first_message(self):
+        return self.violations[0]['message'] if self.violations else None
+
+    def to_dict(self):
+        return {
+            'level': self.level,
+            'sample_rate': self.sample_rate,
+            'seed': self.seed,
+            'ok': self.ok,
+            'records_checked': self.records_checked,
+            'records_recomputed': self.records_recomputed,
+            'violation_count': self.violation_count,
+            'violations': self.violations,
+        }
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def _module_key(incident):
+    module = incident.get('module')
+    return module if module is not None else ''
+
+
+class PlanValidator:
+    """Validates incidents as they stream through observe()."""
+
+    def __init__(self, policy, level='inline', sample_rate=1.0, seed=0, check_order=True,
+                 max_violations=MAX_REPORTED_VIOLATIONS):
+        if level not in VALIDATION_LEVELS:
+            raise ValueError(f"Unknown validation level {level!r}; expected one of {VALIDATION_LEVELS}")
+        self.policy = compile_policy(policy)
+        self.level = level
+        self.check_order = check_order
+        self.sample_fraction = sample_rate / 100.0
+        self._rng = random.Random(seed)
+        self.report = ValidationReport(level, sample_rate if level == 'sample' else None,
+                                       seed if level == 'sample' else None, max_violations)
+
+    def observe(self, incidents):
+        """Yield every incident unchanged, validating it on the way through."""
+        if self.level == 'off':
+            yield from incidents
+            return
+        report = self.report
+        previous = None
+        for idx, incident in enumerate(incidents):
+            # Draw for every record, usable or not, so the sample depends only on the seed and position.
+            recompute = self._should_recompute()
+            if self._check_invariants(idx, incident):
+                if self.check_order and previous is not None:
+                    self._check_order(idx - 1, previous, incident)
+                previous = incident
+                if recompute:
+                    self._check_against_policy(idx, incident)
+                    report.records_recomputed += 1
+            else:
+                previous = None
+            report.records_checked += 1
+            yield incident
+        if report.records_checked == 0:
+            report.add(None, 'empty', "Results list should not be empty")
+
+    def validate(self, incidents):
+        """Validate a complete plan and return the report."""
+        for _ in self.observe(incidents):
+            pass
+        return self.report
+
+    def _should_recompute(self):
+        if self.level == 'full':
+            return True
+        return self.level == 'sample' and self._rng.random() < self.sample_fraction
+
+    def _check_invariants(self, idx, incident):
+        """Structure, types, non-negative values and the cap; returns False if unusable."""
+        report = self.report
+        if not isinstance(incident, dict):
+            report.add(idx, 'structure', f"Incident {idx} should be a dictionary")
+            return False
+        missing = [field for field in REQUIRED_FIELDS if field not in incident]
+        for field in missing:
+            report.add(idx, 'structure', f"Incident {idx} missing required field: {field}", incident)
+        if missing:
+            return False
+
+        usable = True
+        if not isinstance(incident['impacted_layers'], list):
+            report.add(idx, 'type', f"Incident {idx}: impacted_layers should be a list", incident)
+            usable = False
+        for field in ('base_minutes', 'final_minutes', 'priority_score'):
+            value = incident[field]
+            if not isinstance(value, (int, float)):
+                report.add(idx, 'type', f"Incident {idx}: {field} should be numeric", incident)
+                usable = False
+            elif value < 0:
+                report.add(idx, 'range', f"Incident {idx}: {field} should be non-negative", incident)
+        if not usable:
+            return False
+
+        upper_cap = self.policy.upper_cap
+        if upper_cap is not None and incident['final_minutes'] > upper_cap:
+            report.add(idx, 'cap', f"Incident {idx}: final_minutes {incident['final_minutes']} exceeds cap {upper_cap}",
+                       incident)
+        return True
+
+    def _check_order(self, idx, current, next_item):
+        """priority_score descending, then module ascending (None as '')."""
+        if current['priority_score'] == next_item['priority_score']:
+            if _module_key(current) > _module_key(next_item):
+                self.report.add(idx, 'order',
+                                f"Sorting error at index {idx}: modules not in ascending order when priority scores are equal",
+                                next_item)
+        elif current['priority_score'] < next_item['priority_score']:
+            self.report.add(idx, 'order',
+                            f"Sorting error at index {idx}: priority scores not in descending order", next_item)
+
+    def _check_against_policy(self, idx, incident):
+        """Recompute base/final minutes and priority from the policy tables."""
+        policy = self.policy
+        report = self.report
+        expected_base = get_layer_minutes(incident['impacted_layers'], policy.layer_minutes)
+        if incident['base_minutes'] != expected_base:
+            report.add(idx, 'base_minutes',
+                       f"Incident {idx}: base_minutes calculation incorrect. Expected {expected_base}, got {incident['base_minutes']}",
+                       incident)
+
+        env_mult = get_multiplier(incident['environment'], policy.env_multipliers)
+        fail_mult = get_multiplier(incident['failure_type'], policy.failure_multipliers)
+        expected_final = incident['base_minutes'] * env_mult * fail_mult
+        if policy.upper_cap is not None and expected_final > policy.upper_cap:
+            expected_final = policy.upper_cap
+        if abs(incident['final_minutes'] - expected_final) >= 0.001:
+            report.add(idx, 'final_minutes',
+                       f"Incident {idx}: final_minutes calculation incorrect. Expected {expected_final}, got {incident['final_minutes']}",
+                       incident)
+
+        module_priority = get_module_priority(incident['module'], policy.module_priorities)
+        expected_priority = round(module_priority * env_mult * fail_mult, 3)
+        if abs(incident['priority_score'] - expected_priority) >= 0.001:
+            report.add(idx, 'priority_score',
+                       f"Incident {idx}: priority_score calculation incorrect. Expected {expected_priority}, got {incident['priority_score']}",
+                       incident)
+
+
+def validate_plan(results, policy, level='full', sample_rate=1.0, seed=0):
+    """Validate a complete plan at the given level and return a ValidationReport."""
+    return PlanValidator(policy, level, sample_rate, seed).validate(results)
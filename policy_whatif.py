@@ -0,0 +1,238 @@
+"""What-if evaluation of many policy variants against one parsed incident set.
+
+The incidents are read and encoded once (batch_scoring.encode_incidents).
+Each variant then only touches the small per-value tables: layer minutes
+become base minutes through one bincount over the CSR layer matrix (reused
+when the variant leaves the layer table alone), multipliers and the cap are
+array lookups, and priorities are computed per distinct
+(module, environment, failure_type) combination and broadcast. Ranks follow
+the plan order (priority desc, module asc, input order), so every variant
+gives a permutation and Spearman's rho is exact; variants that leave every
+priority unchanged reuse the baseline ranking without sorting.
+
+Variants are overrides of Policy.yaml given as dotted paths, listed by name
+and/or as a grid whose cartesian product is evaluated:
+
+    variants:
+      - name: strict-cap
+        set: {caps.per_incident_minutes_max: 45}
+    grid:
+      caps.per_incident_minutes_max: [45, 60, 90]
+      multipliers.by_environment.PreProd: [1.0, 1.2, 1.5]
+
+Usage:
+    python policy_whatif.py --input sample_data/Failures.jsonl --variants variants.yaml
+"""
+import argparse
+import copy
+import itertools
+import json
+import logging
+import os
+
+import numpy as np
+import yaml
+
+from batch_scoring import encode_incidents
+from incident_processor import (
+    DECODER_BACKENDS,
+    LOG_DIR,
+    POLICY_FILE,
+    compile_policy,
+    get_module_priority,
+    get_multiplier,
+    load_policy,
+    read_records,
+)
+
+WHATIF_FILE = os.path.join(LOG_DIR, 'policy_whatif.json')
+TOP_MOVERS = 5
+# Dotted paths split into this many keys below each top-level section, so
+# module, environment and layer names may themselves contain dots.
+SECTION_DEPTH = {'multipliers': 2, 'caps': 1, 'minutes_per_impacted_layer': 1, 'module_priority_score': 1}
+
+
+def apply_overrides(policy, overrides):
+    """A copy of the policy dict with dotted-path overrides applied."""
+    policy = copy.deepcopy(policy or {})
+    for path, value in overrides.items():
+        section, _, rest = path.partition('.')
+        if section not in SECTION_DEPTH or not rest:
+            raise ValueError(f"Unknown policy path {path!r}; expected one of {sorted(SECTION_DEPTH)} plus keys")
+        keys = [section] + rest.split('.', SECTION_DEPTH[section] - 1)
+        node = policy
+        for key in keys[:-1]:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        node[keys[-1]] = value
+    return policy
+
+
+def expand_grid(grid):
+    """(name, overrides) for every combination of a {path: [values]} grid."""
+    paths = list(grid or {})
+    variants = []
+    for values in itertools.product(*(grid[path] for path in paths)):
+        overrides = dict(zip(paths, values))
+        variants.append((','.join(f'{path}={value}' for path, value in overrides.items()), overrides))
+    return variants
+
+
+def load_variants(path):
+    """(name, overrides) pairs from a variants YAML file (see the module docstring)."""
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f) or {}
+    variants = []
+    for idx, variant in enumerate(spec.get('variants') or [], 1):
+        overrides = variant.get('set') or {}
+        variants.append((str(variant.get('name') or f'variant-{idx}'), overrides))
+    if spec.get('grid'):
+        variants.extend(expand_grid(spec['grid']))
+    return variants
+
+
+def _table(values, mapping, default):
+    looked_up = [mapping.get(value, default) for value in values]
+    if not all(isinstance(v, (int, float)) for v in looked_up):
+        raise TypeError('non-numeric policy value')
+    return np.asarray(looked_up, dtype=np.float64).reshape(len(values))
+
+
+class WhatIfEvaluator:
+    """Scores one encoded incident set under any number of policies."""
+
+    def __init__(self, incidents, baseline_policy):
+        self.incidents = incidents if isinstance(incidents, list) else list(incidents)
+        encoded = self.encoded = encode_incidents(self.incidents)
+        n = self.size = len(self.incidents)
+        indptr = encoded['layer_indptr']
+        self._row_ids = np.repeat(np.arange(n), np.diff(indptr))
+        n_env = max(len(encoded['environments']), 1)
+        n_fail = max(len(encoded['failure_types']), 1)
+        combo = (encoded['module_codes'] * n_env + encoded['env_codes']) * n_fail + encoded['fail_codes']
+        unique_combos, inverse = np.unique(combo, return_inverse=True)
+        self._combos = []
+        for key in unique_combos.tolist():
+            module_code, rest = divmod(key, n_env * n_fail)
+            env_code, fail_code = divmod(rest, n_fail)
+            self._combos.append((encoded['modules'][module_code], encoded['environments'][env_code],
+                                 encoded['failure_types'][fail_code]))
+        self._combo_index = inverse.reshape(n)
+        modules = [m if m is not None else '' for m in encoded['modules']]
+        rank_of = {m: r for r, m in enumerate(sorted(set(modules)))}
+        module_rank = np.asarray([rank_of[m] for m in modules], dtype=np.int64).reshape(len(modules))
+        self._module_rank = module_rank[encoded['module_codes']]
+        self._base_cache = {}
+        self.baseline = self.evaluate(baseline_policy)
+
+    def _base_minutes(self, policy):
+        key = tuple(sorted(policy.layer_minutes.items()))
+        base = self._base_cache.get(key)
+        if base is None:
+            values = _table(self.encoded['layers'], policy.layer_minutes, 0)
+            base = np.bincount(self._row_ids, weights=values[self.encoded['layer_indices']], minlength=self.size)
+            # Keep the baseline's base minutes and the latest variant's.
+            self._base_cache = dict(list(self._base_cache.items())[:1])
+            self._base_cache[key] = base
+        return base
+
+    def evaluate(self, policy):
+        """final_minutes, capped mask, priority_score and plan ranks for one policy."""
+        policy = compile_policy(policy)
+        encoded = self.encoded
+        env = _table(encoded['environments'], policy.env_multipliers, 1.0)[encoded['env_codes']]
+        fail = _table(encoded['failure_types'], policy.failure_multipliers, 1.0)[encoded['fail_codes']]
+        final = self._base_minutes(policy) * env * fail
+        if policy.upper_cap is not None:
+            capped = final > policy.upper_cap
+            final = np.where(capped, policy.upper_cap, final)
+        else:
+            capped = np.zeros(self.size, dtype=bool)
+        combo_priorities = [
+            round(get_module_priority(module, policy.module_priorities)
+                  * get_multiplier(environment, policy.env_multipliers)
+                  * get_multiplier(failure_type, policy.failure_multipliers), 3)
+            for module, environment, failure_type in self._combos]
+        baseline = getattr(self, 'baseline', None)
+        if baseline is not None and combo_priorities == baseline['combo_priorities']:
+            priority, ranks = baseline['priority_score'], baseline['ranks']
+        else:
+            priority = np.asarray(combo_priorities, dtype=np.float64)[self._combo_index]
+            # lexsort is stable, so equal keys keep input order as in sort_key.
+            order = np.lexsort((self._module_rank, -priority))
+            ranks = np.empty(self.size, dtype=np.int64)
+            ranks[order] = np.arange(self.size)
+        return {'final_minutes': final, 'capped': capped, 'priority_score': priority,
+                'combo_priorities': combo_priorities, 'ranks': ranks}
+
+    def summarize(self, scores, movers=TOP_MOVERS):
+        """Totals and the rank comparison of scores against the baseline."""
+        n = self.size
+        shift = scores['ranks'] - self.baseline['ranks']
+        if n > 1:
+            spearman = 1.0 - 6.0 * float(np.dot(shift, shift)) / (n * (n * n - 1.0))
+        else:
+            spearman = 1.0
+        moved = [int(i) for i in np.argsort(-np.abs(shift), kind='stable')[:movers] if shift[i]]
+        return {
+            'total_final_minutes': round(float(scores['final_minutes'].sum()), 3),
+            'capped_incidents': int(scores['capped'].sum()),
+            'spearman_rho': round(spearman, 6),
+            'moved_incidents': int(np.count_nonzero(shift)),
+            'top_movers': [{
+                'test_id': self.incidents[i].get('test_id'),
+                'module': self.incidents[i].get('module'),
+                'baseline_rank': int(self.baseline['ranks'][i]) + 1,
+                'rank': int(scores['ranks'][i]) + 1,
+                'priority_score': float(scores['priority_score'][i]),
+            } for i in moved],
+        }
+
+
+def run_whatif(incidents, policy, variants, movers=TOP_MOVERS):
+    """Evaluate (name, overrides) variants of the policy dict; returns the report dict."""
+    evaluator = WhatIfEvaluator(incidents, policy)
+    baseline = evaluator.summarize(evaluator.baseline, movers)
+    report = {'incidents': evaluator.size, 'baseline': baseline, 'variants': []}
+    for name, overrides in variants:
+        summary = evaluator.summarize(evaluator.evaluate(apply_overrides(policy, overrides)), movers)
+        summary['minutes_delta'] = round(summary['total_final_minutes'] - baseline['total_final_minutes'], 3)
+        report['variants'].append({'name': name, 'overrides': overrides, **summary})
+    logging.info(f"What-if: {len(variants)} policy variants evaluated over {evaluator.size} incidents.")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Score many policy variants against one parsed incident set.')
+    parser.add_argument('--input', nargs='+', required=True, help='Failures JSONL files or glob patterns')
+    parser.add_argument('--policy', default=POLICY_FILE, help='Baseline policy YAML file')
+    parser.add_argument('--variants', required=True, help='Variants YAML file (named overrides and/or a grid)')
+    parser.add_argument('--output', default=WHATIF_FILE, help='JSON report to write')
+    parser.add_argument('--movers', type=int, default=TOP_MOVERS, help='Incidents listed per variant as top movers')
+    parser.add_argument('--decoder', choices=['auto'] + list(DECODER_BACKENDS), default='auto',
+                        help='JSON backend for reading failures; auto prefers msgspec, then orjson, then json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_whatif(read_records(args.input, args.decoder), load_policy(args.policy),
+                        load_variants(args.variants), args.movers)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    baseline = report['baseline']
+    print(f"Baseline: {baseline['total_final_minutes']} minutes, {baseline['capped_incidents']} capped, "
+          f"{report['incidents']} incidents.")
+    for variant in report['variants']:
+        print(f"{variant['minutes_delta']:>+12.3f} min {variant['capped_incidents']:>7} capped "
+              f"rho {variant['spearman_rho']:.4f}  {variant['name']}")
+    print(f"What-if report for {len(report['variants'])} variants written to {args.output}.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+"""Seeded generator of synthetic failure records in the Failures.jsonl schema.
+
+Modules, environments, failure types and impacted layers are drawn from the
+tables in Policy.yaml with Zipf-like weights (``skew`` 0 is uniform), and
+``unknown_rate`` of the values fall outside the policy so its defaults are
+exercised too. Each record carries log lines like the sample data, padded to
+``log_width`` characters. ``duplicate_rate`` re-emits a recent record
+(same test_id and correlation_id), and ``malformed_rate`` emits a truncated
+JSON line. The same arguments and seed always produce the same bytes, and
+memory does not grow with the record count.
+
+Usage:
+    python synthetic_failures.py --count 1000000 --output test_results/synthetic.jsonl
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import uuid
+
+from incident_processor import POLICY_FILE, load_policy
+
+LOG_LINES = (8, 12)
+LOG_WIDTH = 110
+LAYERS_PER_INCIDENT = (2, 5)
+SKEW = 1.0
+UNKNOWN_RATE = 0.01
+# Recent records kept for duplicates; duplicates repeat one of the last few.
+DUPLICATE_WINDOW = 1000
+START_TIME = datetime.datetime(2025, 8, 1, tzinfo=datetime.timezone.utc)
+TIME_SPAN_SECONDS = 30 * 24 * 3600
+
+ERROR_MESSAGES = {
+    'Authentication Failure': ['JWT signature mismatch', 'Valid user rejected: token validation error'],
+    'Backend Service Bug': ['Unhandled exception in request handler', 'Service responded 500 due to null pointer'],
+    'Concurrency Bug': ['Race condition caused inconsistent state', 'Deadlock detected while updating row'],
+    'Configuration Error': ['Feature flag misconfigured for environment', 'Invalid env var led to fallback path'],
+    'Data Freshness Breach': ['ETL pipeline lag exceeded threshold', 'Warehouse not updated in last 24h'],
+    'Data Integrity Issue': ['Foreign key constraint violated', 'Duplicate key detected during upsert'],
+    'External Dependency Failure': ['Third-party provider returned 5xx', 'Carrier service unavailable'],
+    'Integration Timeout': ['Outbound request exceeded 15s timeout', 'Partner API did not respond within SLA'],
+}
+GENERIC_ERRORS = ['Unexpected response from downstream service', 'Assertion failed on page state']
+
+
+def _weights(count, skew):
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class _Choices:
+    """Weighted choice among policy values, with a small share of unknown ones."""
+
+    def __init__(self, values, kind, skew, unknown_rate):
+        self.values = list(values) or [f'{kind}-0']
+        self.cumulative = list(itertools.accumulate(_weights(len(self.values), skew)))
+        self.kind = kind
+        self.unknown_rate = unknown_rate
+
+    def pick(self, rng):
+        if self.unknown_rate and rng.random() < self.unknown_rate:
+            return f'Unknown {self.kind} {rng.randrange(5)}'
+        return rng.choices(self.values, cum_weights=self.cumulative)[0]
+
+
+class FailureGenerator:
+    """Produces synthetic JSONL lines; see the module docstring for the knobs."""
+
+    def __init__(self, policy=None, seed=0, log_lines=LOG_LINES, log_width=LOG_WIDTH, duplicate_rate=0.0,
+                 malformed_rate=0.0, skew=SKEW, unknown_rate=UNKNOWN_RATE):
+        policy = policy if policy is not None else load_policy(POLICY_FILE)
+        multipliers = policy.get('multipliers') or {}
+        self.rng = random.Random(seed)
+        self.modules = _Choices(policy.get('module_priority_score') or {}, 'module', skew, unknown_rate)
+        self.environments = _Choices(multipliers.get('by_environment') or {}, 'environment', skew, unknown_rate)
+        self.failure_types = _Choices(multipliers.get('by_failure_type') or {}, 'failure type', skew, unknown_rate)
+        self.layers = _Choices(policy.get('minutes_per_impacted_layer') or {}, 'layer', skew, unknown_rate)
+        self.log_lines = log_lines
+        self.log_width = log_width
+        self.duplicate_rate = duplicate_rate
+        self.malformed_rate = malformed_rate
+        self._recent = []
+
+    def record(self):
+        """One synthetic failure record (a dict)."""
+        rng = self.rng
+        module = self.modules.pick(rng)
+        failure_type = self.failure_types.pick(rng)
+        layers = []
+        for _ in range(rng.randint(*LAYERS_PER_INCIDENT)):
+            layer = self.layers.pick(rng)
+            if layer not in layers:
+                layers.append(layer)
+        when = START_TIME + datetime.timedelta(milliseconds=rng.randrange(TIME_SPAN_SECONDS * 1000))
+        corr = f'corr-{rng.getrandbits(64):016x}'
+        error = rng.choice(ERROR_MESSAGES.get(failure_type, GENERIC_ERRORS))
+        logs = []
+        for i in range(rng.randint(*self.log_lines)):
+            stamp = (when + datetime.timedelta(milliseconds=10 * i)).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            layer = layers[i % len(layers)] if layers else 'APP'
+            line = f'[{stamp}] APP  DEBUG corr={corr} | {layer} step={i} cartId=C{rng.randrange(1000)} '
+            logs.append(line.ljust(self.log_width, '.'))
+        if logs:
+            logs[-1] = logs[-1][:logs[-1].index('|') + 2] + error
+        return {
+            'test_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'module': module,
+            'status': 'FAIL',
+            'timestamp': when.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            'error_message': error,
+            'environment': self.environments.pick(rng),
+            'expected_behavior': f'{module} flow should complete',
+            'actual_behavior': error,
+            'failure_type': failure_type,
+            'impacted_layers': layers,
+            'correlation_id': corr,
+            'failure_categorization_reasoning': f'{module} failure categorized as {failure_type}. '
+                                                f"Logs indicate issue spans layers {', '.join(layers)}.",
+            'logs': logs,
+        }
+
+    def lines(self, count):
+        """count JSONL lines (without newlines), including duplicates and malformed lines."""
+        rng = self.rng
+        for _ in range(count):
+            if self.malformed_rate and rng.random() < self.malformed_rate:
+                line = json.dumps(self.record())
+                yield line[:rng.randrange(1, len(line) - 1)]
+                continue
+            if self._recent and self.duplicate_rate and rng.random() < self.duplicate_rate:
+                yield rng.choice(self._recent)
+                continue
+            line = json.dumps(self.record())
+            if self.duplicate_rate:
+                if len(self._recent) < DUPLICATE_WINDOW:
+                    self._recent.append(line)
+                else:
+                    self._recent[rng.randrange(DUPLICATE_WINDOW)] = line
+            yield line
+
+
+def write_failures(path, count, **options):
+    """Write count synthetic lines to path; options are FailureGenerator arguments."""
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    generator = FailureGenerator(**options)
+    with open(path, 'w', encoding='utf-8', buffering=1024 * 1024) as f:
+        for line in generator.lines(count):
+            f.write(line)
+            f.write('\n')
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Write seeded synthetic failure records as JSONL.')
+    parser.add_argument('--count', type=int, required=True, help='Number of lines to write')
+    parser.add_argument('--output', required=True, help='JSONL file to write')
+    parser.add_argument('--policy', default=POLICY_FILE, help='Policy YAML whose tables supply the values')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-lines', type=int, nargs=2, default=LOG_LINES, metavar=('MIN', 'MAX'),
+                        help='Log lines per record')
+    parser.add_argument('--log-width', type=int, default=LOG_WIDTH, help='Characters per log line')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='Share of lines repeating a recent record')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of truncated JSON lines')
+    parser.add_argument('--skew', type=float, default=SKEW,
+                        help='Zipf exponent over the policy values, in policy order (0 is uniform)')
+    parser.add_argument('--unknown-rate', type=float, default=UNKNOWN_RATE,
+                        help='Share of values not listed in the policy')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    write_failures(args.output, args.count, policy=load_policy(args.policy), seed=args.seed,
+                   log_lines=tuple(args.log_lines), log_width=args.log_width, duplicate_rate=args.duplicate_rate,
+                   malformed_rate=args.malformed_rate, skew=args.skew, unknown_rate=args.unknown_rate)
+    print(f"Wrote {args.count} synthetic failure lines to {args.output}.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
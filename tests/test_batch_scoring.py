@@ -0,0 +1,50 @@
+import unittest
+import importlib.util
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+class TestBatchScoring(unittest.TestCase):
+    def setUp(self):
+        self.policy = {
+            'minutes_per_impacted_layer': {'UI': 10, 'API': 20.5, 'DB': 15},
+            'multipliers': {'by_environment': {'prod': 2.0, 'qa': 1}, 'by_failure_type': {'crash': 3.0, 'error': 1.05}},
+            'module_priority_score': {'auth': 5, 'payment': 10, 'report': 0},
+            'caps': {'per_incident_minutes_max': 60}
+        }
+        rng = random.Random(7)
+        self.incidents = [{
+            'test_id': f't{i}',
+            'module': rng.choice(['auth', 'payment', 'report', 'unknown', None]),
+            'environment': rng.choice(['prod', 'qa', 'dev', None]),
+            'failure_type': rng.choice(['crash', 'error', 'other', None]),
+            'impacted_layers': rng.choice([[], None, ['UI'], ['UI', 'UI', 'DB'], ['API', 'Unknown'], ['DB', 'API', 'UI']])
+        } for i in range(2000)]
+
+    def test_sorted_batch_matches_scalar_path(self):
+        from incident_processor import score_incidents, sort_key
+        from batch_scoring import score_batch
+        expected = sorted(score_incidents(self.incidents, self.policy), key=sort_key)
+        actual = score_batch(self.incidents, self.policy, sort=True)
+        self.assertEqual(actual, expected)
+        for got, want in zip(actual, expected):
+            for field in ('base_minutes', 'final_minutes', 'priority_score'):
+                self.assertIs(type(got[field]), type(want[field]))
+
+    def test_chunks_preserve_input_order(self):
+        from incident_processor import score_incidents
+        from batch_scoring import score_chunks
+        self.assertEqual(list(score_chunks(self.incidents, self.policy, chunk_size=333)),
+                         list(score_incidents(self.incidents, self.policy)))
+
+    def test_empty_batch(self):
+        from batch_scoring import score_batch
+        self.assertEqual(score_batch([], self.policy, sort=True), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
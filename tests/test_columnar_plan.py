@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestColumnarPlan(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import build_plan, load_policy
+        self.plan = build_plan(os.path.join(DATA_DIR, 'Failures.jsonl'),
+                               load_policy(os.path.join(DATA_DIR, 'Policy.yaml')))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'plan.col')
+
+    def test_round_trips_plan_with_types(self):
+        from columnar_plan import ColumnarPlan, write_columnar_plan
+        self.assertEqual(write_columnar_plan(self.plan, self.path), len(self.plan))
+        with ColumnarPlan(self.path) as plan:
+            self.assertEqual(len(plan), len(self.plan))
+            decoded = list(plan)
+        self.assertEqual(decoded, self.plan)
+        for got, expected in zip(decoded, self.plan):
+            self.assertEqual([type(v) for v in got.values()], [type(v) for v in expected.values()])
+
+    def test_columns_and_slices_are_views_of_the_mapping(self):
+        from columnar_plan import ColumnarPlan, write_columnar_plan
+        write_columnar_plan(self.plan, self.path)
+        with ColumnarPlan(self.path) as plan:
+            final = plan.column('final_minutes')
+            self.assertIsInstance(final, memoryview)
+            self.assertTrue(final.readonly)
+            self.assertEqual(final.tolist(), [float(r['final_minutes']) for r in self.plan])
+            modules = plan.dictionaries['module']
+            self.assertEqual([modules[code] for code in plan.column('module')], [r['module'] for r in self.plan])
+            self.assertEqual(plan[2:5], self.plan[2:5])
+            self.assertEqual(plan[-1], self.plan[-1])
+            self.assertEqual(list(plan.records(3, 6)), self.plan[3:6])
+            del final
+
+    def test_unusual_values_round_trip(self):
+        from columnar_plan import ColumnarPlan, write_columnar_plan
+        odd = [
+            {'test_id': 7, 'module': None, 'environment': 3, 'failure_type': 'X', 'impacted_layers': 'UI',
+             'base_minutes': 2 ** 60, 'final_minutes': 1.5, 'priority_score': 0},
+            {'test_id': None, 'module': 'ü', 'environment': 'QA', 'failure_type': 'X', 'impacted_layers': [],
+             'base_minutes': 0, 'final_minutes': 0.0, 'priority_score': 1.25},
+        ]
+        write_columnar_plan(odd, self.path)
+        with ColumnarPlan(self.path) as plan:
+            self.assertEqual(list(plan), odd)
+        write_columnar_plan([], self.path)
+        with ColumnarPlan(self.path) as plan:
+            self.assertEqual(list(plan), [])
+
+    def test_rejects_other_files(self):
+        from columnar_plan import ColumnarPlan
+        with open(self.path, 'w') as f:
+            f.write('[]')
+        with self.assertRaises(ValueError):
+            ColumnarPlan(self.path)
+
+    def test_report_generator_reads_columnar_plan(self):
+        from columnar_plan import write_columnar_plan
+        from generate_html_report import iter_plan, write_html_report
+        write_columnar_plan(self.plan, self.path)
+        self.assertEqual(list(iter_plan(self.path)), self.plan)
+        from_columns, from_list = io.StringIO(), io.StringIO()
+        write_html_report(iter_plan(self.path), from_columns)
+        write_html_report(self.plan, from_list)
+        self.assertEqual(from_columns.getvalue(), from_list.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import random
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestHtmlReport(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import build_plan, load_policy
+        self.plan = build_plan(os.path.join(DATA_DIR, 'Failures.jsonl'),
+                               load_policy(os.path.join(DATA_DIR, 'Policy.yaml')))
+
+    def render(self, results, **kwargs):
+        from generate_html_report import write_html_report
+        out = io.StringIO()
+        write_html_report(results, out, **kwargs)
+        return out.getvalue()
+
+    def payload(self, html):
+        marker = 'id="incidentsData">'
+        start = html.index(marker) + len(marker)
+        return json.loads(html[start:html.index('</script>', start)])
+
+    def test_sorted_input_skips_sorting_with_identical_output(self):
+        expected = self.render(self.plan, presorted=False)
+        with mock.patch('generate_html_report.sorted', create=True) as sort:
+            self.assertEqual(self.render(self.plan), expected)
+            self.assertEqual(self.render(self.plan, presorted=True), expected)
+        sort.assert_not_called()
+
+    def test_unsorted_input_is_sorted(self):
+        shuffled = list(self.plan)
+        random.Random(1).shuffle(shuffled)
+        self.assertEqual(self.render(shuffled), self.render(shuffled, presorted=False))
+        scores = [float(row[7]) for row in self.payload(self.render(shuffled))['rows']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_incidents_are_embedded_once_as_json(self):
+        html = self.render(self.plan)
+        payload = self.payload(html)
+        self.assertEqual([row[0] for row in payload['rows']], [r['test_id'] for r in self.plan])
+        first = payload['rows'][0]
+        self.assertEqual(payload['dictionaries']['module'][first[1]], self.plan[0]['module'])
+        self.assertEqual(first[4], ', '.join(self.plan[0]['impacted_layers']))
+        self.assertNotIn('<tr class=', html)
+        self.assertTrue(html.rstrip().endswith('</html>'))
+
+    def test_formats_cells_and_escapes_script_tags(self):
+        incident = {'test_id': '</script><b>', 'module': None, 'environment': 'QA', 'failure_type': 'X',
+                    'impacted_layers': ['A'], 'base_minutes': 10, 'final_minutes': 12.25, 'priority_score': 4.5}
+        html = self.render([incident])
+        self.assertNotIn('</script><b>', html)
+        row = self.payload(html)['rows'][0]
+        self.assertEqual(row[0], '</script><b>')
+        self.assertEqual(row[5:], ['10', '12.2', '4.500'])
+        self.assertEqual(self.payload(html)['dictionaries']['module'], ['None'])
+
+    def test_iterator_input_matches_list_input(self):
+        self.assertEqual(self.render(iter(self.plan)), self.render(self.plan))
+        shuffled = list(self.plan)
+        random.Random(2).shuffle(shuffled)
+        self.assertEqual(self.render(iter(shuffled)), self.render(shuffled))
+
+    def test_aggregates_are_collected_in_one_pass(self):
+        from generate_html_report import PlanAggregates
+        aggregates = PlanAggregates()
+        for r in self.plan:
+            aggregates.add(r)
+        self.assertEqual(aggregates.total_incidents, len(self.plan))
+        self.assertTrue(aggregates.in_order)
+        modules, minutes = aggregates.module_minutes_data()
+        expected = {m: round(sum(r['final_minutes'] for r in self.plan if r['module'] == m), 1) for m in modules}
+        self.assertEqual(dict(zip(modules, minutes)), expected)
+        _, counts = aggregates.priority_histogram_data()
+        self.assertEqual(sum(counts), len(self.plan))
+
+    def test_iter_plan_reads_json_array_and_jsonl(self):
+        import tempfile
+        from generate_html_report import iter_plan
+        with tempfile.TemporaryDirectory() as tmp:
+            array_path = os.path.join(tmp, 'plan.json')
+            jsonl_path = os.path.join(tmp, 'plan.jsonl')
+            with open(array_path, 'w') as f:
+                json.dump(self.plan, f, indent=2)
+            with open(jsonl_path, 'w') as f:
+                f.write(''.join(json.dumps(r) + '\n' for r in self.plan))
+            self.assertEqual(list(iter_plan(array_path)), self.plan)
+            self.assertEqual(list(iter_plan(jsonl_path)), self.plan)
+            with open(array_path, 'w') as f:
+                f.write(' [ ] ')
+            self.assertEqual(list(iter_plan(array_path)), [])
+
+    def test_plan_path_falls_back_to_the_columnar_plan(self):
+        import tempfile
+        from generate_html_report import parse_args
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'plan.json')
+            col_path = os.path.join(tmp, 'plan.col')
+            with mock.patch('incident_processor.PLAN_FILE', json_path), \
+                    mock.patch('incident_processor.COLUMNAR_PLAN_FILE', col_path):
+                self.assertEqual(parse_args([]).plan, json_path)
+                open(col_path, 'wb').close()
+                self.assertEqual(parse_args([]).plan, col_path)
+                open(json_path, 'w').close()
+                self.assertEqual(parse_args([]).plan, json_path)
+                self.assertEqual(parse_args(['--plan', 'other.jsonl']).plan, 'other.jsonl')
+
+    def test_history_trends_are_opt_in(self):
+        import generate_html_report
+        from incident_processor import STORE_FILE
+        with mock.patch.object(generate_html_report, 'generate_html_report') as render:
+            generate_html_report.main(['--plan', 'plan.json'])
+            self.assertIsNone(render.call_args.kwargs['history_path'])
+            generate_html_report.main(['--plan', 'plan.json', '--history'])
+            self.assertEqual(render.call_args.kwargs['history_path'], STORE_FILE)
+
+    def test_side_outputs_older_than_the_plan_are_left_out(self):
+        import tempfile
+        import generate_html_report
+        with tempfile.TemporaryDirectory() as tmp:
+            plan_path = os.path.join(tmp, 'plan.json')
+            clusters_path = os.path.join(tmp, 'clusters.json')
+            schedule_path = os.path.join(tmp, 'schedule.json')
+            for path in (clusters_path, schedule_path, plan_path):
+                open(path, 'w').close()
+            os.utime(clusters_path, (0, 0))
+            argv = ['--plan', plan_path, '--clusters', clusters_path, '--schedule', schedule_path]
+            with mock.patch.object(generate_html_report, 'generate_html_report') as render, \
+                    mock.patch('sys.stdout', new_callable=io.StringIO) as out:
+                generate_html_report.main(argv)
+                self.assertIsNone(render.call_args.kwargs['clusters_path'])
+                self.assertEqual(render.call_args.kwargs['schedule_path'], schedule_path)
+                self.assertIn('older than', out.getvalue())
+                os.utime(clusters_path)
+                os.utime(schedule_path, (0, 0))
+                generate_html_report.main(argv)
+                self.assertEqual(render.call_args.kwargs['clusters_path'], clusters_path)
+                self.assertIsNone(render.call_args.kwargs['schedule_path'])
+                generate_html_report.main(['--plan', plan_path])
+                self.assertIsNone(render.call_args.kwargs['clusters_path'])
+                self.assertIsNone(render.call_args.kwargs['schedule_path'])
+
+    def test_json_array_parser_handles_chunk_boundaries(self):
+        from generate_html_report import _iter_json_array
+        text = json.dumps(self.plan[:20])
+        for chunk_size in (1, 7, 64):
+            self.assertEqual(list(_iter_json_array(io.StringIO(text), chunk_size)), self.plan[:20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import copy
+import io
+import json
+import random
+import shutil
+import tempfile
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestIncidentClustering(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            self.records = [json.loads(line) for line in f]
+
+    def test_main_clusters_the_deduplicated_records_of_its_own_pass(self):
+        from incident_clustering import cluster_incidents
+        from incident_processor import main
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        input_path = os.path.join(tmpdir, 'failures.jsonl')
+        with open(input_path, 'w') as f:
+            f.writelines(json.dumps(rec) + '\n' for rec in self.records + self.records[:10])
+        cluster_path = os.path.join(tmpdir, 'clusters.json')
+        with mock.patch('incident_clustering.read_raw_records') as reread, contextlib.redirect_stdout(io.StringIO()):
+            status = main(['--input', input_path, '--cluster', cluster_path, '--dedup', 'first',
+                           '--format', 'jsonl', '--no-policy-cache', '--output', os.path.join(tmpdir, 'plan.jsonl'),
+                           '--log-file', os.path.join(tmpdir, 'run.log')])
+        self.assertEqual(status, 0)
+        reread.assert_not_called()
+        with open(cluster_path) as f:
+            clusters = json.load(f)
+        self.assertEqual(clusters, cluster_incidents(self.records, self.policy))
+
+    def test_log_templates_mask_variable_tokens(self):
+        from incident_clustering import log_template
+        a = log_template('[2025-08-16 01:41:59.282] APP  DEBUG corr=corr-3c76 | Orchestrator received cartId=C123')
+        b = log_template('[2025-08-17 09:00:00.000] APP  DEBUG corr=corr-99aa | Orchestrator received cartId=C999')
+        self.assertEqual(a, b)
+        self.assertEqual(a, 'app debug <*> | orchestrator received <*>')
+
+    def test_repeated_failure_with_new_ids_is_clustered(self):
+        from incident_clustering import cluster_incidents
+        original = self.records[0]
+        repeat = copy.deepcopy(original)
+        repeat['test_id'] = 'repeat-1'
+        repeat['correlation_id'] = 'corr-0000aaaa1111'
+        repeat['logs'] = [line.replace(original['correlation_id'], 'corr-0000aaaa1111').replace('C123', 'C777')
+                          for line in original['logs']]
+        repeat['environment'] = 'Prod'
+        clusters = cluster_incidents(self.records + [repeat], self.policy)
+        cluster = next(c for c in clusters if 'repeat-1' in {m['test_id'] for m in c['members']})
+        self.assertIn(original['test_id'], {m['test_id'] for m in cluster['members']})
+        self.assertEqual(cluster['member_count'], len(cluster['members']))
+        minutes = [m['final_minutes'] for m in cluster['members']]
+        self.assertAlmostEqual(cluster['total_final_minutes'], sum(minutes), places=3)
+        self.assertEqual(cluster['dedup_final_minutes'], max(minutes))
+
+    def test_clusters_cover_every_incident_in_plan_order(self):
+        from incident_clustering import cluster_incidents
+        from incident_processor import sort_key
+        clusters = cluster_incidents(self.records, self.policy)
+        members = [m['test_id'] for c in clusters for m in c['members']]
+        self.assertEqual(sorted(members), sorted(r['test_id'] for r in self.records))
+        self.assertEqual(clusters, sorted(clusters, key=sort_key))
+        self.assertEqual([c['cluster_id'] for c in clusters], list(range(1, len(clusters) + 1)))
+        for cluster in clusters:
+            messages = {r['error_message'] for r in self.records
+                        if r['test_id'] in {m['test_id'] for m in cluster['members']}}
+            self.assertEqual(len(messages), 1)
+
+    def test_banding_finds_every_pair_within_threshold(self):
+        from incident_clustering import MAX_DISTANCE, group_fingerprints
+        rng = random.Random(7)
+        base = [rng.getrandbits(64) for _ in range(50)]
+        fingerprints = []
+        for value in base:
+            fingerprints.append(value)
+            for bit in rng.sample(range(64), MAX_DISTANCE):
+                value ^= 1 << bit
+            fingerprints.append(value)
+        groups = group_fingerprints(fingerprints)
+        self.assertEqual(groups, [[i, i + 1] for i in range(0, len(fingerprints), 2)])
+
+    def test_report_lists_repeated_clusters(self):
+        from incident_clustering import cluster_incidents
+        from incident_processor import build_plan
+        from generate_html_report import write_html_report
+        clusters = cluster_incidents(self.records, self.policy)
+        out = io.StringIO()
+        write_html_report(build_plan(os.path.join(DATA_DIR, 'Failures.jsonl'), self.policy), out, clusters=clusters)
+        html = out.getvalue()
+        self.assertIn('Near-duplicate Clusters', html)
+        self.assertEqual(html.count('<details class="cluster">'), sum(1 for c in clusters if c['member_count'] > 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
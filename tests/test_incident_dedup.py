@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+
+class TestIncidentDedup(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name, records):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            for rec in records:
+                f.write(json.dumps(rec) + '\n')
+        return path
+
+    def incident(self, test_id, corr, timestamp, module='Cart'):
+        return {'test_id': test_id, 'correlation_id': corr, 'timestamp': timestamp, 'module': module,
+                'environment': 'QA', 'failure_type': 'X', 'impacted_layers': ['UI']}
+
+    def run_dedup(self, inputs, **kwargs):
+        from incident_dedup import Deduplicator
+        dedup = Deduplicator(spill_dir=os.path.join(self.tmpdir, 'spill'), **kwargs)
+        return dedup, list(dedup.records(inputs, decoder='json'))
+
+    def test_keep_first_and_per_input_counts(self):
+        a = self.write('a.jsonl', [self.incident('t1', 'c1', '2025-08-01T00:00:00Z'),
+                                   self.incident('t2', 'c2', '2025-08-01T00:00:00Z')])
+        b = self.write('b.jsonl', [self.incident('t1', 'c1', '2025-08-02T00:00:00Z', module='Late'),
+                                   self.incident('t1', 'c9', '2025-08-02T00:00:00Z'),
+                                   self.incident('t2', 'c2', '2025-07-01T00:00:00Z')])
+        dedup, records = self.run_dedup([a, b], keep='first')
+        self.assertEqual([(r['test_id'], r['correlation_id'], r['module']) for r in records],
+                         [('t1', 'c1', 'Cart'), ('t2', 'c2', 'Cart'), ('t1', 'c9', 'Cart')])
+        self.assertEqual(dedup.stats, {a: {'records': 2, 'duplicates': 0}, b: {'records': 3, 'duplicates': 2}})
+        self.assertIn('removed 2 duplicate', dedup.summary())
+
+    def test_keep_latest_by_timestamp_in_input_order(self):
+        a = self.write('a.jsonl', [self.incident('t1', 'c1', '2025-08-01T00:00:00Z'),
+                                   self.incident('t2', 'c2', '2025-08-05T00:00:00Z', module='Newest')])
+        b = self.write('b.jsonl', [self.incident('t1', 'c1', '2025-08-02T00:00:00+00:00', module='Newest'),
+                                   self.incident('t2', 'c2', '2025-08-03T00:00:00Z'),
+                                   {'module': 'NoKey', 'environment': 'QA'}])
+        dedup, records = self.run_dedup([a, b], keep='latest')
+        self.assertEqual([(r['test_id'], r['module']) for r in records],
+                         [('t2', 'Newest'), ('t1', 'Newest'), (None, 'NoKey')])
+        self.assertEqual(dedup.stats[a]['duplicates'], 1)
+        self.assertEqual(dedup.stats[b]['duplicates'], 1)
+
+    def test_spilled_keys_stay_exact(self):
+        records = [self.incident(f't{i % 500}', 'c', '2025-08-01T00:00:00Z') for i in range(2000)]
+        path = self.write('many.jsonl', records)
+        # A tiny Bloom filter and flush batch force the on-disk lookups.
+        with mock.patch('incident_dedup.FLUSH_BATCH', 7):
+            for keep in ('first', 'latest'):
+                with self.subTest(keep=keep):
+                    dedup, kept = self.run_dedup(path, keep=keep, expected_records=10)
+                    self.assertEqual(sorted(r['test_id'] for r in kept), sorted(f't{i}' for i in range(500)))
+                    self.assertEqual(dedup.stats[path]['duplicates'], 1500)
+
+    def test_configurable_keys_are_validated(self):
+        from incident_dedup import Deduplicator
+        a = self.write('a.jsonl', [self.incident('t1', 'c1', None), self.incident('t1', 'c2', None)])
+        _, records = self.run_dedup(a, keys=('test_id',))
+        self.assertEqual(len(records), 1)
+        with self.assertRaises(ValueError):
+            Deduplicator(keys=('logs',))
+        with self.assertRaises(ValueError):
+            Deduplicator(keep='random')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        import hashlib
+        from incident_dedup import BloomFilter
+        bloom = BloomFilter(1000, 0.01)
+        digests = [hashlib.blake2b(str(i).encode(), digest_size=16).digest() for i in range(2000)]
+        for digest in digests[:1000]:
+            bloom.add(digest)
+        self.assertTrue(all(digest in bloom for digest in digests[:1000]))
+        false_positives = sum(digest in bloom for digest in digests[1000:])
+        self.assertLess(false_positives, 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
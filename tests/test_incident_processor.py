@@ -4,6 +4,8 @@ import os
 # Ensure parent directory is in sys.path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import json
+import shutil
+import tempfile
 import yaml
 
 class TestPlanLogic(unittest.TestCase):
@@ -116,5 +118,166 @@ class TestPlanLogic(unittest.TestCase):
         expected = 10 + 20 + 15 + 0 + 10 + 15
         self.assertEqual(get_layer_minutes(layers, self.policy['layer_minutes']), expected)
 
+class TestStreamingPipeline(unittest.TestCase):
+    def setUp(self):
+        self.policy = {
+            'minutes_per_impacted_layer': {'UI': 10, 'API': 20},
+            'multipliers': {'by_environment': {'prod': 2.0}, 'by_failure_type': {'crash': 3.0}},
+            'module_priority_score': {'auth': 5, 'payment': 10},
+            'caps': {'per_incident_minutes_max': 100}
+        }
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmpdir, 'failures.jsonl')
+        with open(self.input_path, 'w') as f:
+            f.write(json.dumps({'test_id': 't1', 'module': 'auth', 'environment': 'prod',
+                                'failure_type': 'crash', 'impacted_layers': ['UI', 'API'], 'logs': ['x']}) + '\n')
+            f.write('{not json\n')
+            f.write('\n')
+            f.write(json.dumps({'test_id': 't2', 'module': 'payment', 'environment': 'dev',
+                                'failure_type': 'crash', 'impacted_layers': ['UI']}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_failures_projects_and_skips_malformed(self):
+        from incident_processor import read_failures
+        records = list(read_failures(self.input_path))
+        self.assertEqual([r['test_id'] for r in records], ['t1', 't2'])
+        self.assertNotIn('logs', records[0])
+
+    def test_stream_plan_writes_jsonl_in_input_order(self):
+        from incident_processor import stream_plan
+        output_path = os.path.join(self.tmpdir, 'plan.jsonl')
+        self.assertEqual(stream_plan(self.input_path, self.policy, output_path), 2)
+        with open(output_path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([r['test_id'] for r in rows], ['t1', 't2'])
+        self.assertEqual(rows[0]['final_minutes'], 100)
+
+    def test_build_plan_matches_stream_after_sort(self):
+        from incident_processor import build_plan, read_failures, score_incidents, sort_key
+        streamed = sorted(score_incidents(read_failures(self.input_path), self.policy), key=sort_key)
+        self.assertEqual(build_plan(self.input_path, self.policy), streamed)
+        self.assertEqual([r['test_id'] for r in streamed], ['t1', 't2'])
+
+    def test_main_writes_sorted_plan(self):
+        import yaml
+        from incident_processor import main
+        policy_path = os.path.join(self.tmpdir, 'policy.yaml')
+        with open(policy_path, 'w') as f:
+            yaml.safe_dump(self.policy, f)
+        output_path = os.path.join(self.tmpdir, 'out', 'plan.json')
+        main(['--input', self.input_path, '--policy', policy_path, '--output', output_path,
+              '--log-file', os.path.join(self.tmpdir, 'run.log'),
+              '--policy-cache-dir', os.path.join(self.tmpdir, 'cache')])
+        with open(output_path) as f:
+            self.assertEqual([r['test_id'] for r in json.load(f)], ['t1', 't2'])
+
+class TestDecoders(unittest.TestCase):
+    LINES = [
+        '{"test_id": "a", "module": "m", "environment": "QA", "failure_type": "X", "impacted_layers": ["L1"], "logs": ["x"]}',
+        '{"test_id": "b", "module": null, "impacted_layers": null}',
+        '{"test_id": "c", "module": "m", "module": "dup", "extra": {"deep": [1, 2]}}',
+        '{"test_id": 123456789012345678901234567890, "module": NaN, "environment": 1.5e3}',
+        '{"test_id": "d", "module": "caf\\u00e9", "impacted_layers": ["\\ud83d\\ude00"]}',
+        '{"test_id": "e", broken',
+        '',
+    ]
+
+    def available_backends(self):
+        import importlib.util
+        from incident_processor import DECODER_BACKENDS
+        return [name for name in DECODER_BACKENDS if name == 'json' or importlib.util.find_spec(name)]
+
+    def parse(self, backend, lines):
+        from incident_processor import parse_lines
+        malformed = []
+        records = list(parse_lines(lines, on_malformed=lambda idx, e, source: malformed.append((idx, str(e))),
+                                   decoder=backend))
+        return records, malformed
+
+    def test_backends_match_stdlib(self):
+        expected = self.parse('json', self.LINES)
+        self.assertEqual(expected[1][0][0], 6)
+        for backend in self.available_backends():
+            for lines in (self.LINES, [line.encode('utf-8') for line in self.LINES]):
+                with self.subTest(backend=backend, type=type(lines[0])):
+                    actual = self.parse(backend, lines)
+                    self.assertEqual(repr(actual), repr(expected))
+
+    def test_non_object_lines_fail_like_stdlib(self):
+        for backend in self.available_backends():
+            with self.subTest(backend=backend):
+                with self.assertRaises(AttributeError):
+                    self.parse(backend, ['[1, 2]'])
+
+class TestCompiledPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = {
+            'minutes_per_impacted_layer': {'UI': 10, 'API': 20},
+            'multipliers': {'by_environment': {'prod': 2.0}, 'by_failure_type': {'crash': 3.0}},
+            'module_priority_score': {'auth': 5},
+            'caps': {'per_incident_minutes_max': 100}
+        }
+
+    def test_score_matches_helpers_and_counts_repeated_layers(self):
+        from incident_processor import CompiledPolicy
+        compiled = CompiledPolicy(self.policy)
+        self.assertEqual(compiled.score('auth', 'prod', 'crash', ['UI', 'API']), (30, 100, 30.0))
+        self.assertEqual(compiled.score('auth', 'dev', 'other', ['UI', 'UI']), (20, 20.0, 5.0))
+        self.assertEqual(compiled.score(None, None, None, None), (0, 0.0, 1.0))
+        compiled.score('auth', 'prod', 'crash', ['UI', 'API'])
+        self.assertEqual(compiled.cache_info().hits, 1)
+
+    def test_is_immutable_and_picklable(self):
+        import pickle
+        from incident_processor import CompiledPolicy
+        compiled = CompiledPolicy(self.policy, source_hash='abc')
+        with self.assertRaises(AttributeError):
+            compiled.upper_cap = 5
+        with self.assertRaises(TypeError):
+            compiled.layer_minutes['UI'] = 1
+        restored = pickle.loads(pickle.dumps(compiled))
+        self.assertEqual(restored.to_dict(), compiled.to_dict())
+        self.assertEqual(restored.source_hash, 'abc')
+
+    def test_load_compiled_policy_reuses_disk_cache(self):
+        from unittest import mock
+        from incident_processor import load_compiled_policy
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        policy_path = os.path.join(tmpdir, 'policy.yaml')
+        with open(policy_path, 'w') as f:
+            yaml.safe_dump(self.policy, f)
+        cache_dir = os.path.join(tmpdir, 'cache')
+        first = load_compiled_policy(policy_path, cache_dir)
+        with mock.patch('yaml.safe_load', side_effect=AssertionError('YAML should not be parsed')):
+            second = load_compiled_policy(policy_path, cache_dir)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_policy_cache_is_json_checked_against_the_policy_file(self):
+        from incident_processor import load_compiled_policy
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        policy_path = os.path.join(tmpdir, 'policy.yaml')
+        with open(policy_path, 'w') as f:
+            yaml.safe_dump(self.policy, f)
+        cache_dir = os.path.join(tmpdir, 'cache')
+        load_compiled_policy(policy_path, cache_dir)
+        [name] = os.listdir(cache_dir)
+        self.assertTrue(name.endswith('.json'))
+        cache_file = os.path.join(cache_dir, name)
+        with open(cache_file) as f:
+            cached = json.load(f)
+        # An entry whose recorded hash does not match the policy file is ignored.
+        cached['source_hash'] = 'not-the-policy'
+        cached['tables']['caps']['per_incident_minutes_max'] = 1
+        with open(cache_file, 'w') as f:
+            json.dump(cached, f)
+        with self.assertLogs(level='WARNING'):
+            compiled = load_compiled_policy(policy_path, cache_dir)
+        self.assertEqual(compiled.upper_cap, 100)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestIncidentSearch(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.index_path = os.path.join(self.tmpdir, 'index.sqlite')
+        self.input_path = os.path.join(self.tmpdir, 'failures.jsonl')
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            self.lines = f.readlines()
+        self.records = [json.loads(line) for line in self.lines]
+
+    def write_input(self, lines, mode='w'):
+        with open(self.input_path, mode) as f:
+            f.writelines(lines)
+
+    def test_tokenize_keeps_identifiers_and_their_parts(self):
+        from incident_search import tokenize
+        tokens = tokenize('APIGW matched POST /api/orders/checkout → Orchestrator.start corr=corr-3c760a54 at 01:41:59')
+        self.assertTrue({'apigw', 'orchestrator.start', 'orchestrator', 'start', 'corr-3c760a54', '3c760a54',
+                         'api/orders/checkout', 'checkout'} <= tokens)
+        self.assertNotIn('01', tokens)
+
+    def test_finds_incidents_by_correlation_id_and_service(self):
+        from incident_search import IncidentIndex
+        self.write_input(self.lines)
+        with IncidentIndex(self.index_path) as index:
+            self.assertEqual(index.update(self.input_path, self.policy), len(self.records))
+            first = self.records[0]
+            hits = index.search(f"corr={first['correlation_id']}")
+            self.assertEqual([hit['test_id'] for hit in hits], [first['test_id']])
+            self.assertEqual(hits[0]['line'], 1)
+
+            expected = {r['test_id'] for r in self.records
+                        if any('CartService' in line for line in r['logs']) or 'CartService' in r['impacted_layers']}
+            hits = index.search('cartservice', limit=len(self.records))
+            self.assertEqual({hit['test_id'] for hit in hits}, expected)
+            scores = [hit['priority_score'] for hit in hits]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+            prefix = first['correlation_id'][:9]
+            self.assertIn(first['test_id'], [hit['test_id'] for hit in index.search(prefix + '*')])
+            self.assertEqual(index.search('nosuchtokenanywhere'), [])
+
+    def test_update_only_reads_appended_lines(self):
+        from incident_search import IncidentIndex
+        self.write_input(self.lines[:10])
+        with IncidentIndex(self.index_path) as index:
+            self.assertEqual(index.update(self.input_path, self.policy), 10)
+            # Same inode, size and mtime: trusted without reading it.
+            with mock.patch('incremental_processor.prefix_matches') as verified:
+                self.assertEqual(index.update(self.input_path, self.policy), 0)
+            verified.assert_not_called()
+            # A partial trailing line waits for its newline.
+            self.write_input(self.lines[10:12] + [self.lines[12].rstrip('\n')], mode='a')
+            self.assertEqual(index.update(self.input_path, self.policy), 2)
+            self.write_input(['\n'], mode='a')
+            self.assertEqual(index.update(self.input_path, self.policy), 1)
+            hits = index.search(self.records[12]['correlation_id'])
+            self.assertEqual([(hit['test_id'], hit['line']) for hit in hits], [(self.records[12]['test_id'], 13)])
+
+    def test_main_indexes_the_deduplicated_records_of_its_own_pass(self):
+        import incremental_processor
+        from incident_processor import main
+        from incident_search import IncidentIndex
+        from incremental_processor import prefix_hashes
+
+        def run():
+            # Complete lines are counted and hashed from the main pass's own reads.
+            with mock.patch('incident_search.IndexUpdate.read_new_lines') as reread, \
+                    mock.patch('incident_search._complete_blocks') as scanned, \
+                    mock.patch('incident_search.prefix_hashes') as hashed, \
+                    mock.patch.object(incremental_processor, 'HASH_BLOCK_SIZE', 1000), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                status = main(['--input', self.input_path, '--index', self.index_path, '--dedup', 'latest',
+                               '--no-policy-cache', '--output', os.path.join(self.tmpdir, 'plan.json'),
+                               '--log-file', os.path.join(self.tmpdir, 'run.log')])
+            self.assertEqual(status, 0)
+            for reader in (reread, scanned, hashed):
+                reader.assert_not_called()
+            with open(os.path.join(self.tmpdir, 'plan.json')) as f:
+                plan = json.load(f)
+            with IncidentIndex(self.index_path) as index:
+                rows = index.conn.execute('SELECT test_id, line FROM docs ORDER BY line').fetchall()
+                offset, lines, hashes = index.conn.execute('SELECT offset, lines, prefix_hash FROM files').fetchone()
+            with open(self.input_path, 'rb') as f:
+                data = f.read()
+                self.assertEqual(offset, data.rfind(b'\n') + 1)
+                self.assertEqual(lines, len(data[:offset].splitlines()))
+                with mock.patch.object(incremental_processor, 'HASH_BLOCK_SIZE', 1000):
+                    self.assertEqual(json.loads(hashes), prefix_hashes(f, offset))
+            return plan, rows
+
+        self.write_input(self.lines[:30])
+        plan, rows = run()
+        self.assertEqual([line for _, line in rows], list(range(1, 31)))
+        # A newer copy of the first incident replaces it; a partial last line waits for its newline.
+        newer = dict(self.records[0], timestamp='2099-01-01T00:00:00Z', error_message='superseded')
+        self.write_input([json.dumps(newer) + '\n'] + self.lines[30:35] + [self.lines[35].rstrip('\n')], mode='a')
+        plan, rows = run()
+        self.assertEqual(len(plan), 36)
+        self.assertEqual([line for _, line in rows], list(range(2, 37)))
+        with IncidentIndex(self.index_path) as index:
+            hits = index.search(self.records[0]['correlation_id'])
+            self.assertEqual([(hit['line'], hit['error_message']) for hit in hits], [(31, 'superseded')])
+        self.write_input(['\n'], mode='a')
+        plan, rows = run()
+        self.assertEqual(sorted(test_id for test_id, _ in rows), sorted(r['test_id'] for r in plan))
+        self.assertEqual(rows[-1][1], 37)
+
+    def test_rewritten_file_is_reindexed(self):
+        from incident_search import IncidentIndex
+        self.write_input(self.lines[:10])
+        with IncidentIndex(self.index_path) as index:
+            index.update(self.input_path, self.policy)
+            self.write_input(self.lines[20:25])
+            self.assertEqual(index.update(self.input_path, self.policy), 5)
+            self.assertEqual(index.search(self.records[0]['correlation_id']), [])
+            count = index.conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+        self.assertEqual(count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
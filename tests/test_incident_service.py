@@ -0,0 +1,176 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import json
+import shutil
+import tempfile
+
+import yaml
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestIncidentService(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.policy_path = os.path.join(self.tmpdir, 'policy.yaml')
+        self.write_policy(self.policy)
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            self.lines = [line for line in f if line.strip()]
+        self.inputs = os.path.join(self.tmpdir, 'inputs')
+        os.makedirs(self.inputs)
+        self.first = self.write('a.jsonl', self.lines[:40])
+        self.second = self.write('b.jsonl', self.lines[40:70])
+
+    def write_policy(self, policy):
+        with open(self.policy_path, 'w') as f:
+            yaml.safe_dump(policy, f)
+
+    def write(self, name, lines, mode='w'):
+        path = os.path.join(self.inputs, name)
+        with open(path, mode) as f:
+            f.writelines(lines)
+        return path
+
+    def state(self):
+        from incident_service import PlanState
+        state = PlanState([self.inputs], self.policy_path, policy_cache_dir=None)
+        self.assertTrue(state.refresh())
+        return state
+
+    def assertMatchesBuildPlan(self, state):
+        from incident_processor import build_plan, load_policy
+        paths = sorted(os.path.join(self.inputs, name) for name in os.listdir(self.inputs))
+        self.assertEqual(state.snapshot.results, build_plan(paths, load_policy(self.policy_path)))
+
+    def test_refresh_applies_only_changes_and_matches_build_plan(self):
+        from unittest import mock
+        state = self.state()
+        self.assertMatchesBuildPlan(state)
+        self.assertFalse(state.refresh())
+        self.assertEqual(state.snapshot.generation, 0)
+
+        # Appending to the first input must keep its incidents ahead of the second's among ties.
+        self.write('a.jsonl', self.lines[70:90], 'a')
+        with mock.patch('incremental_processor.parse_lines',
+                        wraps=__import__('incident_processor').parse_lines) as parse:
+            self.assertTrue(state.refresh())
+        self.assertEqual(sum(len(call.args[0]) for call in parse.call_args_list), 20)
+        self.assertEqual(state.snapshot.generation, 1)
+        self.assertMatchesBuildPlan(state)
+
+        self.write('b.jsonl', self.lines[90:100])
+        self.write('c.jsonl', self.lines[100:])
+        self.assertTrue(state.refresh())
+        self.assertMatchesBuildPlan(state)
+
+        os.remove(self.first)
+        self.assertTrue(state.refresh())
+        self.assertMatchesBuildPlan(state)
+
+    def test_policy_change_rescores_without_rereading(self):
+        from unittest import mock
+        state = self.state()
+        self.policy['module_priority_score']['Payment Gateway'] = 1
+        self.write_policy(self.policy)
+        with mock.patch('incremental_processor.read_appended') as read:
+            self.assertTrue(state.refresh())
+        read.assert_not_called()
+        self.assertMatchesBuildPlan(state)
+
+    def test_responses_are_cached_per_generation_with_etags(self):
+        from incident_service import IncidentService
+        service = IncidentService(self.state())
+        status, head, body = service.respond('GET', '/plan?top=3', {})
+        self.assertEqual(status, 200)
+        plan = json.loads(body)
+        self.assertEqual(plan['count'], 3)
+        self.assertEqual(plan['incidents'], service.state.snapshot.results[:3])
+        etag = dict(head)['ETag']
+        self.assertEqual(service.respond('GET', '/plan?top=3', {'if-none-match': etag})[0], 304)
+
+        module = plan['incidents'][0]['module']
+        environment = plan['incidents'][0]['environment']
+        _, _, body = service.respond('GET', f'/plan?top=all&module={module},Unknown&environment={environment}', {})
+        filtered = json.loads(body)['incidents']
+        self.assertTrue(filtered)
+        self.assertEqual(filtered, [r for r in service.state.snapshot.results
+                                    if r['module'] == module and r['environment'] == environment])
+
+        _, _, body = service.respond('GET', '/aggregates', {})
+        aggregates = json.loads(body)
+        self.assertEqual(aggregates['total_incidents'], 70)
+        self.assertEqual(sum(m['incidents'] for m in aggregates['by_module'].values()), 70)
+        status, head, body = service.respond('GET', '/', {})
+        self.assertEqual((status, dict(head)['Content-Type']), (200, 'text/html; charset=utf-8'))
+        self.assertIn(b'incidentsData', body)
+
+        self.write('b.jsonl', self.lines[70:75], 'a')
+        service.refresh()
+        status, head, _ = service.respond('GET', '/plan?top=3', {'if-none-match': etag})
+        self.assertEqual(status, 200)
+        self.assertEqual(dict(head)['X-Plan-Generation'], '1')
+        self.assertEqual(json.loads(service.respond('GET', '/aggregates', {})[2])['total_incidents'], 75)
+
+    def test_errors(self):
+        from incident_service import IncidentService, PlanState
+        service = IncidentService(PlanState([self.inputs], self.policy_path, policy_cache_dir=None))
+        self.assertEqual(service.respond('GET', '/plan', {})[0], 503)
+        service.refresh()
+        self.assertEqual(service.respond('GET', '/nope', {})[0], 404)
+        self.assertEqual(service.respond('GET', '/plan?top=x', {})[0], 400)
+        self.assertEqual(service.respond('POST', '/plan', {})[0], 405)
+        # A broken policy keeps the last plan in service.
+        with open(self.policy_path, 'w') as f:
+            f.write('module_priority_score: [unclosed')
+        with self.assertLogs(level='ERROR'):
+            service.refresh()
+        self.assertEqual(service.respond('GET', '/plan', {})[0], 200)
+
+    def test_http_keep_alive_and_conditional_get(self):
+        from incident_service import IncidentService, PlanState
+
+        async def exchange(reader, writer, target, etag=None):
+            request = f'GET {target} HTTP/1.1\r\nHost: localhost\r\n'
+            if etag:
+                request += f'If-None-Match: {etag}\r\n'
+            writer.write((request + '\r\n').encode('latin-1'))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) != b'\r\n':
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            return status, headers, body
+
+        async def run():
+            service = IncidentService(PlanState([self.inputs], self.policy_path, policy_cache_dir=None), interval=60)
+            server = await service.start('127.0.0.1', 0)
+            try:
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                status, headers, body = await exchange(reader, writer, '/aggregates')
+                self.assertEqual(status, 200)
+                self.assertEqual(json.loads(body)['total_incidents'], 70)
+                status, _, body = await exchange(reader, writer, '/aggregates', headers['etag'])
+                self.assertEqual((status, body), (304, b''))
+                status, _, _ = await exchange(reader, writer, '/style.css')
+                self.assertEqual(status, 200)
+                writer.close()
+            finally:
+                service.stop()
+                server.close()
+                await server.wait_closed()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
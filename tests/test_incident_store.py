@@ -0,0 +1,135 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestIncidentStore(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.input_path = os.path.join(DATA_DIR, 'Failures.jsonl')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'history.sqlite')
+
+    def test_incident_day_normalizes_to_utc(self):
+        from incident_store import incident_day
+        self.assertEqual(incident_day('2025-08-16T01:41:59.247Z'), '2025-08-16')
+        self.assertEqual(incident_day('2025-08-16T01:00:00+05:30'), '2025-08-15')
+        self.assertIsNone(incident_day('yesterday'))
+        self.assertIsNone(incident_day(None))
+
+    def test_rerecording_the_same_dump_adds_nothing(self):
+        from incident_store import IncidentStore, record_run
+        seen, added = record_run(self.input_path, self.policy, self.path)
+        self.assertEqual(seen, added)
+        self.assertEqual(record_run(self.input_path, self.policy, self.path), (seen, 0))
+        with IncidentStore(self.path) as store:
+            stored = store.conn.execute('SELECT COUNT(*) FROM incidents').fetchone()[0]
+            rolled_up = store.conn.execute('SELECT SUM(incident_count) FROM daily_rollups').fetchone()[0]
+            runs = store.conn.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+        self.assertEqual(stored, seen)
+        self.assertEqual(rolled_up, seen)
+        self.assertEqual(runs, 2)
+
+    def test_incidents_missing_test_id_or_timestamp_are_stored_once(self):
+        from incident_store import IncidentStore
+        incidents = [{'module': 'Cart'}, {'test_id': 't1', 'module': 'Cart'},
+                     {'timestamp': '2025-08-16T01:41:59Z', 'module': 'Cart'}]
+        with IncidentStore(self.path) as store:
+            self.assertEqual(store.record_incidents(incidents, self.policy), (3, 3))
+            self.assertEqual(store.record_incidents(incidents, self.policy), (3, 0))
+
+    def test_repeats_in_older_stores_are_removed(self):
+        import sqlite3
+        from incident_store import IncidentStore
+        incident = {'module': 'Cart', 'timestamp': '2025-08-16T01:41:59Z'}
+        with IncidentStore(self.path) as store:
+            store.record_incidents([incident], self.policy)
+        # A store from before the key index, holding the same incident twice.
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.execute('DROP INDEX incidents_by_key')
+            conn.execute('INSERT INTO incidents (run_id, timestamp, day, module, final_minutes) '
+                         'SELECT run_id, timestamp, day, module, final_minutes FROM incidents')
+            conn.execute('UPDATE daily_rollups SET incident_count = 2')
+        conn.close()
+        with IncidentStore(self.path) as store:
+            self.assertEqual(store.conn.execute('SELECT COUNT(*) FROM incidents').fetchone()[0], 1)
+            self.assertEqual(store.conn.execute('SELECT SUM(incident_count) FROM daily_rollups').fetchone()[0], 1)
+            self.assertEqual(store.record_incidents([incident], self.policy), (1, 0))
+
+    def test_main_stores_the_deduplicated_records_of_its_own_pass(self):
+        from incident_processor import main
+        from incident_store import IncidentStore
+        with open(self.input_path) as f:
+            lines = [line for line in f if line.strip()]
+        input_path = os.path.join(self.tmpdir, 'failures.jsonl')
+        with open(input_path, 'w') as f:
+            f.writelines(lines + lines[:10])
+        for output_format in ('json', 'jsonl'):
+            with self.subTest(output_format=output_format):
+                path = os.path.join(self.tmpdir, f'{output_format}.sqlite')
+                with mock.patch('incident_store.read_inputs') as reread, contextlib.redirect_stdout(io.StringIO()):
+                    status = main(['--input', input_path, '--store', path, '--dedup', 'first',
+                                   '--format', output_format, '--no-policy-cache',
+                                   '--output', os.path.join(self.tmpdir, f'plan.{output_format}'),
+                                   '--log-file', os.path.join(self.tmpdir, 'run.log')])
+                self.assertEqual(status, 0)
+                reread.assert_not_called()
+                with IncidentStore(path) as store:
+                    self.assertEqual(store.conn.execute('SELECT incidents_seen FROM runs').fetchone()[0],
+                                     len(lines))
+
+    def test_trend_matches_scored_plan(self):
+        from incident_processor import build_plan, read_inputs
+        from incident_store import IncidentStore, incident_day, record_run
+        record_run(self.input_path, self.policy, self.path)
+        plan = build_plan(self.input_path, self.policy)
+        days = {rec['test_id']: incident_day(rec['timestamp']) for rec in read_inputs(self.input_path)}
+        with IncidentStore(self.path) as store:
+            end = store.latest_day()
+            trend = store.trend('final_minutes', 'module', days=30)
+            counts = store.trend('incidents', 'failure_type', days=30, end=end)
+        self.assertEqual(len(trend['days']), 30)
+        self.assertEqual(trend['days'][-1], end)
+        window = set(trend['days'])
+        for module, values in trend['series'].items():
+            expected = sum(r['final_minutes'] for r in plan
+                           if r['module'] == module and days[r['test_id']] in window)
+            self.assertAlmostEqual(sum(values), expected, places=2)
+        self.assertEqual(sum(map(sum, counts['series'].values())),
+                         sum(1 for r in plan if days[r['test_id']] in window))
+
+    def test_trend_rejects_unknown_columns(self):
+        from incident_store import IncidentStore
+        with IncidentStore(self.path) as store:
+            with self.assertRaises(ValueError):
+                store.trend(by='test_id; DROP TABLE incidents')
+            self.assertEqual(store.trend(), {'days': [], 'series': {}})
+
+    def test_report_includes_trends_only_with_history(self):
+        from incident_processor import build_plan
+        from incident_store import load_trends, record_run
+        from generate_html_report import write_html_report
+        plan = build_plan(self.input_path, self.policy)
+        self.assertIsNone(load_trends(self.path))
+        without, with_trends = io.StringIO(), io.StringIO()
+        write_html_report(plan, without)
+        record_run(self.input_path, self.policy, self.path)
+        write_html_report(plan, with_trends, trends=load_trends(self.path))
+        self.assertNotIn('moduleMinutesTrendChart', without.getvalue())
+        self.assertIn('moduleMinutesTrendChart', with_trends.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
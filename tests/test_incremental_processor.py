@@ -0,0 +1,146 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy
+import shutil
+import tempfile
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestIncrementalProcessor(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.tmpdir = tempfile.mkdtemp()
+        self.state_dir = os.path.join(self.tmpdir, 'state')
+        self.input_path = os.path.join(self.tmpdir, 'failures.jsonl')
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            self.lines = f.readlines()
+        self.write_lines(self.lines[:60])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_lines(self, lines, mode='w'):
+        with open(self.input_path, mode) as f:
+            f.writelines(lines)
+
+    def update(self, policy=None):
+        from incremental_processor import update_plan
+        return update_plan([self.input_path], policy or self.policy, self.state_dir)
+
+    def full(self, policy=None):
+        from incident_processor import build_plan
+        return build_plan(self.input_path, policy or self.policy)
+
+    def test_appended_lines_are_merged_into_plan(self):
+        self.assertEqual(self.update(), self.full())
+        self.write_lines(self.lines[60:], mode='a')
+        with mock.patch('incremental_processor.parse_lines', wraps=__import__('incident_processor').parse_lines) as parse:
+            self.assertEqual(self.update(), self.full())
+        parsed = list(parse.call_args[0][0])
+        self.assertEqual(len(parsed), len(self.lines) - 60)
+        self.assertEqual(parse.call_args[1]['start'], 61)
+
+    def test_ties_across_inputs_keep_input_order(self):
+        from incident_processor import build_plan
+        from incremental_processor import update_plan
+        a_path, c_path = (os.path.join(self.tmpdir, name) for name in ('a.jsonl', 'c.jsonl'))
+        # The same records in every file, so every incident ties with one from each other input.
+        for path in (a_path, c_path):
+            with open(path, 'w') as f:
+                f.writelines(self.lines[:40])
+        pattern = os.path.join(self.tmpdir, '[abc].jsonl')
+        self.assertEqual(update_plan(pattern, self.policy, self.state_dir), build_plan(pattern, self.policy))
+        with open(a_path, 'a') as f:
+            f.writelines(self.lines[:20])
+        self.assertEqual(update_plan(pattern, self.policy, self.state_dir), build_plan(pattern, self.policy))
+        # A new input that sorts between the existing ones.
+        with open(os.path.join(self.tmpdir, 'b.jsonl'), 'w') as f:
+            f.writelines(self.lines[10:30])
+        self.assertEqual(update_plan(pattern, self.policy, self.state_dir), build_plan(pattern, self.policy))
+        policy = copy.deepcopy(self.policy)
+        policy['module_priority_score']['Payment Gateway'] = 1
+        self.assertEqual(update_plan(pattern, policy, self.state_dir), build_plan(pattern, policy))
+        # The inputs listed in another order.
+        reordered = [c_path, a_path]
+        self.assertEqual(update_plan(reordered, policy, self.state_dir), build_plan(reordered, policy))
+
+    def test_unterminated_last_line_waits_for_next_run(self):
+        self.update()
+        self.write_lines([self.lines[60].rstrip('\n')], mode='a')
+        self.assertEqual(len(self.update()), 60)
+        self.write_lines(['\n'], mode='a')
+        self.assertEqual(len(self.update()), 61)
+
+    def test_truncated_file_triggers_rebuild(self):
+        self.update()
+        self.write_lines(self.lines[:10])
+        self.assertEqual(self.update(), self.full())
+
+    def test_same_size_edit_in_the_middle_triggers_rebuild(self):
+        self.update()
+        with open(self.input_path, 'r+b') as f:
+            data = f.read()
+            middle = data.index(b'"environment": "', len(data) // 2) + len('"environment": "')
+            f.seek(middle)
+            f.write(b'X')
+        # The edit keeps the size; bump the mtime past it in case the clock is coarse.
+        st = os.stat(self.input_path)
+        os.utime(self.input_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.update(), self.full())
+
+    def test_prefix_hashes_reuse_verified_blocks(self):
+        import incremental_processor
+        from incremental_processor import prefix_hashes, prefix_matches
+        with mock.patch.object(incremental_processor, 'HASH_BLOCK_SIZE', 1000):
+            with open(self.input_path, 'rb') as f:
+                first = prefix_hashes(f, 2500)
+                self.assertEqual(len(first), 3)
+                self.assertTrue(prefix_matches(f, 2500, first))
+                self.assertFalse(prefix_matches(f, 2400, first))
+                with mock.patch('incremental_processor._block_hashes',
+                                wraps=incremental_processor._block_hashes) as hashed:
+                    second = prefix_hashes(f, 4200, first, 2500)
+                # Only the partial third block onwards is read again.
+                self.assertEqual(hashed.call_args[0][1:], (2000, 4200))
+                self.assertEqual(second, prefix_hashes(f, 4200))
+
+    def test_prefix_hasher_matches_prefix_hashes(self):
+        import incremental_processor
+        from incremental_processor import PrefixHasher, prefix_hashes
+        with mock.patch.object(incremental_processor, 'HASH_BLOCK_SIZE', 1000):
+            with open(self.input_path, 'rb') as f:
+                data = f.read()
+                known = prefix_hashes(f, 2500)
+                expected = prefix_hashes(f, 4200)
+            for hasher in (PrefixHasher(), PrefixHasher(known, 2500)):
+                for start in range(0, 4200, 700):
+                    hasher.feed(data[start:min(start + 700, 4200)])
+                self.assertEqual(hasher.offset, 4200)
+                self.assertEqual(hasher.result(), expected)
+
+    def test_policy_change_rescores_without_reading_inputs(self):
+        self.update()
+        policy = copy.deepcopy(self.policy)
+        policy['caps']['per_incident_minutes_max'] = 30
+        policy['module_priority_score']['Payment Gateway'] = 1
+        with mock.patch('incremental_processor.read_appended') as read:
+            self.assertEqual(self.update(policy), self.full(policy))
+        read.assert_not_called()
+
+
+    def test_incremental_cannot_stream_jsonl(self):
+        import contextlib
+        import io
+        from incident_processor import parse_args
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as err:
+            parse_args(['--format', 'jsonl', '--incremental'])
+        self.assertIn('--incremental', err.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
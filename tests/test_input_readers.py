@@ -0,0 +1,94 @@
+import unittest
+import importlib.util
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import bz2
+import gzip
+import lzma
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+COMPRESSORS = {'.gz': gzip.compress, '.bz2': bz2.compress, '.xz': lzma.compress}
+if importlib.util.find_spec('zstandard'):
+    import zstandard
+    COMPRESSORS['.zst'] = lambda data: zstandard.ZstdCompressor().compress(data)
+
+
+class TestInputReaders(unittest.TestCase):
+    # Mixed line endings, blank lines, a malformed line and no final newline.
+    DATA = (b'{"test_id": "a", "module": "m", "impacted_layers": ["L1"]}\r\n'
+            b'\n'
+            b'{"test_id": "b", broken\n'
+            b'{"test_id": "c", "module": "n"}\r'
+            b'   \n'
+            b'{"test_id": "d", "module": "' + b'x' * 300 + b'"}')
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def text_lines(self, path):
+        with open(path, 'r', newline=None) as f:
+            return [line.rstrip('\n').encode() for line in f]
+
+    def test_lines_match_text_mode_for_every_format_and_block_size(self):
+        from input_readers import iter_lines
+        plain = self.write('plain.jsonl', self.DATA)
+        expected = self.text_lines(plain)
+        self.assertEqual(len(expected), 6)
+        for extension, compress in [('', None)] + list(COMPRESSORS.items()):
+            path = plain if compress is None else self.write('failures.jsonl' + extension, compress(self.DATA))
+            for block_size in (1, 2, 7, 64, 1 << 20):
+                with self.subTest(extension=extension, block_size=block_size):
+                    self.assertEqual(list(iter_lines(path, block_size)), expected)
+
+    def test_empty_file(self):
+        from input_readers import iter_lines
+        self.assertEqual(list(iter_lines(self.write('empty.jsonl', b''))), [])
+        self.assertEqual(list(iter_lines(self.write('empty.jsonl.gz', gzip.compress(b'')))), [])
+
+    def test_malformed_line_numbers_are_kept(self):
+        from incident_processor import read_failures
+        for extension, compress in [('', None)] + list(COMPRESSORS.items()):
+            path = self.write('f.jsonl' + extension, self.DATA if compress is None else compress(self.DATA))
+            malformed = []
+            records = list(read_failures(path, on_malformed=lambda idx, e, source: malformed.append(idx)))
+            with self.subTest(extension=extension):
+                self.assertEqual([r['test_id'] for r in records], ['a', 'c', 'd'])
+                self.assertEqual(malformed, [3])
+
+    def test_compressed_inputs_give_the_same_plan(self):
+        from incident_processor import build_plan, load_policy
+        from parallel_processor import build_plan_parallel
+        from incremental_processor import update_plan
+        policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        source = os.path.join(DATA_DIR, 'Failures.jsonl')
+        with open(source, 'rb') as f:
+            compressed = self.write('Failures.jsonl.gz', gzip.compress(f.read()))
+        expected = build_plan(source, policy)
+        self.assertEqual(build_plan(compressed, policy), expected)
+        self.assertEqual(build_plan_parallel([compressed, source], policy, workers=2, shard_size=4096),
+                         build_plan([compressed, source], policy))
+        state_dir = os.path.join(self.tmpdir, 'state')
+        self.assertEqual(update_plan(compressed, policy, state_dir), expected)
+        self.assertEqual(update_plan(compressed, policy, state_dir), expected)
+
+    def test_register_reader(self):
+        from input_readers import READERS, iter_lines, register_reader
+        self.addCleanup(READERS.pop, '.gzip', None)
+        register_reader('.GZIP', gzip.open)
+        path = self.write('failures.gzip', gzip.compress(b'{"a": 1}\n{"a": 2}\n'))
+        self.assertEqual(list(iter_lines(path)), [b'{"a": 1}', b'{"a": 2}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+from unittest import mock
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestMetrics(unittest.TestCase):
+    def clock(self, *times):
+        return mock.patch('instrumentation.time.perf_counter', side_effect=list(times))
+
+    def test_nested_stages_are_exclusive(self):
+        from instrumentation import Metrics
+        with self.clock(0.0, 1.0, 2.0, 5.0, 6.0):
+            metrics = Metrics()
+            with metrics.stage('score'):
+                with metrics.stage('read'):
+                    pass
+        self.assertEqual(dict(metrics.seconds), {'read': 3.0, 'score': 2.0})
+        self.assertEqual(metrics.calls['read'], 1)
+
+    def test_timed_counts_only_producing_items(self):
+        from instrumentation import Metrics
+
+        def produce():
+            yield 'a'
+            yield 'b'
+        # start, stage enter; then enter/exit around each of the three next() calls
+        with self.clock(0.0, 10.0, 11.0, 12.0, 20.0, 21.0, 22.0, 23.0, 40.0):
+            metrics = Metrics()
+            with metrics.stage('write'):
+                self.assertEqual(list(metrics.timed(produce(), 'read')), ['a', 'b'])
+        self.assertEqual(metrics.seconds['read'], 3.0)
+        self.assertEqual(metrics.seconds['write'], 27.0)
+        self.assertEqual(metrics.calls['read'], 3)
+
+    def test_current_is_a_no_op_without_an_active_run(self):
+        from instrumentation import Metrics, current
+        items = [1, 2]
+        self.assertFalse(current())
+        self.assertIs(current().timed(items, 'read'), items)
+        metrics = Metrics()
+        with metrics.active():
+            self.assertIs(current(), metrics)
+            current().count('lines', 2)
+        self.assertFalse(current())
+        self.assertEqual(metrics.counters['lines'], 2)
+
+    def test_as_dict(self):
+        from instrumentation import Metrics
+        metrics = Metrics('test')
+        with metrics.stage('score'):
+            metrics.count('records', 10)
+        data = metrics.as_dict()
+        self.assertEqual(data['command'], 'test')
+        self.assertEqual(list(data['stages']), ['score'])
+        self.assertEqual(data['counters'], {'records': 10})
+        self.assertGreater(data['records_per_sec'], 0)
+
+
+class TestRunInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def malformed_input(self, bad_lines):
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            good = [line for line in f if line.strip()]
+        path = os.path.join(self.tmpdir, 'failures.jsonl')
+        with open(path, 'w') as f:
+            f.writelines(good)
+            for i in range(bad_lines):
+                f.write(f'{{"test_id": "broken-{i}"\n')
+        return path, len(good)
+
+    def run_main(self, *extra):
+        from incident_processor import main
+        output = os.path.join(self.tmpdir, 'out', 'plan.json')
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = main(['--output', output, '--log-file', os.path.join(self.tmpdir, 'run.log'),
+                           '--no-policy-cache'] + list(extra))
+        self.assertEqual(status, 0)
+        return output, stdout.getvalue()
+
+    def test_malformed_warnings_are_rate_limited_and_summarized(self):
+        from incident_processor import MALFORMED_WARNING_LIMIT
+        path, _ = self.malformed_input(MALFORMED_WARNING_LIMIT + 15)
+        _, out = self.run_main('--input', path)
+        self.assertEqual(out.count('Skipping malformed JSON'), MALFORMED_WARNING_LIMIT)
+        self.assertIn('counted but not reported individually', out)
+        self.assertIn(f'Skipped {MALFORMED_WARNING_LIMIT + 15} malformed JSON lines.', out)
+
+    def test_main_writes_metrics_next_to_the_plan(self):
+        path, good = self.malformed_input(3)
+        output, out = self.run_main('--input', path)
+        self.assertEqual(out.count('Skipping malformed JSON'), 3)
+        self.assertNotIn('Skipped 3', out)
+        with open(os.path.join(os.path.dirname(output), 'run_metrics.json')) as f:
+            metrics = json.load(f)
+        self.assertEqual(metrics['command'], 'incident_processor')
+        self.assertTrue({'read', 'decode', 'score', 'sort', 'validate', 'write'} <= set(metrics['stages']))
+        counters = metrics['counters']
+        self.assertEqual(counters['lines'], good + 3)
+        self.assertEqual(counters['records'], good)
+        self.assertEqual(counters['incidents'], good)
+        self.assertEqual(counters['malformed_lines'], 3)
+        self.assertEqual(counters['input_bytes'], os.path.getsize(path))
+        self.assertEqual(counters['score_cache_hits'] + counters['score_cache_misses'], good)
+        self.assertGreater(metrics['records_per_sec'], 0)
+        total = sum(stage['seconds'] for stage in metrics['stages'].values())
+        self.assertLessEqual(total, metrics['wall_seconds'])
+
+    def test_rereading_passes_are_not_counted_again(self):
+        from incident_processor import MALFORMED_WARNING_LIMIT
+        bad = MALFORMED_WARNING_LIMIT + 5
+        path, good = self.malformed_input(bad)
+        side_outputs = ['--store', os.path.join(self.tmpdir, 'history.sqlite'),
+                        '--index', os.path.join(self.tmpdir, 'index.sqlite'),
+                        '--cluster', os.path.join(self.tmpdir, 'clusters.json')]
+        for extra in (['--dedup', 'latest', '--dedup-dir', self.tmpdir],
+                      ['--incremental', '--state-dir', os.path.join(self.tmpdir, 'state')]):
+            with self.subTest(extra=extra[0]):
+                output, out = self.run_main('--input', path, *extra, *side_outputs)
+                self.assertEqual(out.count('Skipping malformed JSON'), MALFORMED_WARNING_LIMIT)
+                self.assertRegex(out, rf'Skipped {bad} malformed JSON lines(\.| \({bad} in )')
+                with open(os.path.join(os.path.dirname(output), 'run_metrics.json')) as f:
+                    counters = json.load(f)['counters']
+                self.assertEqual(counters['malformed_lines'], bad)
+                if extra[0] == '--dedup':
+                    self.assertEqual(counters['input_bytes'], os.path.getsize(path))
+                    self.assertEqual(counters['lines'], good + bad)
+                    self.assertEqual(counters['records'], good)
+
+    def test_streamed_plan_metrics_and_profile(self):
+        path, good = self.malformed_input(0)
+        profile_dir = os.path.join(self.tmpdir, 'profile')
+        metrics_path = os.path.join(self.tmpdir, 'metrics.json')
+        self.run_main('--input', path, '--format', 'jsonl', '--metrics', metrics_path, '--profile', profile_dir)
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+        self.assertTrue({'read', 'decode', 'score', 'write'} <= set(metrics['stages']))
+        self.assertEqual(metrics['counters']['incidents'], good)
+        for name in ('profile.pstats', 'profile.txt', 'tracemalloc.snapshot', 'tracemalloc.txt'):
+            self.assertTrue(os.path.getsize(os.path.join(profile_dir, name)), name)
+        with open(os.path.join(profile_dir, 'profile.txt')) as f:
+            self.assertIn('read_failures', f.read())
+
+    def test_report_metrics(self):
+        from generate_html_report import generate_html_report
+        output, _ = self.run_main('--input', os.path.join(DATA_DIR, 'Failures.jsonl'))
+        with open(output) as f:
+            incidents = len(json.load(f))
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        self.addCleanup(os.chdir, cwd)
+        generate_html_report(output, 'report.html')
+        with open(os.path.join('test_results', 'html_result', 'report_metrics.json')) as f:
+            metrics = json.load(f)
+        self.assertEqual(metrics['command'], 'generate_html_report')
+        self.assertTrue({'read', 'render'} <= set(metrics['stages']))
+        self.assertEqual(metrics['counters']['incidents'], incidents)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import shutil
+import tempfile
+from unittest import mock
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestParallelProcessor(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.tmpdir = tempfile.mkdtemp()
+        # Two copies of the sample runs plus a file with malformed lines
+        self.inputs = []
+        for name in ('Failures.jsonl', 'Test_Day2_Team2.jsonl'):
+            dst = os.path.join(self.tmpdir, name)
+            shutil.copyfile(os.path.join(DATA_DIR, name), dst)
+            self.inputs.append(dst)
+        broken = os.path.join(self.tmpdir, 'broken.jsonl')
+        with open(os.path.join(DATA_DIR, 'Test_Day2_Team2.jsonl')) as src, open(broken, 'w') as dst:
+            lines = src.readlines()
+            dst.writelines(lines[:3] + ['{oops\n', '\n'] + lines[3:])
+        self.inputs.append(broken)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shards_are_newline_aligned_and_cover_file(self):
+        from parallel_processor import plan_shards
+        path = self.inputs[0]
+        shards = plan_shards([path], shard_size=4096)
+        self.assertGreater(len(shards), 1)
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.assertEqual(b''.join(data[s:e] for _, s, e in shards), data)
+        for _, start, _ in shards[1:]:
+            self.assertEqual(data[start - 1:start], b'\n')
+
+    def test_parallel_plan_matches_single_process(self):
+        from incident_processor import build_plan
+        from parallel_processor import build_plan_parallel
+        with mock.patch('incident_processor.print'):
+            expected = build_plan(self.inputs, self.policy)
+        with mock.patch('parallel_processor.warn_malformed') as warn:
+            actual = build_plan_parallel(self.inputs, self.policy, workers=2, shard_size=4096)
+        self.assertEqual(actual, expected)
+        warn.assert_called_once()
+        self.assertEqual(warn.call_args[0][0], 4)
+        self.assertEqual(warn.call_args[0][2], self.inputs[2])
+
+
+    def test_workers_cannot_stream_jsonl(self):
+        import contextlib
+        import io
+        from incident_processor import parse_args
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as err:
+            parse_args(['--format', 'jsonl', '--workers', '2'])
+        self.assertIn('--workers', err.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
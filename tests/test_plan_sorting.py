@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import importlib.util
+import json
+from unittest import mock
+import random
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestPlanSorting(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        rng = random.Random(3)
+        # Few distinct scores and modules (including None) so ties exercise stability.
+        self.incidents = [{'test_id': f't{i}', 'priority_score': rng.choice([1.0, 2.5, 7.25]),
+                           'module': rng.choice([None, '', 'Cart', 'Auth'])} for i in range(3000)]
+
+    def expected(self):
+        from incident_processor import sort_key
+        return sorted(self.incidents, key=sort_key)
+
+    def test_top_k_matches_sorted_prefix(self):
+        from plan_sorting import top_k
+        for n in (1, 10, 2999, 5000):
+            with self.subTest(n=n):
+                self.assertEqual(top_k(iter(self.incidents), n), self.expected()[:n])
+
+    def test_external_sort_is_exact_and_stable(self):
+        from plan_sorting import external_sort
+        expected = self.expected()
+        for run_size, fan_in in ((10_000, 64), (3000, 64), (100, 64), (97, 2), (250, 3)):
+            with self.subTest(run_size=run_size, fan_in=fan_in):
+                with external_sort(iter(self.incidents), run_size, self.tmpdir, fan_in) as runs:
+                    self.assertEqual(len(runs), len(expected))
+                    self.assertEqual(list(runs), expected)
+                    # The sorted plan can be read again, e.g. for validation then writing.
+                    self.assertEqual(list(runs), expected)
+
+    def test_close_removes_spilled_runs(self):
+        from plan_sorting import external_sort
+        runs = external_sort(self.incidents, 500, self.tmpdir)
+        self.assertTrue(os.listdir(self.tmpdir))
+        runs.close()
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_main_top_and_external_sort_match_full_plan(self):
+        from incident_processor import main
+        common = ['--input', os.path.join(DATA_DIR, 'Failures.jsonl'), '--policy', os.path.join(DATA_DIR, 'Policy.yaml'),
+                  '--log-file', os.path.join(self.tmpdir, 'run.log'),
+                  '--policy-cache-dir', os.path.join(self.tmpdir, 'cache')]
+        runs = [('full', []), ('top', ['--top', '5']),
+                ('external', ['--external-sort', '--sort-run-size', '7', '--sort-dir', os.path.join(self.tmpdir, 'runs')])]
+        if importlib.util.find_spec('numpy'):
+            runs.append(('numpy-top', ['--top', '5', '--engine', 'numpy']))
+        outputs = {}
+        for name, extra in runs:
+            output = os.path.join(self.tmpdir, f'{name}.json')
+            self.assertEqual(main(common + extra + ['--output', output]), 0)
+            with open(output) as f:
+                outputs[name] = json.load(f)
+        self.assertEqual(outputs['external'], outputs['full'])
+        self.assertEqual(outputs['top'], outputs['full'][:5])
+        if 'numpy-top' in outputs:
+            self.assertEqual(outputs['numpy-top'], outputs['full'][:5])
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, 'runs')), [])
+
+
+    def test_failed_validation_still_removes_spilled_runs(self):
+        import plan_sorting
+        from incident_processor import main
+        sort_dir = os.path.join(self.tmpdir, 'runs')
+        # Keep the runs referenced so their finalizer cannot clean up behind the run's back.
+        kept = []
+
+        def external_sort(*args, **kwargs):
+            kept.append(sort(*args, **kwargs))
+            return kept[-1]
+
+        sort = plan_sorting.external_sort
+        with mock.patch('incident_processor.finish_validation', return_value=False), \
+                mock.patch('plan_sorting.external_sort', external_sort):
+            status = main(['--input', os.path.join(DATA_DIR, 'Failures.jsonl'),
+                           '--policy', os.path.join(DATA_DIR, 'Policy.yaml'),
+                           '--log-file', os.path.join(self.tmpdir, 'run.log'), '--no-policy-cache',
+                           '--output', os.path.join(self.tmpdir, 'plan.json'),
+                           '--external-sort', '--sort-run-size', '7', '--sort-dir', sort_dir])
+        self.assertEqual(status, 1)
+        self.assertEqual(len(kept), 1)
+        self.assertEqual(os.listdir(sort_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
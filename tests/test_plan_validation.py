@@ -0,0 +1,76 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestPlanValidation(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import build_plan, load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.plan = build_plan(os.path.join(DATA_DIR, 'Failures.jsonl'), self.policy)
+
+    def test_valid_plan_passes_every_level(self):
+        from plan_validation import validate_plan
+        for level in ('inline', 'sample', 'full'):
+            with self.subTest(level=level):
+                report = validate_plan(self.plan, self.policy, level=level, sample_rate=10)
+                self.assertTrue(report.ok, report.violations)
+                self.assertEqual(report.records_checked, len(self.plan))
+
+    def test_levels_control_recomputation(self):
+        from plan_validation import validate_plan
+        self.assertEqual(validate_plan(self.plan, self.policy, level='inline').records_recomputed, 0)
+        self.assertEqual(validate_plan(self.plan, self.policy, level='full').records_recomputed, len(self.plan))
+        first = validate_plan(self.plan, self.policy, level='sample', sample_rate=25, seed=3)
+        second = validate_plan(self.plan, self.policy, level='sample', sample_rate=25, seed=3)
+        self.assertEqual(first.records_recomputed, second.records_recomputed)
+        self.assertTrue(0 < first.records_recomputed < len(self.plan))
+
+    def test_sample_depends_only_on_seed_and_position(self):
+        from unittest import mock
+        from plan_validation import PlanValidator
+
+        def sampled(plan):
+            validator = PlanValidator(self.policy, 'sample', 25, 3)
+            with mock.patch.object(validator, '_check_against_policy') as recomputed:
+                validator.validate(plan)
+            return [call.args[0] for call in recomputed.call_args_list]
+
+        plan = copy.deepcopy(self.plan)
+        plan[0] = 'not an incident'
+        self.assertEqual(sampled(plan), [idx for idx in sampled(self.plan) if idx != 0])
+
+    def test_collects_all_violations(self):
+        from plan_validation import validate_plan
+        plan = copy.deepcopy(self.plan)
+        plan[0]['base_minutes'] += 1
+        plan[1]['final_minutes'] = -1
+        plan[2], plan[-1] = plan[-1], plan[2]
+        del plan[3]['module']
+        inline = validate_plan(plan, self.policy, level='inline')
+        self.assertEqual({v['check'] for v in inline.violations}, {'range', 'order', 'structure'})
+        full = validate_plan(plan, self.policy, level='full')
+        self.assertIn('base_minutes', {v['check'] for v in full.violations})
+        self.assertGreater(full.violation_count, inline.violation_count)
+
+    def test_off_and_empty(self):
+        from plan_validation import validate_plan
+        self.assertTrue(validate_plan([{'bogus': 1}], self.policy, level='off').ok)
+        self.assertEqual(validate_plan([], self.policy, level='inline').violations[0]['check'], 'empty')
+
+    def test_validate_results_raises_without_assert(self):
+        from incident_processor import validate_results
+        from plan_validation import PlanValidationError
+        plan = copy.deepcopy(self.plan)
+        plan[0]['priority_score'] = 99
+        with self.assertRaises(PlanValidationError):
+            validate_results(plan, self.policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import importlib.util
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+class TestPolicyWhatIf(unittest.TestCase):
+    GRID = {
+        'caps.per_incident_minutes_max': [45, None],
+        'multipliers.by_environment.PreProd': [1.0, 1.5],
+        'module_priority_score.Payment Gateway': [1, 5],
+    }
+
+    def setUp(self):
+        from incident_processor import load_policy, read_records
+        self.input_path = os.path.join(DATA_DIR, 'Failures.jsonl')
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.incidents = list(read_records(self.input_path))
+
+    def test_apply_overrides_and_grid(self):
+        from policy_whatif import apply_overrides, expand_grid
+        variant = apply_overrides(self.policy, {'multipliers.by_failure_type.Unknown': 2.0,
+                                                'minutes_per_impacted_layer.api.v2': 7})
+        self.assertEqual(variant['multipliers']['by_failure_type']['Unknown'], 2.0)
+        self.assertEqual(variant['minutes_per_impacted_layer']['api.v2'], 7)
+        self.assertNotIn('api.v2', self.policy['minutes_per_impacted_layer'])
+        with self.assertRaises(ValueError):
+            apply_overrides(self.policy, {'meta.name': 'x'})
+        variants = expand_grid(self.GRID)
+        self.assertEqual(len(variants), 8)
+        self.assertEqual(variants[0][0], 'caps.per_incident_minutes_max=45,multipliers.by_environment.PreProd=1.0,'
+                                         'module_priority_score.Payment Gateway=1')
+
+    def test_variants_match_full_pipeline(self):
+        import numpy as np
+        from incident_processor import build_plan, compile_policy
+        from policy_whatif import WhatIfEvaluator, apply_overrides, expand_grid
+        evaluator = WhatIfEvaluator(self.incidents, self.policy)
+        for name, overrides in expand_grid(self.GRID):
+            policy = apply_overrides(self.policy, overrides)
+            plan = build_plan(self.input_path, policy)
+            scores = evaluator.evaluate(policy)
+            with self.subTest(variant=name):
+                self.assertEqual([self.incidents[i]['test_id'] for i in np.argsort(scores['ranks'])],
+                                 [r['test_id'] for r in plan])
+                self.assertAlmostEqual(float(scores['final_minutes'].sum()), sum(r['final_minutes'] for r in plan))
+                compiled = compile_policy(policy)
+                uncapped = [r['base_minutes'] * compiled.env_multipliers.get(r['environment'], 1.0)
+                            * compiled.failure_multipliers.get(r['failure_type'], 1.0) for r in plan]
+                cap = compiled.upper_cap
+                self.assertEqual(int(scores['capped'].sum()), sum(1 for m in uncapped if cap is not None and m > cap))
+
+    def test_report_rank_correlation_and_movers(self):
+        from policy_whatif import run_whatif
+        report = run_whatif(self.incidents, self.policy, [
+            ('same', {}),
+            ('cap-only', {'caps.per_incident_minutes_max': 10}),
+            ('payments-last', {'module_priority_score.Payment Gateway': 0}),
+        ], movers=3)
+        same, cap_only, payments = report['variants']
+        self.assertEqual(same['spearman_rho'], 1.0)
+        self.assertEqual(same['minutes_delta'], 0)
+        self.assertEqual(same['top_movers'], [])
+        self.assertEqual(cap_only['spearman_rho'], 1.0)
+        self.assertLess(cap_only['minutes_delta'], 0)
+        self.assertGreater(cap_only['capped_incidents'], report['baseline']['capped_incidents'])
+        self.assertLess(payments['spearman_rho'], 1.0)
+        self.assertEqual(len(payments['top_movers']), 3)
+        self.assertTrue(all(m['module'] == 'Payment Gateway' and m['rank'] > m['baseline_rank']
+                            for m in payments['top_movers']))
+
+    def test_main_writes_report(self):
+        import yaml
+        from policy_whatif import main
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        variants_path = os.path.join(tmpdir, 'variants.yaml')
+        with open(variants_path, 'w') as f:
+            yaml.safe_dump({'variants': [{'name': 'strict', 'set': {'caps.per_incident_minutes_max': 30}}],
+                            'grid': self.GRID}, f)
+        output = os.path.join(tmpdir, 'whatif.json')
+        self.assertEqual(main(['--input', self.input_path, '--variants', variants_path, '--output', output]), 0)
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(report['incidents'], len(self.incidents))
+        self.assertEqual([v['name'] for v in report['variants']][:1], ['strict'])
+        self.assertEqual(len(report['variants']), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+class TestSyntheticFailures(unittest.TestCase):
+    def setUp(self):
+        from incident_processor import load_policy
+        self.policy = load_policy(os.path.join(DATA_DIR, 'Policy.yaml'))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_seeded_output_is_reproducible(self):
+        from synthetic_failures import FailureGenerator
+        first = list(FailureGenerator(self.policy, seed=3, duplicate_rate=0.1, malformed_rate=0.05).lines(300))
+        again = list(FailureGenerator(self.policy, seed=3, duplicate_rate=0.1, malformed_rate=0.05).lines(300))
+        other = list(FailureGenerator(self.policy, seed=4).lines(300))
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+
+    def test_records_follow_the_sample_schema_and_policy(self):
+        from synthetic_failures import FailureGenerator
+        with open(os.path.join(DATA_DIR, 'Failures.jsonl')) as f:
+            sample_keys = set(json.loads(f.readline()))
+        generator = FailureGenerator(self.policy, seed=1, log_lines=(3, 3), log_width=200, unknown_rate=0)
+        records = [json.loads(line) for line in generator.lines(500)]
+        for rec in records:
+            self.assertEqual(set(rec), sample_keys)
+            self.assertIn(rec['module'], self.policy['module_priority_score'])
+            self.assertIn(rec['environment'], self.policy['multipliers']['by_environment'])
+            self.assertTrue(set(rec['impacted_layers']) <= set(self.policy['minutes_per_impacted_layer']))
+            self.assertEqual(len(rec['logs']), 3)
+            self.assertTrue(all(len(line) >= 200 for line in rec['logs'][:-1]))
+        # The default skew favours the first modules listed in the policy.
+        modules = list(self.policy['module_priority_score'])
+        counts = {m: sum(rec['module'] == m for rec in records) for m in modules}
+        self.assertGreater(counts[modules[0]], counts[modules[-1]])
+
+    def test_duplicate_and_malformed_rates(self):
+        from incident_processor import read_inputs
+        from synthetic_failures import write_failures
+        path = os.path.join(self.tmpdir, 'synthetic.jsonl')
+        write_failures(path, 4000, policy=self.policy, seed=9, duplicate_rate=0.2, malformed_rate=0.05)
+        malformed = []
+        records = list(read_inputs(path, on_malformed=lambda idx, e, source: malformed.append(idx)))
+        self.assertEqual(len(records) + len(malformed), 4000)
+        self.assertAlmostEqual(len(malformed) / 4000, 0.05, delta=0.015)
+        distinct = len({(r['test_id'], r['correlation_id']) for r in records})
+        self.assertAlmostEqual(1 - distinct / len(records), 0.2, delta=0.03)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_compare_flags_throughput_and_memory_regressions(self):
+        from run_benchmarks import compare
+        baseline = {'10k': {'parse': {'rows_per_sec': 1000, 'peak_rss_mb': 100}}}
+        self.assertEqual(compare({'10k': {'parse': {'rows_per_sec': 800, 'peak_rss_mb': 120}}}, baseline), [])
+        regressions = compare({'10k': {'parse': {'rows_per_sec': 600, 'peak_rss_mb': 140}},
+                               '1m': {'parse': {'rows_per_sec': 1, 'peak_rss_mb': 1}}}, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith('10k parse') for message in regressions))
+
+    def test_suite_runs_every_stage(self):
+        from run_benchmarks import STAGES, run_suite, scale_rows
+        self.assertEqual(scale_rows('10k'), 10_000)
+        self.assertEqual(scale_rows('2.5m'), 2_500_000)
+        results = run_suite(['300'], data_dir=self.tmpdir)
+        self.assertEqual(list(results['300']), list(STAGES))
+        for stage, result in results['300'].items():
+            self.assertGreater(result['rows'], 290, stage)
+            self.assertGreater(result['rows_per_sec'], 0, stage)
+
+
+if __name__ == '__main__':
+    unittest.main()
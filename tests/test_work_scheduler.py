@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+# Ensure parent directory is in sys.path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import itertools
+import json
+import random
+import shutil
+import tempfile
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'sample_data')
+
+
+def incident(test_id, module, minutes, priority):
+    return {'test_id': test_id, 'module': module, 'final_minutes': minutes, 'priority_score': priority}
+
+
+class TestWorkScheduler(unittest.TestCase):
+    def test_greedy_by_priority_per_minute_fills_remaining_minutes(self):
+        from work_scheduler import schedule, team_capacity
+        incidents = [incident('big', 'A', 90, 9.0), incident('small1', 'A', 50, 6.0),
+                     incident('small2', 'B', 50, 6.0), incident('tiny', 'B', 10, 0.5)]
+        result = schedule(incidents, team_capacity(1, minutes_per_day=100))
+        queue = result['engineers'][0]['queue']
+        # Taking 'big' first (plan order) would leave 10 minutes and priority 9.5.
+        self.assertEqual([i['test_id'] for i in queue], ['small1', 'small2'])
+        self.assertEqual([i['test_id'] for i in result['spillover']], ['big', 'tiny'])
+        self.assertEqual(result['assigned_priority'], 12.0)
+        self.assertEqual(result['utilization'], 1.0)
+
+    def test_module_restrictions_and_capacity_are_respected(self):
+        from work_scheduler import schedule, team_capacity
+        rng = random.Random(5)
+        incidents = [incident(f't{i}', rng.choice(['A', 'B', 'C', None]), round(rng.uniform(0, 40), 2),
+                              round(rng.uniform(0, 5), 3)) for i in range(500)]
+        incidents.append(incident('bad', 'A', None, 1.0))
+        engineers = team_capacity([{'name': 'a', 'modules': ['A']}, {'name': 'ab', 'modules': ['A', 'B']},
+                                   {'name': 'any', 'minutes_per_day': 300}], minutes_per_day=200, days=2)
+        result = schedule(incidents, engineers)
+        assigned = [i['test_id'] for e in result['engineers'] for i in e['queue']]
+        spilled = [i['test_id'] for i in result['spillover']]
+        self.assertEqual(sorted(assigned + spilled), sorted(i['test_id'] for i in incidents))
+        self.assertIn('bad', spilled)
+        for engineer in result['engineers']:
+            self.assertLessEqual(sum(i['final_minutes'] for i in engineer['queue']), engineer['capacity_minutes'] + 1e-9)
+            if engineer['modules']:
+                self.assertTrue({i['module'] for i in engineer['queue']} <= set(engineer['modules']))
+        self.assertEqual([e['capacity_minutes'] for e in result['engineers']], [400, 400, 600])
+        # Nothing spilled would still fit an engineer who takes its module.
+        free = [(e['capacity_minutes'] - e['assigned_minutes'], e['modules']) for e in result['engineers']]
+        for spilled_incident in result['spillover']:
+            if spilled_incident['final_minutes'] is None:
+                continue
+            for minutes, modules in free:
+                if modules is None or spilled_incident['module'] in modules:
+                    self.assertLess(minutes, spilled_incident['final_minutes'] - 1e-9)
+
+    def test_close_to_optimal_on_small_instances(self):
+        from work_scheduler import schedule, team_capacity
+        rng = random.Random(11)
+        for trial in range(20):
+            incidents = [incident(f't{i}', 'A', rng.randint(1, 30), rng.randint(0, 9)) for i in range(10)]
+            greedy = schedule(incidents, team_capacity(1, minutes_per_day=60))['assigned_priority']
+            best = max(sum(i['priority_score'] for i in subset)
+                       for r in range(len(incidents) + 1) for subset in itertools.combinations(incidents, r)
+                       if sum(i['final_minutes'] for i in subset) <= 60)
+            with self.subTest(trial=trial):
+                self.assertGreaterEqual(greedy, 0.7 * best)
+
+    def test_main_writes_schedule_and_report_section(self):
+        from incident_processor import main
+        from generate_html_report import write_html_report
+        from work_scheduler import load_schedule
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        schedule_path = os.path.join(tmpdir, 'schedule.json')
+        output = os.path.join(tmpdir, 'plan.json')
+        self.assertEqual(main(['--input', os.path.join(DATA_DIR, 'Failures.jsonl'),
+                               '--policy', os.path.join(DATA_DIR, 'Policy.yaml'), '--output', output,
+                               '--log-file', os.path.join(tmpdir, 'run.log'),
+                               '--policy-cache-dir', os.path.join(tmpdir, 'cache'),
+                               '--schedule', schedule_path, '--capacity', os.path.join(DATA_DIR, 'Capacity.yaml')]), 0)
+        result = load_schedule(schedule_path)
+        with open(output) as f:
+            plan = json.load(f)
+        self.assertEqual(result['assigned_incidents'] + len(result['spillover']), len(plan))
+        self.assertEqual([e['name'] for e in result['engineers']], ['Asha', 'Ben', 'Chen', 'Dana'])
+        out = io.StringIO()
+        write_html_report(plan, out, schedule=result)
+        html = out.getvalue()
+        self.assertIn('Capacity Utilization', html)
+        self.assertIn('utilizationChart', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
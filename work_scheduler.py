@@ -0,0 +1,168 @@
+"""Pack scored incidents into engineer capacity.
+
+Each engineer has a minutes budget (minutes_per_day x days) and optionally a
+list of modules they take. Filling the budgets to maximize the total
+priority_score is a multiple knapsack problem; the greedy approximation here
+takes incidents by priority per minute (priority_score / final_minutes, plan
+order on ties) and gives each one to the eligible engineer with the most
+minutes left, preferring engineers restricted to that module over general
+ones. Incidents that fit nobody go to the spillover list, and the scan
+continues so smaller incidents still fill the remaining minutes.
+
+Engineers are kept in one max-heap of remaining minutes per eligibility
+group, so placing an incident costs O(log E) and scheduling n incidents is
+dominated by the O(n log n) sort. Queues and spillover are in plan order.
+
+The capacity file is YAML:
+
+    minutes_per_day: 480
+    days: 1
+    engineers:
+      - name: Asha
+        modules: [Payment Gateway, Order Management]
+      - name: Ben
+        minutes_per_day: 240
+
+``engineers`` may also be a number of interchangeable engineers.
+"""
+import heapq
+import json
+import math
+
+import yaml
+
+from incident_processor import sort_key
+
+MINUTES_PER_DAY = 480
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def team_capacity(engineers, minutes_per_day=MINUTES_PER_DAY, days=1):
+    """Engineer dicts for a capacity spec: a number of engineers or a list of dicts/names."""
+    if isinstance(engineers, int) and not isinstance(engineers, bool):
+        engineers = [f'engineer-{i}' for i in range(1, engineers + 1)]
+    team = []
+    for spec in engineers or []:
+        if isinstance(spec, str):
+            spec = {'name': spec}
+        if not isinstance(spec, dict) or not spec.get('name'):
+            raise ValueError(f"Engineer entries need a name, got {spec!r}")
+        per_day = spec.get('minutes_per_day', minutes_per_day)
+        if not _is_number(per_day) or per_day < 0:
+            raise ValueError(f"Engineer {spec['name']!r} has invalid minutes_per_day {per_day!r}")
+        modules = spec.get('modules')
+        team.append({'name': str(spec['name']),
+                     'modules': sorted(modules) if modules else None,
+                     'capacity_minutes': per_day * spec.get('days', days)})
+    if not team:
+        raise ValueError("Capacity needs at least one engineer")
+    return team
+
+
+def load_capacity(path):
+    """Engineer dicts from a capacity YAML file (see the module docstring)."""
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f) or {}
+    return team_capacity(spec.get('engineers'), spec.get('minutes_per_day', MINUTES_PER_DAY), spec.get('days', 1))
+
+
+def _density_key(item):
+    index, incident = item
+    minutes = incident['final_minutes']
+    # Free incidents come first; then priority per minute, then plan order.
+    density = math.inf if minutes == 0 else incident['priority_score'] / minutes
+    return (-density,) + sort_key(incident) + (index,)
+
+
+def schedule(incidents, engineers):
+    """Assign incidents to engineers (from team_capacity); returns the schedule dict."""
+    general = []
+    by_module = {}
+    queues = [[] for _ in engineers]
+    remaining = [e['capacity_minutes'] for e in engineers]
+    for idx, engineer in enumerate(engineers):
+        entry = (-engineer['capacity_minutes'], idx)
+        if engineer['modules'] is None:
+            general.append(entry)
+        for module in engineer['modules'] or ():
+            by_module.setdefault(module, []).append(entry)
+    pools = [general] + list(by_module.values())
+    for pool in pools:
+        heapq.heapify(pool)
+
+    spillover = []
+    candidates = []
+    for index, incident in enumerate(incidents):
+        if _is_number(incident.get('final_minutes')) and incident['final_minutes'] >= 0 \
+                and _is_number(incident.get('priority_score')):
+            candidates.append((index, incident))
+        else:
+            spillover.append((index, incident))
+    candidates.sort(key=_density_key)
+
+    for index, incident in candidates:
+        minutes = incident['final_minutes']
+        placed = False
+        for pool in (by_module.get(incident.get('module')), general):
+            if not pool:
+                continue
+            # An engineer in several module pools leaves stale entries behind;
+            # drop them lazily when they surface.
+            while pool and -pool[0][0] != remaining[pool[0][1]]:
+                heapq.heapreplace(pool, (-remaining[pool[0][1]], pool[0][1]))
+            if remaining[pool[0][1]] >= minutes:
+                idx = pool[0][1]
+                remaining[idx] -= minutes
+                heapq.heapreplace(pool, (-remaining[idx], idx))
+                queues[idx].append((index, incident))
+                placed = True
+                break
+        if not placed:
+            spillover.append((index, incident))
+
+    def in_plan_order(items):
+        return [incident for _, incident in sorted(items, key=lambda item: sort_key(item[1]) + (item[0],))]
+
+    team = []
+    for engineer, queue, left in zip(engineers, queues, remaining):
+        assigned = engineer['capacity_minutes'] - left
+        team.append({
+            'name': engineer['name'],
+            'modules': engineer['modules'],
+            'capacity_minutes': engineer['capacity_minutes'],
+            'assigned_minutes': round(assigned, 3),
+            'utilization': round(assigned / engineer['capacity_minutes'], 4) if engineer['capacity_minutes'] else 0.0,
+            'priority_total': round(sum(i['priority_score'] for _, i in queue), 3),
+            'queue': in_plan_order(queue),
+        })
+    capacity = sum(e['capacity_minutes'] for e in team)
+    assigned = sum(e['assigned_minutes'] for e in team)
+    spilled = in_plan_order(spillover)
+    return {
+        'capacity_minutes': capacity,
+        'assigned_minutes': round(assigned, 3),
+        'utilization': round(assigned / capacity, 4) if capacity else 0.0,
+        'assigned_incidents': sum(len(e['queue']) for e in team),
+        'assigned_priority': round(sum(e['priority_total'] for e in team), 3),
+        'spillover_minutes': round(sum(i['final_minutes'] for i in spilled if _is_number(i.get('final_minutes'))), 3),
+        'spillover_priority': round(sum(i['priority_score'] for i in spilled if _is_number(i.get('priority_score'))), 3),
+        'engineers': team,
+        'spillover': spilled,
+    }
+
+
+def write_schedule(result, path):
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+
+def load_schedule(path):
+    """Schedule written by write_schedule, or None if the file does not exist."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None